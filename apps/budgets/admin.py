@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import Budget, Expense
+from .models import Budget, BudgetAlertRule, BudgetSnapshot, ExchangeRate, Expense
 
 # Register your models here.
 admin.site.register(Budget)
 admin.site.register(Expense)
+admin.site.register(ExchangeRate)
+admin.site.register(BudgetSnapshot)
+admin.site.register(BudgetAlertRule)
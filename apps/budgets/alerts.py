@@ -0,0 +1,105 @@
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+from notifications.models import Notification
+
+from apps.events.models import EventMembership
+from apps.user_notifications.outbox import outbox_email, queue_emails
+from apps.user_notifications.utils import create_notifications
+from .models import Budget, BudgetAlertRule
+
+
+logger = logging.getLogger(__name__)
+
+
+def budget_spend(budget):
+    """Spend that counts towards alerts: actual costs of expenses that are not cancelled."""
+    return budget.expenses_actual_total - budget.cancelled_actual_total
+
+
+def evaluate_budget_alerts(budget_ids):
+    """
+    Compare each budget's current rollups with its alert rules. Reads one
+    budget row and the rules that change state; never scans expenses.
+    Returns the rules that fired.
+    """
+    fired = []
+    for budget in Budget.objects.filter(id__in=budget_ids).select_related('event').only(
+        'id', 'estimated_amount', 'estimated_amount_currency',
+        'expenses_actual_total', 'cancelled_actual_total', 'event__name', 'event__id', 'event__owner',
+    ):
+        amount = budget.estimated_amount.amount if budget.estimated_amount else Decimal('0')
+        if amount <= 0:
+            # No threshold can be reached; re-arm so rules fire again once an amount is set
+            BudgetAlertRule.objects.filter(budget_id=budget.id, is_triggered=True).update(is_triggered=False)
+            continue
+        spent = budget_spend(budget)
+        percent_spent = spent * 100 / amount
+
+        rules = BudgetAlertRule.objects.filter(budget_id=budget.id, is_active=True)
+        # Re-arm rules that spend has dropped back below
+        rules.filter(is_triggered=True, percent__gt=percent_spent).update(is_triggered=False)
+
+        now = timezone.now()
+        for rule in rules.filter(is_triggered=False, percent__lte=percent_spent):
+            # Conditional update so concurrent writes fire each crossing once
+            if BudgetAlertRule.objects.filter(pk=rule.pk, is_triggered=False).update(
+                is_triggered=True, last_triggered_at=now
+            ):
+                rule.is_triggered, rule.last_triggered_at = True, now
+                rule.budget = budget
+                fired.append(rule)
+
+    if fired:
+        send_budget_alerts(fired)
+    return fired
+
+
+def send_budget_alerts(rules):
+    """Notify the event's owner and admins of every fired rule."""
+    site_context = {
+        'site_name': settings.SITE_NAME,
+        'protocol': 'https' if getattr(settings, 'USE_HTTPS', False) else 'http',
+        'domain': getattr(settings, 'DOMAIN', 'localhost:8000'),
+    }
+    notifications, emails = [], []
+    for rule in rules:
+        budget = rule.budget
+        event = budget.event
+        recipients = [
+            membership.user for membership in EventMembership.objects.filter(
+                event_id=event.pk, role__in=[EventMembership.Role.OWNER, EventMembership.Role.ADMIN]
+            ).select_related('user')
+        ]
+        currency = budget.estimated_amount_currency
+        message = (
+            f'"{event.name}" has spent {budget_spend(budget)} {currency} of its '
+            f'{budget.estimated_amount.amount} {currency} budget ({rule.percent}% threshold reached)'
+        )
+        logger.info(f"Budget {budget.id} crossed its {rule.percent}% alert")
+        for recipient in recipients:
+            notifications.append(Notification(
+                recipient=recipient,
+                actor=event.owner,
+                verb='Budget Threshold Reached',
+                target=budget,
+                description=message,
+            ))
+            html_message = render_to_string('notifications/email.html', {
+                **site_context,
+                'notification': {'title': f'{rule.percent}% of budget spent', 'message': message},
+                'related_object': event.name,
+            })
+            emails.append(outbox_email(
+                f'Budget alert: {event.name} reached {rule.percent}%',
+                message,
+                [recipient.email],
+                html_message=html_message,
+                idempotency_key=f"budget-alert:{rule.pk}:{rule.last_triggered_at.isoformat()}:{recipient.pk}",
+            ))
+
+    create_notifications(notifications)
+    queue_emails(emails)
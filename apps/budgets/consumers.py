@@ -1,15 +1,143 @@
+import asyncio
 import json
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Expense, TypingStatus, Comment, Collaborator
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Prefetch, Q
+from django.utils.dateparse import parse_datetime
+from .models import Expense, Comment, Collaborator
+from .presence import TYPING_TTL, get_presence
 from django.contrib.auth.models import AnonymousUser
+from apps.events.models import EventMembership
+
+
+# A typist who sends nothing for this many seconds is broadcast as stopped
+TYPING_IDLE_TIMEOUT = 3
+# Typing transitions in a room are collected for this long and sent as one group message
+TYPING_FLUSH_INTERVAL = 0.25
+
+
+class TypingBroadcaster:
+    """
+    Coalesces typing transitions per room. Each room gets at most one
+    `typing_batch` group message per flush interval carrying the latest
+    state of every typist that changed, so room traffic follows the number
+    of typists rather than keystrokes.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.flushes = {}
+
+    def queue(self, channel_layer, room, user_key, name, is_typing):
+        self.pending.setdefault(room, {})[user_key] = (name, is_typing)
+        flush = self.flushes.get(room)
+        if flush is None or flush.done() or flush.get_loop() is not asyncio.get_running_loop():
+            self.flushes[room] = asyncio.ensure_future(self.flush_later(channel_layer, room))
+
+    async def flush_later(self, channel_layer, room):
+        try:
+            await asyncio.sleep(TYPING_FLUSH_INTERVAL)
+        finally:
+            self.flushes.pop(room, None)
+            updates = self.pending.pop(room, {})
+        if updates:
+            await channel_layer.group_send(room, {
+                'type': 'typing_batch',
+                'updates': [{'user': name, 'is_typing': is_typing} for name, is_typing in updates.values()],
+            })
+
+
+typing_broadcaster = TypingBroadcaster()
+
+
+# Comment history paging: root comments per page and replies shown per thread
+COMMENT_PAGE_SIZE = 20
+MAX_COMMENT_PAGE_SIZE = 100
+REPLY_WINDOW = 3
+MAX_REPLY_WINDOW = 50
+
+
+def encode_comment_cursor(comment):
+    """Opaque keyset position of a comment in (created_at, pkid) order."""
+    payload = json.dumps([comment.created_at.isoformat(), comment.pkid])
+    return urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_comment_cursor(encoded):
+    """Returns (created_at, pkid); raises ValueError for anything malformed."""
+    try:
+        raw_created_at, pkid = json.loads(urlsafe_b64decode(str(encoded).encode()))
+        created_at = parse_datetime(raw_created_at)
+        pkid = int(pkid)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if created_at is None:
+        raise ValueError('Invalid cursor')
+    return created_at, pkid
+
+
+def bounded_size(value, default, minimum, maximum):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(minimum, min(size, maximum))
+
+
+def serialize_comment(comment):
+    user = comment.author.user
+    data = {
+        'id': str(comment.id),
+        'content': comment.content,
+        'author': {
+            'id': str(user.id),
+            'name': f"{user.firstname} {user.lastname}".strip() or user.email,
+            'email': user.email
+        },
+        'created_at': comment.created_at.isoformat(),
+        'is_reply': comment.parent_id is not None
+    }
+    if comment.parent_id is not None:
+        data['parent_id'] = str(comment.parent_id)
+    return data
+
+
+def comment_access_group(user_pk):
+    """Control group a user's comment sockets join to hear about membership changes."""
+    return f'expense_comment_access_{user_pk}'
 
 
 class ExpenseCommentConsumer(AsyncWebsocketConsumer):
+    """
+    Comment history is paged by root comment, newest page first:
+
+        -> {"type": "get_comments", "limit": 20, "reply_limit": 3}
+        -> {"type": "get_comments", "before": "<cursor>"}   older page
+        -> {"type": "get_comments", "after": "<cursor>"}    newer page
+        <- {"type": "comments_list", "comments": [...], "has_more": bool,
+            "before": "<cursor>", "after": "<cursor>"}
+
+    Comments in a page are in chronological order and `has_more` refers to the
+    direction paged in. Each root carries the first `reply_limit` replies,
+    its `reply_count` and, when the thread is longer, a `replies_after` cursor:
+
+        -> {"type": "get_replies", "parent": "<comment id>", "after": "<cursor>", "limit": 20}
+        <- {"type": "replies_list", "parent_id": "...", "replies": [...],
+            "has_more": bool, "after": "<cursor>"}
+    """
+
     async def connect(self):
         self.user = self.scope.get("user", AnonymousUser())
         self.expense_id = self.scope['url_route']['kwargs']['expense_id']
         self.room_group_name = f'expense_{self.expense_id}_comments'
+        self.is_typing = False
+        self.typing_deadline = 0
+        self.typing_refreshed_at = 0
+        self.typing_watcher = None
         
         print(f"Connection attempt - User: {self.user}, Expense ID: {self.expense_id}")
         
@@ -19,9 +147,9 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
             await self.send_error_and_close("authentication_failed", "Authentication required. Please provide a valid token.")
             return
         
-        # Check if user is collaborator
-        is_collaborator_result = await self.is_collaborator()
-        if not is_collaborator_result:
+        # Check if user is collaborator, caching what later messages need
+        has_access = await self.load_access()
+        if not has_access:
             print(f"Authorization failed: User {self.user.email} is not a collaborator for expense {self.expense_id}")
             await self.send_error_and_close("authorization_failed", "You are not authorized to access this expense.")
             return
@@ -31,7 +159,13 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        self.access_group_name = comment_access_group(self.user.pk)
+        await self.channel_layer.group_add(
+            self.access_group_name,
+            self.channel_name
+        )
         await self.accept()
+        self.display_name = self.get_user_name()
 
         # Send success authentication message
         await self.send(text_data=json.dumps({
@@ -81,10 +215,20 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 self.channel_name
             )
+        if hasattr(self, 'access_group_name'):
+            await self.channel_layer.group_discard(
+                self.access_group_name,
+                self.channel_name
+            )
         
         # Clear typing status only if user was authenticated
         if not isinstance(self.user, AnonymousUser) and self.user.is_authenticated:
-            await self.clear_typing_status()
+            if self.typing_watcher is not None:
+                self.typing_watcher.cancel()
+            if self.is_typing:
+                await self.stop_typing()
+            else:
+                await self.clear_typing_status()
 
     async def receive(self, text_data):
         # Double-check authentication on each message (for token expiration)
@@ -103,18 +247,10 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
             message_type = text_data_json.get('type')
             
             if message_type == 'typing':
-                is_typing = text_data_json.get('is_typing', False)
-                await self.update_typing_status(is_typing)
-                
-                # Broadcast typing status
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'typing_status',
-                        'user': await self.get_user_name(),
-                        'is_typing': is_typing
-                    }
-                )
+                if text_data_json.get('is_typing', False):
+                    await self.start_typing()
+                else:
+                    await self.stop_typing()
             
             elif message_type == 'comment':
                 comment_data = text_data_json.get('comment', {})
@@ -156,13 +292,20 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
                         'message': result.get('message', 'Failed to create comment')
                     }))
                     
-            elif message_type == 'get_comments':
-                # Optional: Load existing comments
-                comments = await self.get_comments()
-                await self.send(text_data=json.dumps({
-                    'type': 'comments_list',
-                    'comments': comments
-                }))
+            elif message_type in ('get_comments', 'get_replies'):
+                if message_type == 'get_comments':
+                    result = await self.get_comments(text_data_json)
+                else:
+                    result = await self.get_replies(text_data_json)
+                
+                if result.get('error'):
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'error_type': result['error'],
+                        'message': result['message']
+                    }))
+                else:
+                    await self.send(text_data=json.dumps(result))
     
                     
         except json.JSONDecodeError:
@@ -187,6 +330,15 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
             'is_typing': event['is_typing']
         }))
 
+    async def typing_batch(self, event):
+        # Coalesced typing transitions for the room, sent as the usual typing frames
+        for update in event['updates']:
+            await self.send(text_data=json.dumps({
+                'type': 'typing',
+                'user': update['user'],
+                'is_typing': update['is_typing']
+            }))
+
     async def new_comment(self, event):
         # Send comment to WebSocket
         await self.send(text_data=json.dumps({
@@ -194,77 +346,90 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
             'comment': event['comment']
         }))
 
+    async def access_changed(self, event):
+        """Control message: the user's membership of an event changed, so re-check it."""
+        if event['event_id'] != self.event.pk:
+            return
+        if await self.load_access():
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'error_type': 'authorization_failed',
+            'message': 'Your access to this expense has been revoked.',
+            'authenticated': True
+        }))
+        await self.close(code=4003)
+
     @database_sync_to_async
-    def is_collaborator(self):
+    def load_access(self):
+        """
+        Resolve the expense, its event, the user's collaborator record and the
+        comment content type once, so per-message handling needs no lookups.
+        Returns False when the user is not a member of the expense's event.
+        """
         try:
-            expense = Expense.objects.get(id=self.expense_id)
-            print("Is Collab Expense: ", expense)
-            return expense.budget.event.collaborators.filter(
-                collaborator__user=self.user
-            ).exists()
-        except Expense.DoesNotExist:
-            print(f"Expense {self.expense_id} not found")
-            return False
+            expense = Expense.objects.select_related('budget__event').filter(id=self.expense_id).first()
+            if expense is None or not EventMembership.objects.is_member(self.user, expense.budget.event):
+                return False
+            self.expense = expense
+            self.event = expense.budget.event
+            self.collaborator = Collaborator.objects.filter(event=self.event, user=self.user).first()
+            self.content_type = ContentType.objects.get_for_model(Expense)
+            return True
         except Exception as e:
             print(f"Error checking collaborator status: {e}")
             return False
 
-    @database_sync_to_async
     def get_user_name(self):
         return f"{self.user.firstname} {self.user.lastname}".strip() or self.user.email
 
-    @database_sync_to_async
-    def update_typing_status(self, is_typing):
-        print("Check Is Typing: ", is_typing)
-        try:
-            expense = Expense.objects.get(id=self.expense_id)
-            print("Update Typing Expense: ", expense)
-            
-            collaborator = Collaborator.objects.get(
-                event=expense.budget.event,
-                user=self.user
-            )
-            print("Expense After: ", expense)
-            print("Collaborator: ", collaborator)
-            
-            typing_status, created = TypingStatus.objects.get_or_create(
-                expense=expense,
-                collaborator=collaborator,
-                defaults={'is_typing': is_typing}
-            )
-            print("Typing Status: ", typing_status)
-            print("Created: ", created)
-            
-            if not created:
-                typing_status.is_typing = is_typing
-                typing_status.save()
-                
-        except Expense.DoesNotExist:
-            print(f"Expense {self.expense_id} not found in update_typing_status")
-        except Collaborator.DoesNotExist:
-            print(f"Collaborator not found for user {self.user.email} and expense {self.expense_id}")
-        except Exception as e:
-            print(f"Error in update_typing_status: {e}")
+    async def start_typing(self):
+        """Only the start transition is broadcast; repeats just push back the idle deadline."""
+        now = time.monotonic()
+        self.typing_deadline = now + TYPING_IDLE_TIMEOUT
+        if self.is_typing and now - self.typing_refreshed_at < TYPING_TTL / 2:
+            return
 
-    @database_sync_to_async
-    def clear_typing_status(self):
-        try:
-            expense = Expense.objects.get(id=self.expense_id)
-            collaborator = Collaborator.objects.get(
-                event=expense.budget.event,
-                user=self.user
-            )
+        # Refresh the presence entry well before its TTL runs out
+        self.typing_refreshed_at = now
+        await self.update_typing_status(True)
+        if not self.is_typing:
+            self.is_typing = True
+            self.queue_typing(True)
+            self.typing_watcher = asyncio.ensure_future(self.watch_typing_idle())
 
-            TypingStatus.objects.filter(
-                expense=expense,
-                collaborator=collaborator
-            ).delete()
-            print(f"Cleared typing status for user {self.user.email}")
-            
-        except (Expense.DoesNotExist, Collaborator.DoesNotExist) as e:
-            print(f"Error clearing typing status: {e}")
-        except Exception as e:
-            print(f"Unexpected error clearing typing status: {e}")
+    async def stop_typing(self):
+        if not self.is_typing:
+            return
+        self.is_typing = False
+        await self.update_typing_status(False)
+        self.queue_typing(False)
+
+    async def watch_typing_idle(self):
+        """Trailing timeout: broadcast a stop once the typist goes quiet."""
+        while self.is_typing:
+            remaining = self.typing_deadline - time.monotonic()
+            if remaining <= 0:
+                await self.stop_typing()
+                break
+            await asyncio.sleep(remaining)
+
+    def queue_typing(self, is_typing):
+        typing_broadcaster.queue(
+            self.channel_layer, self.room_group_name, self.user.pk, self.display_name, is_typing
+        )
+
+    async def update_typing_status(self, is_typing):
+        # Typing state lives in the presence store only, never in the database
+        presence = get_presence()
+        if is_typing:
+            await sync_to_async(presence.set_typing)(self.expense_id, self.user.pk, self.user.firstname)
+        else:
+            await sync_to_async(presence.clear)(self.expense_id, self.user.pk)
+
+    async def clear_typing_status(self):
+        await sync_to_async(get_presence().clear)(self.expense_id, self.user.pk)
 
     # @database_sync_to_async
     # def create_comment(self, comment_data):
@@ -298,20 +463,10 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def create_comment(self, comment_data):
-        """Create comment with same validation as HTTP API"""
+        """Create comment with same validation as HTTP API, using the access resolved at connect"""
         try:
-            from django.contrib.contenttypes.models import ContentType
-            
-            # Get and validate expense
-            expense = Expense.objects.get(id=self.expense_id)
-            
-            # Get collaborator (same as HTTP API)
-            try:
-                collaborator = Collaborator.objects.get(
-                    event=expense.budget.event,
-                    user=self.user
-                )
-            except Collaborator.DoesNotExist:
+            # Owners without a collaborator record can read but not comment (same as HTTP API)
+            if self.collaborator is None:
                 print(f"User {self.user.email} is not a collaborator for expense {self.expense_id}")
                 return {
                     'error': 'authorization_failed',
@@ -327,43 +482,40 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
                 }
             
             # Handle parent comment validation
-            parent_comment = None
             parent_id = comment_data.get('parent')
             
             if parent_id:
-                try:
-                    parent_comment = Comment.objects.get(id=parent_id)
-                    
-                    # Validate parent belongs to same expense
-                    expense_content_type = ContentType.objects.get_for_model(Expense)
-                    if (parent_comment.content_type != expense_content_type or 
-                        str(parent_comment.object_id) != str(expense.id)):
-                        return {
-                            'error': 'validation_failed',
-                            'message': 'Parent comment must belong to the same expense'
-                        }
-                    
-                    # Prevent deep nesting (same as HTTP API)
-                    if parent_comment.parent is not None:
-                        return {
-                            'error': 'validation_failed',
-                            'message': 'Cannot reply to a reply. Please reply to the original comment.'
-                        }
-                        
-                except Comment.DoesNotExist:
+                parent_comment = Comment.objects.filter(id=parent_id).values(
+                    'content_type_id', 'object_id', 'parent_id'
+                ).first()
+                if parent_comment is None:
                     return {
                         'error': 'validation_failed',
                         'message': 'Parent comment not found'
                     }
+                
+                # Validate parent belongs to same expense
+                if (parent_comment['content_type_id'] != self.content_type.pk or 
+                    str(parent_comment['object_id']) != str(self.expense.id)):
+                    return {
+                        'error': 'validation_failed',
+                        'message': 'Parent comment must belong to the same expense'
+                    }
+                
+                # Prevent deep nesting (same as HTTP API)
+                if parent_comment['parent_id'] is not None:
+                    return {
+                        'error': 'validation_failed',
+                        'message': 'Cannot reply to a reply. Please reply to the original comment.'
+                    }
             
             # Create the comment
-            expense_content_type = ContentType.objects.get_for_model(Expense)
             comment = Comment.objects.create(
-                content_type=expense_content_type,
-                object_id=str(expense.id),
-                author=collaborator,
+                content_type=self.content_type,
+                object_id=str(self.expense.id),
+                author=self.collaborator,
                 content=content,
-                parent=parent_comment
+                parent_id=parent_id or None
             )
             
             # Return success response with all comment details
@@ -373,23 +525,17 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
                     'id': str(comment.id),
                     'content': comment.content,
                     'author': {
-                        'id': str(collaborator.user.id),
-                        'name': f"{collaborator.user.first_name} {collaborator.user.last_name}".strip() or collaborator.user.email,
-                        'email': collaborator.user.email
+                        'id': str(self.user.id),
+                        'name': self.display_name,
+                        'email': self.user.email
                     },
-                    'parent_id': str(parent_comment.id) if parent_comment else None,
-                    'is_reply': parent_comment is not None,
+                    'parent_id': str(parent_id) if parent_id else None,
+                    'is_reply': bool(parent_id),
                     'created_at': comment.created_at.isoformat(),
                     'replies': []  # New comments don't have replies yet
                 }
             }
             
-        except Expense.DoesNotExist:
-            print(f"Expense {self.expense_id} not found")
-            return {
-                'error': 'not_found',
-                'message': 'Expense not found'
-            }
         except Exception as e:
             print(f"Error creating comment: {e}")
             return {
@@ -397,53 +543,105 @@ class ExpenseCommentConsumer(AsyncWebsocketConsumer):
                 'message': 'An unexpected error occurred while creating the comment'
             }
         
+    def expense_comments(self):
+        return Comment.objects.filter(
+            content_type=self.content_type,
+            object_id=str(self.expense.id)
+        ).select_related('author__user')
+
+    def page_comments(self, queryset, before, after, limit):
+        """
+        One keyset probe of `limit + 1` rows in the paging direction.
+        Returns the page in chronological order and whether more rows remain.
+        """
+        if before and after:
+            raise ValueError('Use either before or after, not both')
+        if after:
+            created_at, pkid = decode_comment_cursor(after)
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pkid__gt=pkid)
+            ).order_by('created_at', 'pkid')
+        else:
+            queryset = queryset.order_by('-created_at', '-pkid')
+            if before:
+                created_at, pkid = decode_comment_cursor(before)
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, pkid__lt=pkid)
+                )
+
+        rows = list(queryset[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not after:
+            rows.reverse()
+        return rows, has_more
+
     @database_sync_to_async
-    def get_comments(self):
-        """Get all comments for the expense (optional method for loading existing comments)"""
+    def get_comments(self, request):
+        """A page of root comments with a window of replies per thread, in two queries."""
+        limit = bounded_size(request.get('limit'), COMMENT_PAGE_SIZE, 1, MAX_COMMENT_PAGE_SIZE)
+        reply_limit = bounded_size(request.get('reply_limit'), REPLY_WINDOW, 0, MAX_REPLY_WINDOW)
+
+        # The sliced prefetch is applied per thread by the database, and read
+        # back through to_attr so nothing re-queries it
+        replies = Comment.objects.select_related('author__user').order_by('created_at', 'pkid')
+        roots = self.expense_comments().filter(parent=None).annotate(
+            reply_count=Count('replies')
+        ).prefetch_related(
+            Prefetch('replies', queryset=replies[:reply_limit], to_attr='reply_window')
+        )
+
         try:
-            from django.contrib.contenttypes.models import ContentType
-            
-            expense_content_type = ContentType.objects.get_for_model(Expense)
-            comments = Comment.objects.filter(
-                content_type=expense_content_type,
-                object_id=str(self.expense_id),
-                parent=None  # Only root comments
-            ).select_related('author__user').prefetch_related('replies__author__user').order_by('created_at')
-            
-            result = []
-            for comment in comments:
-                comment_data = {
-                    'id': str(comment.id),
-                    'content': comment.content,
-                    'author': {
-                        'id': str(comment.author.user.id),
-                        'name': f"{comment.author.user.first_name} {comment.author.user.last_name}".strip() or comment.author.user.email,
-                        'email': comment.author.user.email
-                    },
-                    'created_at': comment.created_at.isoformat(),
-                    'is_reply': False,
-                    'replies': []
-                }
-                
-                # Add replies
-                for reply in comment.replies.all().order_by('created_at'):
-                    reply_data = {
-                        'id': str(reply.id),
-                        'content': reply.content,
-                        'author': {
-                            'id': str(reply.author.user.id),
-                            'name': f"{reply.author.user.first_name} {reply.author.user.last_name}".strip() or reply.author.user.email,
-                            'email': reply.author.user.email
-                        },
-                        'parent_id': str(comment.id),
-                        'created_at': reply.created_at.isoformat(),
-                        'is_reply': True
-                    }
-                    comment_data['replies'].append(reply_data)
-                
-                result.append(comment_data)
-            
-            return result
+            comments, has_more = self.page_comments(roots, request.get('before'), request.get('after'), limit)
+        except ValueError as e:
+            return {'error': 'validation_failed', 'message': str(e)}
+
+        result = []
+        for comment in comments:
+            comment_data = serialize_comment(comment)
+            comment_data['replies'] = [serialize_comment(reply) for reply in comment.reply_window]
+            comment_data['reply_count'] = comment.reply_count
+            comment_data['replies_after'] = (
+                encode_comment_cursor(comment.reply_window[-1])
+                if comment.reply_window and comment.reply_count > len(comment.reply_window)
+                else None
+            )
+            result.append(comment_data)
+
+        return {
+            'type': 'comments_list',
+            'comments': result,
+            'has_more': has_more,
+            'before': encode_comment_cursor(comments[0]) if comments else None,
+            'after': encode_comment_cursor(comments[-1]) if comments else None
+        }
+
+    @database_sync_to_async
+    def get_replies(self, request):
+        """The next page of one thread's replies, oldest first."""
+        parent_id = request.get('parent')
+        if not parent_id:
+            return {'error': 'validation_failed', 'message': 'Parent comment is required'}
+        limit = bounded_size(request.get('limit'), COMMENT_PAGE_SIZE, 1, MAX_COMMENT_PAGE_SIZE)
+
+        try:
+            replies = self.expense_comments().filter(parent_id=parent_id)
+            if request.get('after'):
+                replies, has_more = self.page_comments(replies, None, request['after'], limit)
+            else:
+                replies = list(replies.order_by('created_at', 'pkid')[:limit + 1])
+                has_more = len(replies) > limit
+                replies = replies[:limit]
+        except ValueError as e:
+            return {'error': 'validation_failed', 'message': str(e)}
         except Exception as e:
-            print(f"Error getting comments: {e}")
-            return []
\ No newline at end of file
+            print(f"Error getting replies: {e}")
+            return {'error': 'validation_failed', 'message': 'Parent comment not found'}
+
+        return {
+            'type': 'replies_list',
+            'parent_id': str(parent_id),
+            'replies': [serialize_comment(reply) for reply in replies],
+            'has_more': has_more,
+            'after': encode_comment_cursor(replies[-1]) if replies else None
+        }
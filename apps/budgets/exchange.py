@@ -0,0 +1,100 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, DecimalField, Func, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .models import ExchangeRate
+
+
+RATE_CACHE_TIMEOUT = 60 * 60 * 24
+RATE_FIELD = DecimalField(max_digits=20, decimal_places=10)
+# Bumped whenever rates are loaded so every cached rate is dropped at once
+VERSION_KEY = 'exchange_rates:version'
+
+
+class MissingExchangeRate(LookupError):
+    pass
+
+
+class Reciprocal(Func):
+    # A literal 1.0 keeps SQLite from doing integer division on whole-number rates
+    template = '(1.0 / %(expressions)s)'
+    output_field = RATE_FIELD
+
+
+def base_currency():
+    return settings.EXCHANGE_BASE_CURRENCY
+
+
+def rates_version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def bump_rates_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def rate_to_base(currency, on=None):
+    """Rate of `currency` in the base currency effective on `on` (default today), or None."""
+    if currency == base_currency():
+        return Decimal('1')
+    on = on or timezone.localdate()
+    key = f'exchange_rates:{rates_version()}:{currency}:{on.isoformat()}'
+    rate = cache.get(key, '')
+    if rate == '':
+        rate = (
+            ExchangeRate.objects
+            .filter(base_currency=base_currency(), currency=currency, effective_date__lte=on)
+            .order_by('-effective_date')
+            .values_list('rate', flat=True)
+            .first()
+        )
+        # Misses are cached as well so unknown currencies do not hit the table each time
+        cache.set(key, rate, timeout=RATE_CACHE_TIMEOUT)
+    return rate
+
+
+def convert(amount, from_currency, to_currency, on=None):
+    """Convert `amount` between currencies at the rates effective on `on`."""
+    if from_currency == to_currency:
+        return amount
+    from_rate = rate_to_base(from_currency, on)
+    to_rate = rate_to_base(to_currency, on)
+    if from_rate is None or to_rate is None:
+        raise MissingExchangeRate(f'No exchange rate from {from_currency} to {to_currency} on {on or timezone.localdate()}')
+    return (Decimal(amount) * from_rate / to_rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def latest_rate(currency, on):
+    """Subquery for the base-currency rate of `currency` effective on the outer query's `on` field."""
+    return Subquery(
+        ExchangeRate.objects.filter(
+            base_currency=base_currency(), currency=currency, effective_date__lte=OuterRef(on)
+        ).order_by('-effective_date').values('rate')[:1],
+        output_field=RATE_FIELD,
+    )
+
+
+def conversion_rate_expression(currency_field, to_currency, on):
+    """
+    SQL multiplier taking an amount in the row's `currency_field` into
+    `to_currency` at the rates effective on the row's `on` date.
+    NULL when either rate is missing.
+    """
+    one = Value(Decimal('1'), output_field=RATE_FIELD)
+    from_rate = Case(
+        When(**{currency_field: base_currency()}, then=one),
+        default=latest_rate(OuterRef(currency_field), on),
+        output_field=RATE_FIELD,
+    )
+    to_rate = one if to_currency == base_currency() else latest_rate(to_currency, on)
+    return Case(
+        When(**{currency_field: to_currency}, then=one),
+        default=from_rate * Reciprocal(to_rate),
+        output_field=RATE_FIELD,
+    )
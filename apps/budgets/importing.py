@@ -0,0 +1,155 @@
+import codecs
+import csv
+import json
+import logging
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, transaction
+
+from apps.events.models import Collaborator
+from apps.user_notifications.notifications import send_expense_import_notifications
+from .alerts import evaluate_budget_alerts
+from .models import Budget, Expense
+from .serializers import ExpenseImportRowSerializer
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+# Expenses listed by name in each assignee's summary email
+SUMMARY_LISTED = 20
+
+
+def import_format(upload):
+    """'csv' or 'ndjson' from the upload's name or content type, None if neither."""
+    name = (upload.name or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or upload.content_type in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    if name.endswith('.csv') or upload.content_type == 'text/csv':
+        return 'csv'
+    return None
+
+
+def read_rows(upload, file_format):
+    """
+    Yield (row_number, data, error) per row. The upload is read a line at a
+    time, so large files never have to be held in memory.
+    """
+    lines = codecs.iterdecode(upload, 'utf-8-sig')
+    try:
+        if file_format == 'csv':
+            for row_number, row in enumerate(csv.DictReader(lines), start=1):
+                # Blank cells mean "not given", like a missing NDJSON key
+                yield row_number, {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}, None
+        else:
+            row_number = 0
+            for line in lines:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    yield row_number, None, {'non_field_errors': ['Invalid JSON']}
+                    continue
+                if not isinstance(data, dict):
+                    yield row_number, None, {'non_field_errors': ['Each line must be a JSON object']}
+                    continue
+                yield row_number, data, None
+    except UnicodeDecodeError:
+        yield None, None, {'non_field_errors': ['File must be UTF-8 encoded']}
+
+
+async def iterate_in_thread(results):
+    """
+    Async wrapper for a synchronous result generator. ASGI servers buffer a
+    sync iterator completely before sending anything, so each step is run
+    through sync_to_async instead and sent as soon as it is produced. Steps
+    share the request's sync thread, and with it its database connection.
+    """
+    done = object()
+    step = sync_to_async(next, thread_sensitive=True)
+    while (result := await step(results, done)) is not done:
+        yield result
+
+
+def load_collaborators(event):
+    """Every collaborator of the event, keyed by id and by lower-cased email."""
+    collaborators = {}
+    for collaborator in Collaborator.objects.filter(event=event).select_related('user'):
+        collaborators[str(collaborator.pk)] = collaborator
+        collaborators[collaborator.user.email.lower()] = collaborator
+    return collaborators
+
+
+def save_chunk(chunk):
+    """Insert a chunk of (row_number, expense) with one INSERT and one rollup UPDATE, then check alerts."""
+    expenses = [expense for _, expense in chunk]
+    with transaction.atomic():
+        Expense.objects.bulk_create(expenses)
+        spend_changed = Budget.objects.apply_expense_changes([(None, expense.rollup_state()) for expense in expenses])
+        if spend_changed:
+            evaluate_budget_alerts(spend_changed)
+
+
+def import_expenses(budget, rows, actor, chunk_size=None):
+    """
+    Validate and insert `rows` (from `read_rows`) into `budget` a chunk at a time.
+    Yields a dict per rejected row, one per saved chunk and a final summary.
+    Bulk inserts skip the per-expense signals, so assignees get one summary
+    notification each at the end instead of one per expense.
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    event = budget.event
+    context = {'collaborators': load_collaborators(event)}
+    import_id = uuid.uuid4()
+    assignments = defaultdict(lambda: {'count': 0, 'expenses': []})
+    totals = {'rows': 0, 'imported': 0, 'failed': 0}
+    chunk = []
+
+    def flush():
+        try:
+            save_chunk(chunk)
+        except DatabaseError as e:
+            logger.error(f"Expense import {import_id} failed for rows {chunk[0][0]}-{chunk[-1][0]}: {e}")
+            totals['failed'] += len(chunk)
+            return {
+                'type': 'error',
+                'rows': [chunk[0][0], chunk[-1][0]],
+                'errors': {'non_field_errors': ['These rows could not be saved']},
+            }
+        for _, expense in chunk:
+            assigned = assignments[expense.assignee.user]
+            assigned['count'] += 1
+            if len(assigned['expenses']) < SUMMARY_LISTED:
+                assigned['expenses'].append(expense)
+        totals['imported'] += len(chunk)
+        return {'type': 'progress', **totals}
+
+    for row_number, data, error in rows:
+        if row_number is not None:
+            totals['rows'] += 1
+        if error is None:
+            serializer = ExpenseImportRowSerializer(data=data, context=context)
+            if serializer.is_valid():
+                chunk.append((row_number, Expense(budget=budget, **serializer.validated_data)))
+            else:
+                error = serializer.errors
+        if error is not None:
+            totals['failed'] += 1
+            yield {'type': 'error', 'row': row_number, 'errors': error}
+
+        if len(chunk) >= chunk_size:
+            yield flush()
+            chunk = []
+
+    if chunk:
+        yield flush()
+
+    if assignments:
+        with transaction.atomic():
+            send_expense_import_notifications(event, actor, assignments, import_id)
+
+    yield {'type': 'summary', 'import_id': str(import_id), **totals}
@@ -0,0 +1,62 @@
+# apps/budgets/management/commands/backfill_budget_snapshots.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.budgets.models import Budget
+from apps.budgets.snapshots import SNAPSHOT_CHUNK_SIZE, backfill_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Write daily budget snapshots for past days from expense creation dates. '
+        'Expenses are counted with their current status and costs, as earlier values are not kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='First day to backfill (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to backfill (YYYY-MM-DD, default: yesterday)')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=SNAPSHOT_CHUNK_SIZE,
+            help=f'Number of budgets processed per batch (default: {SNAPSHOT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Replace snapshots that already exist instead of keeping them',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many snapshots would be written without writing them',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_date(options['start'])
+            end = parse_date(options['end']) if options['end'] else timezone.localdate() - datetime.timedelta(days=1)
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            raise CommandError('--start and --end must be dates (YYYY-MM-DD)')
+        if start > end:
+            raise CommandError('--start must not be after --end')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        days = (end - start).days + 1
+        if options['dry_run']:
+            budgets = Budget.objects.filter(is_enabled=True).count()
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN - would write up to {budgets * days} snapshots ({budgets} budgets x {days} days)'
+            ))
+            return
+
+        written = backfill_snapshots(start, end, chunk_size=options['chunk_size'], overwrite=options['overwrite'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {start} to {end}: {written} snapshot rows processed'
+        ))
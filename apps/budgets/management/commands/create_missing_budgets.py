@@ -1,79 +1,92 @@
-# apps/budget/management/commands/create_missing_budgets.py
+# apps/budgets/management/commands/create_missing_budgets.py
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from djmoney.money import Money
+
+from apps.budgets.models import DEFAULT_ALERT_PERCENTS, Budget, BudgetAlertRule
 from apps.events.models import Event
-from apps.budgets.models import Budget
+
 
 class Command(BaseCommand):
     help = 'Create budgets for existing events that don\'t have them'
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of events handled per batch (default: 1000)',
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=float,
+            default=None,
+            help='Stop after the batch that passes this many seconds; the rest is picked up on the next run',
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
-            help='Show what would be created without actually creating budgets',
+            help='Count the events that need budgets without creating any',
         )
 
     def handle(self, *args, **options):
-        # Find events without budgets
-        events_without_budgets = Event.objects.filter(budget__isnull=True)
-        total_events = events_without_budgets.count()
-        
-        if total_events == 0:
-            self.stdout.write(
-                self.style.SUCCESS('All events already have budgets!')
-            )
+        chunk_size = options['chunk_size']
+        max_seconds = options['max_seconds']
+        dry_run = options['dry_run']
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size must be at least 1'))
             return
-        
-        self.stdout.write(f'Found {total_events} events without budgets')
-        
-        if options['dry_run']:
-            self.stdout.write(
-                self.style.WARNING('DRY RUN - No budgets will be created')
+
+        started = time.monotonic()
+        events = Event.objects.filter(budget__isnull=True).order_by('pkid').values_list('pkid', 'id')
+        last_pkid = 0
+        found = 0
+        created = 0
+
+        while True:
+            chunk = list(events.filter(pkid__gt=last_pkid)[:chunk_size])
+            if not chunk:
+                break
+            last_pkid = chunk[-1][0]
+            found += len(chunk)
+
+            if not dry_run:
+                created += self.create_budgets([event_id for _, event_id in chunk])
+            self.stdout.write(f'{found} events without budgets processed, {created} budgets created')
+
+            if max_seconds is not None and time.monotonic() - started >= max_seconds:
+                self.stdout.write(self.style.WARNING(
+                    f'Stopped after {max_seconds:g}s; remaining events will be handled on the next run'
+                ))
+                return
+
+        if found == 0:
+            self.stdout.write(self.style.SUCCESS('All events already have budgets!'))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f'DRY RUN - {found} events need budgets, none created'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Successfully created {created} budgets!'))
+
+    def create_budgets(self, event_ids):
+        """
+        Insert disabled budgets for the given events, skipping any that gained a
+        budget since they were read. bulk_create bypasses the post_save signal,
+        so the default alert rules are added here for the rows that went in.
+        """
+        budgets = [
+            Budget(event_id=event_id, estimated_amount=Money(0, 'NGN'), is_enabled=False)
+            for event_id in event_ids
+        ]
+        with transaction.atomic():
+            Budget.objects.bulk_create(budgets, ignore_conflicts=True)
+            inserted = list(
+                Budget.objects.filter(id__in=[budget.id for budget in budgets]).values_list('id', flat=True)
             )
-            for event in events_without_budgets:
-                self.stdout.write(f'Would create budget for: {event.name} (ID: {event.id})')
-            return
-        
-        created_count = 0
-        failed_count = 0
-        
-        for event in events_without_budgets:
-            try:
-                budget, created = Budget.objects.get_or_create(
-                    event=event,
-                    defaults={
-                        'estimated_amount': Money(0, 'NGN'),
-                        'is_enabled': False
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✓ Created budget for: {event.name}')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f'Budget already exists for: {event.name}')
-                    )
-                    
-            except Exception as e:
-                failed_count += 1
-                self.stdout.write(
-                    self.style.ERROR(f'✗ Failed to create budget for {event.name}: {str(e)}')
-                )
-        
-        # Summary
-        self.stdout.write('-' * 50)
-        self.stdout.write(f'Total events processed: {total_events}')
-        self.stdout.write(f'Budgets created: {created_count}')
-        if failed_count > 0:
-            self.stdout.write(f'Failed: {failed_count}')
-        
-        if created_count > 0:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully created {created_count} budgets!'
-                )
-            )
\ No newline at end of file
+            BudgetAlertRule.objects.bulk_create([
+                BudgetAlertRule(budget_id=budget_id, percent=percent)
+                for budget_id in inserted
+                for percent in DEFAULT_ALERT_PERCENTS
+            ], ignore_conflicts=True)
+        return len(inserted)
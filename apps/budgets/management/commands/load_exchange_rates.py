@@ -0,0 +1,87 @@
+# apps/budgets/management/commands/load_exchange_rates.py
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from apps.budgets.exchange import base_currency, bump_rates_version
+from apps.budgets.models import ExchangeRate
+
+
+class Command(BaseCommand):
+    help = (
+        'Load exchange rates from a CSV file with currency, effective_date and rate columns '
+        '(and optionally base_currency). Rows for an existing pair and date are updated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to load')
+        parser.add_argument(
+            '--base',
+            help='Base currency for rows without a base_currency column (default: EXCHANGE_BASE_CURRENCY)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without saving any rates',
+        )
+
+    def handle(self, *args, **options):
+        default_base = (options['base'] or base_currency()).upper()
+        try:
+            with open(options['path'], newline='') as rates_file:
+                rates, errors = self.read_rates(csv.DictReader(rates_file), default_base)
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        for error in errors:
+            self.stderr.write(self.style.ERROR(error))
+        if errors:
+            raise CommandError(f'{len(errors)} invalid rows, nothing loaded')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'DRY RUN - {len(rates)} rates are valid, none saved'))
+            return
+
+        with transaction.atomic():
+            ExchangeRate.objects.bulk_create(
+                rates,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['base_currency', 'currency', 'effective_date'],
+                update_fields=['rate', 'updated_at'],
+            )
+            transaction.on_commit(bump_rates_version)
+        self.stdout.write(self.style.SUCCESS(f'Loaded {len(rates)} exchange rates'))
+
+    def read_rates(self, reader, default_base):
+        """Parse every row, keyed by (base, currency, date) so later rows in the file win."""
+        rates = {}
+        errors = []
+        for line, row in enumerate(reader, start=2):
+            currency = (row.get('currency') or '').strip().upper()
+            base = (row.get('base_currency') or default_base).strip().upper()
+            try:
+                effective_date = parse_date((row.get('effective_date') or '').strip())
+            except ValueError:
+                effective_date = None
+            try:
+                rate = Decimal((row.get('rate') or '').strip())
+            except InvalidOperation:
+                rate = None
+
+            if len(currency) != 3 or len(base) != 3:
+                errors.append(f'Line {line}: currencies must be 3-letter codes')
+            elif currency == base:
+                errors.append(f'Line {line}: {currency} cannot be quoted against itself')
+            elif effective_date is None:
+                errors.append(f'Line {line}: effective_date must be YYYY-MM-DD')
+            elif rate is None or not rate.is_finite() or rate <= 0:
+                errors.append(f'Line {line}: rate must be a positive number')
+            else:
+                rates[(base, currency, effective_date)] = ExchangeRate(
+                    base_currency=base, currency=currency, effective_date=effective_date, rate=rate
+                )
+        return list(rates.values()), errors
@@ -0,0 +1,57 @@
+# apps/budgets/management/commands/verify_budget_rollups.py
+from django.core.management.base import BaseCommand
+from apps.budgets.models import Budget, rollup_fields
+
+
+class Command(BaseCommand):
+    help = 'Recompute budget expense rollups from the expense table and repair any that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of budgets checked per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted budgets without repairing them',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size must be at least 1'))
+            return
+
+        fields = rollup_fields()
+        budgets = Budget.objects.order_by('pkid').values('pkid', 'id', *fields)
+        last_pkid = 0
+        checked = 0
+        drifted = 0
+
+        while True:
+            chunk = list(budgets.filter(pkid__gt=last_pkid)[:chunk_size])
+            if not chunk:
+                break
+            last_pkid = chunk[-1]['pkid']
+            checked += len(chunk)
+
+            expected = Budget.objects.rollups_from_expenses([budget['id'] for budget in chunk])
+            stale = []
+            for budget in chunk:
+                wrong = [field for field in fields if budget[field] != expected[budget['id']][field]]
+                if wrong:
+                    stale.append(budget['id'])
+                    self.stdout.write(self.style.WARNING(f"Budget {budget['id']}: {', '.join(wrong)} out of date"))
+
+            drifted += len(stale)
+            if stale and not dry_run:
+                Budget.objects.rebuild_rollups(stale)
+
+        verb = 'found' if dry_run else 'repaired'
+        self.stdout.write(
+            self.style.SUCCESS(f'Checked {checked} budgets, {verb} {drifted} with drifted rollups')
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["status", "due_date"], name="expense_status_due_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:04
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rollups(apps, schema_editor):
+    Budget = apps.get_model("budgets", "Budget")
+    Expense = apps.get_model("budgets", "Expense")
+
+    zero = Decimal("0")
+    aggregates = {
+        "expenses_count": Count("pkid"),
+        "expenses_estimated_total": Coalesce(Sum("estimated_cost"), zero),
+        "expenses_actual_total": Coalesce(Sum("actual_cost"), zero),
+    }
+    for status in ("paid", "pending", "cancelled"):
+        only = Q(status=status)
+        aggregates[f"{status}_count"] = Count("pkid", filter=only)
+        aggregates[f"{status}_estimated_total"] = Coalesce(Sum("estimated_cost", filter=only), zero)
+        aggregates[f"{status}_actual_total"] = Coalesce(Sum("actual_cost", filter=only), zero)
+
+    rows = Expense.objects.values("budget_id").annotate(**aggregates).order_by()
+    for row in rows.iterator():
+        Budget.objects.filter(id=row.pop("budget_id")).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0002_expense_expense_status_due_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budget",
+            name="cancelled_actual_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="cancelled_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="cancelled_estimated_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="expenses_actual_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="expenses_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="expenses_estimated_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="paid_actual_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="paid_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="paid_estimated_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="pending_actual_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="pending_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="pending_estimated_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:06
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_comments_count(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    Comment = apps.get_model("budgets", "Comment")
+    Expense = apps.get_model("budgets", "Expense")
+
+    expense_type = ContentType.objects.filter(app_label="budgets", model="expense").first()
+    if expense_type is None:
+        return
+    counts = (
+        Comment.objects.filter(content_type=expense_type)
+        .values("object_id").annotate(total=Count("pkid")).order_by()
+    )
+    for row in counts.iterator():
+        Expense.objects.filter(id=row["object_id"]).update(comments_count=row["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0003_budget_rollups"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="expense",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_comments_count, migrations.RunPython.noop),
+    ]
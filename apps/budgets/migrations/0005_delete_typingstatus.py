@@ -0,0 +1,16 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0004_expense_comments_count"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="TypingStatus",
+        ),
+    ]
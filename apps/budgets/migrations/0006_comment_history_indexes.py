@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0005_delete_typingstatus"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["content_type", "object_id", "created_at", "pkid"],
+                name="comment_target_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["parent", "created_at", "pkid"],
+                name="comment_parent_created_idx",
+            ),
+        ),
+    ]
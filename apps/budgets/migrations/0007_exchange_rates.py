@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0006_comment_history_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("currency", models.CharField(max_length=3)),
+                ("base_currency", models.CharField(max_length=3)),
+                ("effective_date", models.DateField()),
+                ("rate", models.DecimalField(decimal_places=10, max_digits=20)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Exchange rate",
+                "verbose_name_plural": "Exchange rates",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="exchangerate",
+            constraint=models.UniqueConstraint(
+                fields=("base_currency", "currency", "effective_date"),
+                name="exchange_rate_pair_date_unique",
+            ),
+        ),
+    ]
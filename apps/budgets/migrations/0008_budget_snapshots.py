@@ -0,0 +1,91 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0007_exchange_rates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BudgetSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "estimated_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("currency", models.CharField(max_length=3)),
+                ("expenses_count", models.PositiveIntegerField(default=0)),
+                (
+                    "expenses_estimated_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                (
+                    "expenses_actual_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                ("paid_count", models.PositiveIntegerField(default=0)),
+                (
+                    "paid_estimated_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                (
+                    "paid_actual_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                ("pending_count", models.PositiveIntegerField(default=0)),
+                (
+                    "pending_estimated_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                (
+                    "pending_actual_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                ("cancelled_count", models.PositiveIntegerField(default=0)),
+                (
+                    "cancelled_estimated_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                (
+                    "cancelled_actual_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                ("taken_at", models.DateTimeField(auto_now=True)),
+                (
+                    "budget",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="budgets.budget",
+                        to_field="id",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Budget snapshot",
+                "verbose_name_plural": "Budget snapshots",
+                "ordering": ["day"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="budgetsnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("budget", "day"), name="budget_snapshot_day_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_default_alert_rules(apps, schema_editor):
+    Budget = apps.get_model("budgets", "Budget")
+    BudgetAlertRule = apps.get_model("budgets", "BudgetAlertRule")
+
+    budget_ids = Budget.objects.order_by("pkid").values_list("id", flat=True)
+    rules = (
+        BudgetAlertRule(budget_id=budget_id, percent=percent)
+        for budget_id in budget_ids.iterator()
+        for percent in (80, 100)
+    )
+    BudgetAlertRule.objects.bulk_create(rules, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgets", "0008_budget_snapshots"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BudgetAlertRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("percent", models.PositiveSmallIntegerField()),
+                ("is_active", models.BooleanField(default=True)),
+                ("is_triggered", models.BooleanField(default=False)),
+                ("last_triggered_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "budget",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_rules",
+                        to="budgets.budget",
+                        to_field="id",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Budget alert rule",
+                "verbose_name_plural": "Budget alert rules",
+                "ordering": ["percent"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="budgetalertrule",
+            constraint=models.UniqueConstraint(
+                fields=("budget", "percent"), name="budget_alert_rule_percent_unique"
+            ),
+        ),
+        migrations.RunPython(create_default_alert_rules, migrations.RunPython.noop),
+    ]
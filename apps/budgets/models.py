@@ -1,9 +1,119 @@
 # models.py
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from djmoney.models.fields import MoneyField
 from apps.events.models import TimeStampedUUIDModel, Collaborator, Event
+from eventnest.concurrency import VersionedModel
+from eventnest.tracking import FieldTrackerMixin
+
+
+BUDGET_CURRENCIES = ['GBP', 'USD', 'NGN']
+ROLLUP_STATUSES = ('paid', 'pending', 'cancelled')
+# Rollups that make up a budget's spend: actual costs of every expense that is not cancelled
+SPEND_FIELDS = ('expenses_actual_total', 'cancelled_actual_total')
+DEFAULT_ALERT_PERCENTS = (80, 100)
+
+
+def rollup_fields():
+    """Names of every rollup column on Budget."""
+    fields = ['expenses_count', 'expenses_estimated_total', 'expenses_actual_total']
+    for status in ROLLUP_STATUSES:
+        fields += [f'{status}_count', f'{status}_estimated_total', f'{status}_actual_total']
+    return fields
+
+
+def expense_rollup(status, estimated_cost, actual_cost):
+    """What a single expense contributes to its budget's rollup columns."""
+    estimated = getattr(estimated_cost, 'amount', estimated_cost) or Decimal('0')
+    actual = getattr(actual_cost, 'amount', actual_cost) or Decimal('0')
+    contribution = {
+        'expenses_count': 1,
+        'expenses_estimated_total': estimated,
+        'expenses_actual_total': actual,
+    }
+    if status in ROLLUP_STATUSES:
+        contribution.update({
+            f'{status}_count': 1,
+            f'{status}_estimated_total': estimated,
+            f'{status}_actual_total': actual,
+        })
+    return contribution
+
+
+class BudgetManager(models.Manager):
+    """
+    Keeps the rollup columns in step with the budget's expenses.
+    """
+
+    def apply_expense_change(self, old_state, new_state):
+        """
+        Move the rollups from an expense's old (budget_id, status, estimated, actual)
+        state to its new one. Either side may be None for creates and deletes.
+        Increments are applied with F() so concurrent edits are not lost.
+        Returns the ids of budgets whose spend changed.
+        """
+        return self.apply_expense_changes([(old_state, new_state)])
+
+    def apply_expense_changes(self, changes):
+        """
+        Apply many (old_state, new_state) pairs with one UPDATE per affected budget.
+        Returns the ids of budgets whose spend (actual totals) changed.
+        """
+        deltas = defaultdict(lambda: defaultdict(Decimal))
+        for old_state, new_state in changes:
+            for state, sign in ((old_state, -1), (new_state, 1)):
+                if state is None:
+                    continue
+                budget_id, status, estimated_cost, actual_cost = state
+                for field, value in expense_rollup(status, estimated_cost, actual_cost).items():
+                    deltas[budget_id][field] += sign * value
+
+        spend_changed = set()
+        for budget_id, changes in deltas.items():
+            changes = {field: F(field) + value for field, value in changes.items() if value}
+            if changes:
+                self.filter(id=budget_id).update(**changes)
+            if any(field in changes for field in SPEND_FIELDS):
+                spend_changed.add(budget_id)
+        return spend_changed
+
+    def rollups_from_expenses(self, budget_ids):
+        """Recompute rollup values from the expense table, keyed by budget id."""
+        aggregates = {
+            'expenses_count': Count('pkid'),
+            'expenses_estimated_total': Coalesce(Sum('estimated_cost'), Decimal('0')),
+            'expenses_actual_total': Coalesce(Sum('actual_cost'), Decimal('0')),
+        }
+        for status in ROLLUP_STATUSES:
+            only = Q(status=status)
+            aggregates.update({
+                f'{status}_count': Count('pkid', filter=only),
+                f'{status}_estimated_total': Coalesce(Sum('estimated_cost', filter=only), Decimal('0')),
+                f'{status}_actual_total': Coalesce(Sum('actual_cost', filter=only), Decimal('0')),
+            })
+
+        rollups = {budget_id: dict.fromkeys(rollup_fields(), 0) for budget_id in budget_ids}
+        rows = (
+            Expense.objects.filter(budget_id__in=budget_ids)
+            .values('budget_id').annotate(**aggregates).order_by()
+        )
+        for row in rows:
+            rollups[row.pop('budget_id')] = row
+        return rollups
+
+    def rebuild_rollups(self, budget_ids):
+        """Overwrite the rollup columns of the given budgets (by id) from their expenses."""
+        rollups = self.rollups_from_expenses(budget_ids)
+        with transaction.atomic():
+            for budget_id, values in rollups.items():
+                self.filter(id=budget_id).update(**values)
+        return rollups
 
 
 class Budget(TimeStampedUUIDModel):
@@ -15,26 +125,46 @@ class Budget(TimeStampedUUIDModel):
         default=0
     )
     is_enabled = models.BooleanField(default=False, help_text="Budget must be enabled to allow editing")
+
+    # Expense rollups, maintained by BudgetManager.apply_expense_change
+    expenses_count = models.PositiveIntegerField(default=0)
+    expenses_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    expenses_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    paid_count = models.PositiveIntegerField(default=0)
+    paid_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    paid_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    pending_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    pending_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    cancelled_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cancelled_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    objects = BudgetManager()
     
     def __str__(self):
         return f'{self.event.name} Budget - {"Enabled" if self.is_enabled else "Disabled"}'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Rollups only move through F() updates; never write back a stale copy
+            skipped = set(rollup_fields()) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
     
     
     @property
     def total_estimated_expenses(self):
-        """Calculate total estimated cost of all expenses"""
-        return sum(
-            expense.estimated_cost if expense.estimated_cost else 0 
-            for expense in self.expenses.all()
-        )
+        """Total estimated cost of all expenses"""
+        return self.expenses_estimated_total
     
     @property
     def total_actual_expenses(self):
-        """Calculate total actual cost of all expenses"""
-        return sum(
-            expense.actual_cost if expense.actual_cost else 0 
-            for expense in self.expenses.all()
-        )
+        """Total actual cost of all expenses"""
+        return self.expenses_actual_total
     
     @property
     def remaining_budget(self):
@@ -48,7 +178,7 @@ class Budget(TimeStampedUUIDModel):
         verbose_name_plural = "Budgets"
 
 
-class Expense(TimeStampedUUIDModel):
+class Expense(FieldTrackerMixin, TimeStampedUUIDModel, VersionedModel):
     STATUS_CHOICES = [
         ('paid', 'Paid'),
         ('pending', 'Pending'),
@@ -64,20 +194,48 @@ class Expense(TimeStampedUUIDModel):
     assignee = models.ForeignKey(Collaborator, on_delete=models.CASCADE, related_name='assigned_expenses')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     due_date = models.DateTimeField(null=True, blank=True)
+    # Maintained by the Comment post_save/post_delete receivers
+    comments_count = models.PositiveIntegerField(default=0)
+
+    tracked_fields = ('name', 'description', 'estimated_cost', 'actual_cost', 'status', 'due_date')
 
     def __str__(self):
         return f'{self.name} - {self.estimated_cost or "No estimate"}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        """The values the budget rollups depend on, or None if any of them is deferred."""
+        fields = ('budget_id', 'status', 'estimated_cost', 'actual_cost')
+        if any(field not in self.__dict__ for field in fields):
+            return None
+        return tuple(self.__dict__[field] for field in fields)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # comments_count only moves through F() updates; never write back a stale copy
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count' and field.attname not in deferred
+            ]
+        # The rollup update in post_save commits or rolls back with the expense
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     @property
     def currency(self):
         return self.budget.estimated_amount_currency
 
     @property
     def cost_difference(self):
-        """Calculate the difference between estimated and actual cost"""
-        if self.estimated_cost and self.actual_cost:
-            if self.estimated_cost.currency == self.actual_cost.currency:
-                return self.actual_cost - self.estimated_cost
+        """Calculate the difference between estimated and actual cost (both in the budget's currency)"""
+        if self.estimated_cost is not None and self.actual_cost is not None:
+            return self.actual_cost - self.estimated_cost
         return None
 
     @property
@@ -96,6 +254,97 @@ class Expense(TimeStampedUUIDModel):
         verbose_name = "Expense"
         verbose_name_plural = "Expenses"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'due_date'], name='expense_status_due_idx'),
+        ]
+
+
+class BudgetAlertRule(models.Model):
+    """
+    Alert when a budget's spend reaches `percent` of its amount. A rule fires
+    once when spend crosses it upwards and re-arms when spend drops below it.
+    Evaluated from the rollups on expense writes; see `apps.budgets.alerts`.
+    """
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='alert_rules', to_field='id')
+    percent = models.PositiveSmallIntegerField()
+    is_active = models.BooleanField(default=True)
+    is_triggered = models.BooleanField(default=False)
+    last_triggered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.budget_id} at {self.percent}%'
+
+    class Meta:
+        verbose_name = "Budget alert rule"
+        verbose_name_plural = "Budget alert rules"
+        ordering = ['percent']
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'percent'], name='budget_alert_rule_percent_unique'),
+        ]
+
+
+class BudgetSnapshot(models.Model):
+    """
+    A budget's totals at the end of one day, for spend-over-time charts.
+    Written by the `take_budget_snapshots` beat task; see `apps.budgets.snapshots`.
+    """
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='snapshots', to_field='id')
+    day = models.DateField()
+    estimated_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    currency = models.CharField(max_length=3)
+
+    # Copies of the budget's rollup columns on that day
+    expenses_count = models.PositiveIntegerField(default=0)
+    expenses_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    expenses_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    paid_count = models.PositiveIntegerField(default=0)
+    paid_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    paid_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    pending_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    pending_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    cancelled_estimated_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cancelled_actual_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    taken_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.budget_id} on {self.day}'
+
+    class Meta:
+        verbose_name = "Budget snapshot"
+        verbose_name_plural = "Budget snapshots"
+        ordering = ['day']
+        constraints = [
+            # Also the (budget, day) index the time-series endpoint reads through
+            models.UniqueConstraint(fields=['budget', 'day'], name='budget_snapshot_day_unique'),
+        ]
+
+
+class ExchangeRate(models.Model):
+    """
+    Value of one unit of `currency` in `base_currency`, effective from
+    `effective_date` until the pair's next row. Loaded with `load_exchange_rates`.
+    """
+    currency = models.CharField(max_length=3)
+    base_currency = models.CharField(max_length=3)
+    effective_date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'1 {self.currency} = {self.rate} {self.base_currency} from {self.effective_date}'
+
+    class Meta:
+        verbose_name = "Exchange rate"
+        verbose_name_plural = "Exchange rates"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['base_currency', 'currency', 'effective_date'], name='exchange_rate_pair_date_unique'
+            ),
+        ]
 
 
 class Comment(TimeStampedUUIDModel):
@@ -133,14 +382,7 @@ class Comment(TimeStampedUUIDModel):
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
         ordering = ['created_at']
-
-
-class TypingStatus(models.Model):
-    """Track who is currently typing in expense comments"""
-    expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='typing_users')
-    collaborator = models.ForeignKey(Collaborator, on_delete=models.CASCADE)
-    is_typing = models.BooleanField(default=True)
-    last_activity = models.DateTimeField(auto_now=True)
-    
-    class Meta:
-        unique_together = ['expense', 'collaborator']
\ No newline at end of file
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'created_at', 'pkid'], name='comment_target_created_idx'),
+            models.Index(fields=['parent', 'created_at', 'pkid'], name='comment_parent_created_idx'),
+        ]
@@ -1,17 +1,21 @@
 from rest_framework import permissions
 from django.shortcuts import get_object_or_404
+from apps.events.models import EventMembership
 from .models import Budget
 
 class IsEventCreator(permissions.BasePermission):
     def has_permission(self, request, view):
         budget_id = view.kwargs.get('budget_id')
-        print("User: ", request.user, budget_id)
         if not budget_id:
             return False
-        
-        budget = get_object_or_404(Budget, id=budget_id)
-        print("budget: ", budget)
-        return budget.event.collaborators.filter(
-            collaborator__user=request.user,
-            collaborator__role='ADMIN'
-        ).exists()
\ No newline at end of file
+
+        if EventMembership.objects.filter(
+            user=request.user,
+            event__budget__id=budget_id,
+            role__in=[EventMembership.Role.OWNER, EventMembership.Role.ADMIN]
+        ).exists():
+            return True
+
+        # Unknown budgets still 404 rather than 403
+        get_object_or_404(Budget.objects.only('pkid'), id=budget_id)
+        return False
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from django.conf import settings
+
+
+# A typist disappears this many seconds after their last typing event
+TYPING_TTL = 10
+
+
+class InMemoryTypingPresence:
+    """Process-local presence store, used with the in-memory channel layer (tests, local runs)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}
+
+    def set_typing(self, expense_id, user_key, name, ttl=TYPING_TTL):
+        with self._lock:
+            self._rooms.setdefault(str(expense_id), {})[str(user_key)] = (name, time.monotonic() + ttl)
+
+    def clear(self, expense_id, user_key):
+        with self._lock:
+            self._rooms.get(str(expense_id), {}).pop(str(user_key), None)
+
+    def typing_users(self, expense_id):
+        now = time.monotonic()
+        with self._lock:
+            room = self._rooms.get(str(expense_id), {})
+            for user_key, (_, expires_at) in list(room.items()):
+                if expires_at <= now:
+                    del room[user_key]
+            return [name for name, _ in room.values()]
+
+
+class RedisTypingPresence:
+    """
+    Presence in the channel layer's Redis. Each expense room is a sorted set of
+    typists scored by expiry time plus a hash of display names; entries expire
+    individually through their score and the keys themselves carry a TTL.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def keys(expense_id):
+        return f"typing:{expense_id}:expires", f"typing:{expense_id}:names"
+
+    def set_typing(self, expense_id, user_key, name, ttl=TYPING_TTL):
+        expires_key, names_key = self.keys(expense_id)
+        pipe = self.client.pipeline()
+        pipe.zadd(expires_key, {str(user_key): time.time() + ttl})
+        pipe.hset(names_key, str(user_key), name)
+        pipe.expire(expires_key, ttl)
+        pipe.expire(names_key, ttl)
+        pipe.execute()
+
+    def clear(self, expense_id, user_key):
+        expires_key, names_key = self.keys(expense_id)
+        pipe = self.client.pipeline()
+        pipe.zrem(expires_key, str(user_key))
+        pipe.hdel(names_key, str(user_key))
+        pipe.execute()
+
+    def typing_users(self, expense_id):
+        expires_key, names_key = self.keys(expense_id)
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(expires_key, '-inf', time.time())
+        pipe.zrange(expires_key, 0, -1)
+        pipe.hgetall(names_key)
+        _, active, names = pipe.execute()
+        return [names[user_key].decode() for user_key in active if user_key in names]
+
+
+def build_presence():
+    """Use the Redis behind the default channel layer when there is one."""
+    layer = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {})
+    if 'Redis' not in layer.get('BACKEND', ''):
+        return InMemoryTypingPresence()
+
+    import redis
+
+    config = layer.get('CONFIG', {})
+    options = {}
+    if 'ssl_cert_reqs' in config:
+        options['ssl_cert_reqs'] = config['ssl_cert_reqs']
+    return RedisTypingPresence(redis.Redis.from_url(config['hosts'][0], **options))
+
+
+_presence = None
+
+
+def get_presence():
+    global _presence
+    if _presence is None:
+        _presence = build_presence()
+    return _presence
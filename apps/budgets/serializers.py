@@ -1,9 +1,11 @@
 # serializers.py
 from rest_framework import serializers
 from djmoney.contrib.django_rest_framework.fields import MoneyField
-from .models import Budget, Expense, Comment, TypingStatus, ContentType
+from .models import BUDGET_CURRENCIES, Budget, BudgetAlertRule, BudgetSnapshot, Expense, Comment, ContentType
 from apps.events.serializers import CollaboratorSerializer
-from django.db.models import Sum
+from decimal import Decimal
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 
 
 
@@ -28,12 +30,36 @@ class BudgetSerializer(serializers.ModelSerializer):
 
 class BudgetUpdateSerializer(serializers.ModelSerializer):
     estimated_amount = MoneyField(max_digits=14, decimal_places=2)
-    estimated_amount_currency = serializers.ChoiceField(choices=['GBP', 'USD', 'NGN'])
+    estimated_amount_currency = serializers.ChoiceField(choices=BUDGET_CURRENCIES)
 
     class Meta:
         model = Budget
         fields = ['estimated_amount', 'estimated_amount_currency'] 
 
+class BudgetAlertRuleSerializer(serializers.ModelSerializer):
+    percent = serializers.IntegerField(min_value=1, max_value=1000)
+
+    class Meta:
+        model = BudgetAlertRule
+        fields = ['id', 'percent', 'is_active', 'is_triggered', 'last_triggered_at', 'created_at']
+        read_only_fields = ['id', 'is_triggered', 'last_triggered_at', 'created_at']
+
+    def validate_percent(self, value):
+        budget_id = self.context['view'].kwargs['budget_id']
+        rules = BudgetAlertRule.objects.filter(budget_id=budget_id, percent=value)
+        if self.instance:
+            rules = rules.exclude(pk=self.instance.pk)
+        if rules.exists():
+            raise serializers.ValidationError("This budget already has an alert at that percentage")
+        return value
+
+
+class BudgetSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BudgetSnapshot
+        exclude = ['id', 'budget', 'taken_at']
+
+
 class BudgetToggleResponseSerializer(serializers.Serializer):
     """Serializer for documenting the response of budget toggle"""
     message = serializers.CharField(read_only=True)
@@ -48,7 +74,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
     is_over_budget = serializers.ReadOnlyField()
     can_be_edited = serializers.ReadOnlyField()
     budget_name = serializers.CharField(source='budget.event.name', read_only=True)
-    comments_count = serializers.SerializerMethodField()
+    comments_count = serializers.IntegerField(read_only=True)
     currency = serializers.CharField(read_only=True)  # <-- comes from @property
 
     class Meta:
@@ -58,17 +84,9 @@ class ExpenseSerializer(serializers.ModelSerializer):
             'estimated_cost', 'actual_cost', 'currency',     # include currency
             'assignee', 'assignee_details',
             'status', 'due_date', 'cost_difference', 'is_over_budget',
-            'can_be_edited', 'comments_count', 'created_at', 'updated_at'
+            'can_be_edited', 'comments_count', 'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'budget', 'created_at', 'updated_at']
-
-    def get_comments_count(self, obj):
-        from django.contrib.contenttypes.models import ContentType
-        expense_content_type = ContentType.objects.get_for_model(Expense)
-        return Comment.objects.filter(
-            content_type=expense_content_type,
-            object_id=str(obj.id)
-        ).count()
+        read_only_fields = ['id', 'budget', 'version', 'created_at', 'updated_at']
 
 
 
@@ -93,6 +111,26 @@ class ExpenseCreateSerializer(serializers.ModelSerializer):
         return value
 
 
+class ExpenseImportRowSerializer(serializers.Serializer):
+    """One row of a bulk import, validated against collaborators preloaded into the context"""
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    estimated_cost = serializers.DecimalField(max_digits=14, decimal_places=2)
+    actual_cost = serializers.DecimalField(max_digits=14, decimal_places=2)
+    assignee = serializers.CharField(help_text="Collaborator id or the collaborator's email")
+    status = serializers.ChoiceField(choices=Expense.STATUS_CHOICES, default='pending')
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+
+    def validate_assignee(self, value):
+        """Ensure assignee is a collaborator of the event"""
+        collaborator = self.context['collaborators'].get(value.strip().lower())
+        if collaborator is None:
+            raise serializers.ValidationError(
+                "Assignee must be a collaborator of the event"
+            )
+        return collaborator
+
+
 class ExpenseUpdateSerializer(serializers.ModelSerializer):
     estimated_cost = MoneyField(max_digits=14, decimal_places=2, allow_null=True, required=False)
     actual_cost = MoneyField(max_digits=14, decimal_places=2, allow_null=True, required=False)
@@ -101,7 +139,7 @@ class ExpenseUpdateSerializer(serializers.ModelSerializer):
         model = Expense
         fields = [
             'name', 'description', 'estimated_cost', 'actual_cost', 
-            'assignee', 'status', 'due_date'
+            'assignee', 'status', 'due_date', 'version'
         ]
     
     def validate_assignee(self, value):
@@ -220,15 +258,6 @@ class CommentCreateSerializer(serializers.ModelSerializer):
 #         return value
 
 
-class TypingStatusSerializer(serializers.ModelSerializer):
-    collaborator_name = serializers.CharField(source='collaborator.user.get_full_name', read_only=True)
-    
-    class Meta:
-        model = TypingStatus
-        fields = ['collaborator', 'collaborator_name', 'is_typing', 'last_activity']
-        read_only_fields = ['collaborator', 'last_activity']
-
-
 # Additional serializers for detailed responses
 class ExpenseDetailSerializer(ExpenseSerializer):
     """Extended expense serializer with comments"""
@@ -259,23 +288,24 @@ class BudgetDetailSerializer(BudgetSerializer):
         fields = BudgetSerializer.Meta.fields + ['expenses_summary', 'recent_expenses']
     
     def get_expenses_summary(self, obj):
-        expenses = obj.expenses.all()
-
-        def summarize(qs):
-            return {
-                "count": qs.count(),
-                "estimated_cost": qs.aggregate(total=Sum("estimated_cost"))["total"] or 0,
-                "actual_cost": qs.aggregate(total=Sum("actual_cost"))["total"] or 0,
-            }
-
-        return {
-            "total": summarize(expenses),
-            "paid": summarize(expenses.filter(status="paid")),
-            "pending": summarize(expenses.filter(status="pending")),
-            "cancelled": summarize(expenses.filter(status="cancelled")),
-        }
+        # One GROUP BY status pass; the total is folded from the per-status rows
+        rows = obj.expenses.values("status").annotate(
+            count=Count("pkid"),
+            estimated_cost=Coalesce(Sum("estimated_cost"), Decimal("0")),
+            actual_cost=Coalesce(Sum("actual_cost"), Decimal("0")),
+        ).order_by()
+
+        empty = {"count": 0, "estimated_cost": 0, "actual_cost": 0}
+        summary = {"total": dict(empty), "paid": dict(empty), "pending": dict(empty), "cancelled": dict(empty)}
+        for row in rows:
+            status = row.pop("status")
+            if status in summary:
+                summary[status] = row
+            for key, value in row.items():
+                summary["total"][key] += value
+        return summary
 
     
     def get_recent_expenses(self, obj):
-        recent_expenses = obj.expenses.all()[:5]
-        return ExpenseSerializer(recent_expenses, many=True).data
\ No newline at end of file
+        recent_expenses = obj.expenses.select_related('budget__event', 'assignee__user')[:5]
+        return ExpenseSerializer(recent_expenses, many=True).data
@@ -0,0 +1,89 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.events.models import Collaborator
+from .alerts import evaluate_budget_alerts
+from .consumers import comment_access_group
+from .models import DEFAULT_ALERT_PERCENTS, Budget, BudgetAlertRule, Comment, Expense
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Expense)
+def update_budget_rollups(sender, instance, created, **kwargs):
+    """Apply the expense's change to its budget's rollup columns."""
+    old_state = None if created else getattr(instance, '_rollup_state', None)
+    new_state = instance.rollup_state()
+    if not created and old_state is None:
+        # Previous values unknown (deferred load): recompute from the table
+        Budget.objects.rebuild_rollups([instance.budget_id])
+        spend_changed = {instance.budget_id}
+    else:
+        spend_changed = Budget.objects.apply_expense_change(old_state, new_state)
+    instance._rollup_state = new_state
+    if spend_changed:
+        evaluate_budget_alerts(spend_changed)
+
+
+@receiver(post_delete, sender=Expense)
+def remove_from_budget_rollups(sender, instance, **kwargs):
+    """Subtract a deleted expense, including cascade deletes, from its budget's rollups."""
+    old_state = getattr(instance, '_rollup_state', None) or instance.rollup_state()
+    spend_changed = Budget.objects.apply_expense_change(old_state, None)
+    if spend_changed:
+        evaluate_budget_alerts(spend_changed)
+
+
+@receiver(post_save, sender=Budget)
+def create_default_alert_rules(sender, instance, created, **kwargs):
+    if created:
+        BudgetAlertRule.objects.bulk_create([
+            BudgetAlertRule(budget=instance, percent=percent) for percent in DEFAULT_ALERT_PERCENTS
+        ], ignore_conflicts=True)
+
+
+def adjust_expense_comments_count(comment, delta):
+    if comment.content_type_id != ContentType.objects.get_for_model(Expense).pk:
+        return
+    # Touch updated_at too: budget ETags cover the expense list, which shows the count
+    Expense.objects.filter(id=comment.object_id).update(
+        comments_count=F('comments_count') + delta, updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_expense_comment(sender, instance, created, **kwargs):
+    if created:
+        adjust_expense_comments_count(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_expense_comment(sender, instance, **kwargs):
+    """Runs for replies removed by cascade as well."""
+    adjust_expense_comments_count(instance, -1)
+
+
+def send_access_changed(user_pk, event_pk):
+    """Runs after commit, so a channel layer outage must not raise into the request."""
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            comment_access_group(user_pk),
+            {'type': 'access_changed', 'event_id': event_pk}
+        )
+    except Exception as e:
+        logger.error(f"Could not notify comment sockets of user {user_pk} about event {event_pk}: {str(e)}")
+
+
+@receiver(post_delete, sender=Collaborator)
+def revoke_comment_access(sender, instance, **kwargs):
+    """Open comment sockets cache the collaborator, so tell them to re-check access."""
+    user_pk, event_pk = instance.user_id, instance.event_id
+    transaction.on_commit(lambda: send_access_changed(user_pk, event_pk))
@@ -0,0 +1,114 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Budget, BudgetSnapshot, Expense, expense_rollup, rollup_fields
+
+
+SNAPSHOT_CHUNK_SIZE = 500
+
+
+def snapshot_rows(budgets, day, rollups):
+    """Unsaved snapshot rows from budget value dicts and their rollups keyed by budget id."""
+    return [
+        BudgetSnapshot(
+            budget_id=budget['id'],
+            day=day,
+            estimated_amount=budget['estimated_amount'],
+            currency=budget['estimated_amount_currency'],
+            **rollups[budget['id']],
+        )
+        for budget in budgets
+    ]
+
+
+def enabled_budget_chunks(chunk_size):
+    """Enabled budgets as value dicts, a keyset chunk at a time."""
+    budgets = (
+        Budget.objects.filter(is_enabled=True).order_by('pkid')
+        .values('pkid', 'id', 'estimated_amount', 'estimated_amount_currency', *rollup_fields())
+    )
+    last_pkid = 0
+    while True:
+        chunk = list(budgets.filter(pkid__gt=last_pkid)[:chunk_size])
+        if not chunk:
+            return
+        last_pkid = chunk[-1]['pkid']
+        yield chunk
+
+
+def take_snapshots(day=None, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Record today's (or `day`'s) snapshot of every enabled budget from its rollup
+    columns. Re-running on the same day overwrites that day's rows, so the last
+    run of the day is what the chart shows. Returns the number of rows written.
+    """
+    day = day or timezone.localdate()
+    fields = rollup_fields()
+    written = 0
+    for chunk in enabled_budget_chunks(chunk_size):
+        rollups = {budget['id']: {field: budget[field] for field in fields} for budget in chunk}
+        BudgetSnapshot.objects.bulk_create(
+            snapshot_rows(chunk, day, rollups),
+            update_conflicts=True,
+            unique_fields=['budget', 'day'],
+            update_fields=['estimated_amount', 'currency', 'taken_at', *fields],
+        )
+        written += len(chunk)
+    return written
+
+
+def historical_rollups(budget_ids, start, end):
+    """
+    Rollups of each budget at the end of every day from `start` to `end`,
+    rebuilt from expense creation dates with one grouped query. Expenses
+    count with their current status and costs, since earlier values are
+    not kept. Yields (day, {budget_id: rollup}) in day order.
+    """
+    fields = rollup_fields()
+    created = (
+        Expense.objects.filter(budget_id__in=budget_ids, created_at__date__lte=end)
+        .annotate(created_day=TruncDate('created_at'))
+        .values('budget_id', 'created_day', 'status')
+        .annotate(count=Count('pkid'), estimated=Sum('estimated_cost'), actual=Sum('actual_cost'))
+        .order_by('created_day')
+    )
+
+    running = {budget_id: dict.fromkeys(fields, 0) for budget_id in budget_ids}
+    additions = defaultdict(list)
+    for row in created:
+        additions[max(row['created_day'], start)].append(row)
+
+    day = start
+    while day <= end:
+        for row in additions.get(day, []):
+            contribution = expense_rollup(row['status'], row['estimated'] or Decimal('0'), row['actual'] or Decimal('0'))
+            for field, value in contribution.items():
+                # expense_rollup counts one expense; scale the counts to the group size
+                running[row['budget_id']][field] += row['count'] if field.endswith('_count') else value
+        yield day, running
+        day += datetime.timedelta(days=1)
+
+
+def backfill_snapshots(start, end, chunk_size=SNAPSHOT_CHUNK_SIZE, overwrite=False):
+    """Write snapshots for past days. Existing rows are kept unless `overwrite`. Returns rows written."""
+    fields = rollup_fields()
+    written = 0
+    for chunk in enabled_budget_chunks(chunk_size):
+        for day, rollups in historical_rollups([budget['id'] for budget in chunk], start, end):
+            rows = snapshot_rows(chunk, day, rollups)
+            if overwrite:
+                BudgetSnapshot.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=['budget', 'day'],
+                    update_fields=['estimated_amount', 'currency', 'taken_at', *fields],
+                )
+            else:
+                BudgetSnapshot.objects.bulk_create(rows, ignore_conflicts=True)
+            written += len(rows)
+    return written
@@ -0,0 +1,10 @@
+from celery import shared_task
+from django.utils import timezone
+from apps.budgets.snapshots import take_snapshots
+
+
+@shared_task
+def take_budget_snapshots():
+    """Record today's totals for every enabled budget; later runs the same day overwrite earlier ones"""
+    written = take_snapshots()
+    return f"Budget snapshots for {timezone.localdate()} completed, {written} budgets recorded"
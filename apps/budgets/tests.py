@@ -1,3 +1,1027 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from notifications.models import Notification
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.events.models import Collaborator, Event
+from apps.user_notifications.models import EmailOutbox
+from . import consumers, exchange, importing, presence, snapshots, tasks
+from .models import Budget, BudgetAlertRule, BudgetSnapshot, Comment, ExchangeRate, Expense
+
+User = get_user_model()
+
+
+class BudgetRollupTests(TestCase):
+    """Budget rollup columns follow expense creates, updates and deletes."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.budget = self.event.budget
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+
+    def add_expense(self, name, estimated, actual, status="pending"):
+        return Expense.objects.create(
+            budget=self.budget, name=name, assignee=self.collaborator,
+            estimated_cost=Decimal(estimated), actual_cost=Decimal(actual), status=status,
+        )
+
+    def rollups(self):
+        self.budget.refresh_from_db()
+        return self.budget
+
+    def test_saving_a_stale_budget_keeps_concurrent_increments(self):
+        stale = Budget.objects.get(pk=self.budget.pk)
+        self.add_expense("Venue", "100.00", "90.00")
+
+        stale.is_enabled = True
+        stale.save()
+
+        budget = self.rollups()
+        self.assertTrue(budget.is_enabled)
+        self.assertEqual((budget.expenses_count, budget.expenses_actual_total), (1, Decimal("90.00")))
+
+    def test_create_update_and_delete_keep_rollups_in_step(self):
+        venue = self.add_expense("Venue", "100.00", "90.00")
+        catering = self.add_expense("Catering", "50.00", "60.00", status="paid")
+
+        budget = self.rollups()
+        self.assertEqual(budget.expenses_count, 2)
+        self.assertEqual(budget.total_estimated_expenses, Decimal("150.00"))
+        self.assertEqual(budget.total_actual_expenses, Decimal("150.00"))
+        self.assertEqual((budget.pending_count, budget.paid_count), (1, 1))
+
+        venue = Expense.objects.get(pk=venue.pk)
+        venue.status = "paid"
+        venue.actual_cost = Decimal("95.00")
+        venue.save()
+
+        budget = self.rollups()
+        self.assertEqual((budget.pending_count, budget.paid_count), (0, 2))
+        self.assertEqual(budget.paid_actual_total, Decimal("155.00"))
+        self.assertEqual(budget.pending_actual_total, Decimal("0.00"))
+
+        catering.delete()
+
+        budget = self.rollups()
+        self.assertEqual(budget.expenses_count, 1)
+        self.assertEqual(budget.expenses_actual_total, Decimal("95.00"))
+        self.assertEqual(budget.paid_estimated_total, Decimal("100.00"))
+
+    def test_cascade_delete_is_subtracted(self):
+        self.add_expense("Venue", "100.00", "90.00")
+
+        self.collaborator.delete()
+
+        budget = self.rollups()
+        self.assertEqual(budget.expenses_count, 0)
+        self.assertEqual(budget.expenses_actual_total, Decimal("0.00"))
+
+    def test_budget_serializer_does_not_load_expenses(self):
+        self.add_expense("Venue", "100.00", "90.00")
+        Budget.objects.filter(pk=self.budget.pk).update(estimated_amount=Decimal("500.00"))
+        budget = Budget.objects.get(pk=self.budget.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(budget.total_actual_expenses, Decimal("90.00"))
+            self.assertEqual(budget.remaining_budget, Decimal("410.00"))
+
+    def test_verify_command_repairs_drift(self):
+        self.add_expense("Venue", "100.00", "90.00")
+        Budget.objects.filter(pk=self.budget.pk).update(expenses_count=7, pending_actual_total=0)
+
+        out = StringIO()
+        call_command("verify_budget_rollups", stdout=out)
+
+        budget = self.rollups()
+        self.assertEqual(budget.expenses_count, 1)
+        self.assertEqual(budget.pending_actual_total, Decimal("90.00"))
+        self.assertIn("repaired 1", out.getvalue())
+
+
+class BudgetDetailQueryTests(APITestCase):
+    """The budget detail summary is one grouped query and its cost does not grow with expenses."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.budget = self.event.budget
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.client.force_authenticate(self.owner)
+        self.url = reverse("budget-detail", kwargs={"budget_id": self.budget.id})
+
+    def add_expenses(self, count):
+        for n in range(count):
+            Expense.objects.create(
+                budget=self.budget, name=f"Item {n}", assignee=self.collaborator,
+                estimated_cost=Decimal("10.00"), actual_cost=Decimal("8.00"),
+                status=("paid", "pending", "cancelled")[n % 3],
+            )
+
+    def fetch(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_summary_matches_expenses(self):
+        self.add_expenses(4)
+
+        summary = self.fetch()[0].data["expenses_summary"]
+
+        self.assertEqual(summary["total"], {"count": 4, "estimated_cost": Decimal("40.00"), "actual_cost": Decimal("32.00")})
+        self.assertEqual(summary["paid"]["count"], 2)
+        self.assertEqual(summary["cancelled"]["actual_cost"], Decimal("8.00"))
+
+    def test_query_count_is_constant(self):
+        self.add_expenses(5)
+        _, few = self.fetch()
+
+        self.add_expenses(20)
+        _, many = self.fetch()
+
+        self.assertEqual(few, many)
+
+    def test_update_response_carries_the_new_etag(self):
+        old = self.fetch()[0]["ETag"]
+
+        response = self.client.patch(
+            self.url, {"estimated_amount": "500.00", "estimated_amount_currency": "NGN"},
+            format="json", HTTP_IF_MATCH=old,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], old)
+        self.assertEqual(response["ETag"], self.fetch()[0]["ETag"])
+
+
+class ExpenseCommentCountTests(APITestCase):
+    """Expense comment counts are a maintained column, so expense pages cost the same at any size."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.budget = self.event.budget
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.client.force_authenticate(self.owner)
+
+    def add_expense(self, name):
+        return Expense.objects.create(
+            budget=self.budget, name=name, assignee=self.collaborator,
+            estimated_cost=Decimal("10.00"), actual_cost=Decimal("8.00"),
+        )
+
+    def comment(self, expense, content):
+        response = self.client.post(
+            reverse("expense-comments", kwargs={"expense_id": expense.id}), {"content": content}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        return Comment.objects.get(content=content)
+
+    def test_count_follows_comment_create_and_delete(self):
+        expense = self.add_expense("Venue")
+        first = self.comment(expense, "Deposit paid?")
+        self.comment(expense, "Yes")
+        Comment.objects.create(
+            content_type=first.content_type, object_id=first.object_id,
+            author=self.collaborator, content="Reply", parent=first,
+        )
+        expense.refresh_from_db()
+        self.assertEqual(expense.comments_count, 3)
+
+        # Deleting the parent also removes its reply
+        first.delete()
+        expense.refresh_from_db()
+        self.assertEqual(expense.comments_count, 1)
+
+    def test_stale_expense_save_keeps_comment_count(self):
+        expense = self.add_expense("Venue")
+        stale = Expense.objects.get(pk=expense.pk)
+        self.comment(expense, "Deposit paid?")
+
+        stale.name = "Main venue"
+        stale.save()
+
+        expense.refresh_from_db()
+        self.assertEqual(expense.comments_count, 1)
+
+    def test_new_comment_changes_the_budget_etag(self):
+        expense = self.add_expense("Venue")
+        url = reverse("budget-detail", kwargs={"budget_id": self.budget.id})
+        etag = self.client.get(url)["ETag"]
+
+        self.comment(expense, "Deposit paid?")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_expense_list_query_count_is_constant(self):
+        url = reverse("expense-list-create", kwargs={"budget_id": self.budget.id})
+        for n in range(3):
+            self.comment(self.add_expense(f"Item {n}"), f"Note {n}")
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url)
+        self.assertEqual(response.data["results"][0]["comments_count"], 1)
+
+        for n in range(3, 10):
+            self.comment(self.add_expense(f"Item {n}"), f"Note {n}")
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+
+        self.assertEqual(len(few), len(many))
+
+
+class TypingPresenceTests(APITestCase):
+    """Typing state lives in the presence store; the endpoints never write it to the database."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.expense = Expense.objects.create(
+            budget=self.event.budget, name="Venue", assignee=self.collaborator,
+            estimated_cost=Decimal("10.00"), actual_cost=Decimal("8.00"),
+        )
+        self.client.force_authenticate(self.owner)
+        self.store = presence.InMemoryTypingPresence()
+        patcher = mock.patch.object(presence, "_presence", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def set_typing(self, is_typing):
+        url = reverse("update-typing", kwargs={"expense_id": self.expense.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"is_typing": is_typing}, format="json")
+        self.assertEqual(response.data, {"status": "updated"})
+        return queries
+
+    def typing_users(self):
+        url = reverse("get-typing-users", kwargs={"expense_id": self.expense.id})
+        return self.client.get(url).data["typing_users"]
+
+    def test_typing_round_trip_only_reads_membership(self):
+        queries = self.set_typing(True)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].lstrip().upper().startswith("SELECT"))
+        self.assertEqual(self.typing_users(), ["Ada"])
+
+        self.set_typing(False)
+        self.assertEqual(self.typing_users(), [])
+
+    def test_non_member_is_rejected(self):
+        outsider = User.objects.create_user("Bob", "Outsider", "bob@example.com", "pass1234")
+        self.client.force_authenticate(outsider)
+
+        url = reverse("update-typing", kwargs={"expense_id": self.expense.id})
+        response = self.client.post(url, {"is_typing": True}, format="json")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.store.typing_users(self.expense.id), [])
+
+    def test_entries_expire_after_ttl(self):
+        with mock.patch.object(presence.time, "monotonic", return_value=100.0):
+            self.store.set_typing(self.expense.id, self.owner.pk, "Ada", ttl=5)
+            self.store.set_typing(self.expense.id, "other", "Bob", ttl=20)
+
+        with mock.patch.object(presence.time, "monotonic", return_value=110.0):
+            self.assertEqual(self.store.typing_users(self.expense.id), ["Bob"])
+
+
+@mock.patch.object(consumers, "TYPING_FLUSH_INTERVAL", 0.05)
+@mock.patch.object(consumers, "TYPING_IDLE_TIMEOUT", 0.3)
+class TypingBroadcastTests(TestCase):
+    """Typing is edge-triggered per connection and coalesced per room."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.expense = Expense.objects.create(
+            budget=self.event.budget, name="Venue", assignee=self.collaborator,
+            estimated_cost=Decimal("10.00"), actual_cost=Decimal("8.00"),
+        )
+        patcher = mock.patch.object(presence, "_presence", presence.InMemoryTypingPresence())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def exchange(self, messages, settle):
+        """Send typing messages, wait `settle` seconds and return the typing frames received."""
+        async def run():
+            communicator = WebsocketCommunicator(consumers.ExpenseCommentConsumer.as_asgi(), "/")
+            communicator.scope["user"] = self.owner
+            communicator.scope["url_route"] = {"kwargs": {"expense_id": str(self.expense.id)}}
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            auth = await communicator.receive_json_from()
+            self.assertTrue(auth["authenticated"])
+
+            for message in messages:
+                await communicator.send_json_to(message)
+            await asyncio.sleep(settle)
+
+            frames = []
+            while not await communicator.receive_nothing(timeout=0.05):
+                frames.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return frames
+
+        return async_to_sync(run)()
+
+    def test_keystrokes_collapse_to_one_start(self):
+        frames = self.exchange([{"type": "typing", "is_typing": True}] * 25, settle=0.15)
+
+        self.assertEqual(frames, [{"type": "typing", "user": "Ada Owner", "is_typing": True}])
+
+    def test_idle_typist_is_stopped_by_trailing_timeout(self):
+        frames = self.exchange([{"type": "typing", "is_typing": True}], settle=0.5)
+
+        self.assertEqual([frame["is_typing"] for frame in frames], [True, False])
+        self.assertEqual(presence.get_presence().typing_users(self.expense.id), [])
+
+    def test_start_and_stop_inside_one_flush_send_only_the_stop(self):
+        frames = self.exchange(
+            [{"type": "typing", "is_typing": True}, {"type": "typing", "is_typing": False}], settle=0.15
+        )
+
+        self.assertEqual(frames, [{"type": "typing", "user": "Ada Owner", "is_typing": False}])
+
+
+class CommentConsumerAccessTests(APITestCase):
+    """Access is resolved once at connect; membership changes arrive as control messages."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.member = User.objects.create_user("Bola", "Member", "bola@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        owner_collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.collaborator = Collaborator.objects.create(user=self.member, event=self.event)
+        self.expense = Expense.objects.create(
+            budget=self.event.budget, name="Venue", assignee=owner_collaborator,
+            estimated_cost=Decimal("10.00"), actual_cost=Decimal("8.00"),
+        )
+
+    def connect(self):
+        communicator = WebsocketCommunicator(consumers.ExpenseCommentConsumer.as_asgi(), "/")
+        communicator.scope["user"] = self.member
+        communicator.scope["url_route"] = {"kwargs": {"expense_id": str(self.expense.id)}}
+        return communicator
+
+    def test_comment_message_costs_one_insert(self):
+        async def run():
+            communicator = self.connect()
+            await communicator.connect()
+            await communicator.receive_json_from()
+
+            count_queries = database_sync_to_async(lambda: len(connection.queries))
+            start = await count_queries()
+            await communicator.send_json_to({"type": "comment", "comment": {"content": "Deposit paid?"}})
+            frames = [await communicator.receive_json_from(), await communicator.receive_json_from()]
+            end = await count_queries()
+            await communicator.disconnect()
+            return frames, start, end
+
+        with CaptureQueriesContext(connection):
+            frames, start, end = async_to_sync(run)()
+            statements = [query["sql"].split()[0].upper() for query in connection.queries[start:end]]
+
+        created = next(frame for frame in frames if frame["type"] == "comment_created")
+        self.assertEqual(created["comment"]["author"]["name"], "Bola Member")
+        self.assertNotIn("SELECT", statements)
+        self.assertEqual(statements.count("INSERT"), 1)
+        self.assertEqual(Comment.objects.get().author, self.collaborator)
+
+    def test_removed_collaborator_is_disconnected(self):
+        async def run():
+            communicator = self.connect()
+            await communicator.connect()
+            await communicator.receive_json_from()
+
+            await database_sync_to_async(self.collaborator.delete)()
+            await get_channel_layer().group_send(
+                consumers.comment_access_group(self.member.pk),
+                {"type": "access_changed", "event_id": self.event.pk},
+            )
+            frame = await communicator.receive_json_from()
+            closed = await communicator.receive_output()
+            await communicator.disconnect()
+            return frame, closed
+
+        frame, closed = async_to_sync(run)()
+
+        self.assertEqual(frame["error_type"], "authorization_failed")
+        self.assertEqual(closed, {"type": "websocket.close", "code": 4003})
+
+    def test_collaborator_delete_sends_control_message(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(consumers.comment_access_group(self.member.pk), channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.collaborator.delete()
+
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message, {"type": "access_changed", "event_id": self.event.pk})
+
+    def test_channel_layer_outage_does_not_fail_the_delete(self):
+        self.client.force_authenticate(self.owner)
+        url = reverse("collabotator-detail", kwargs={"event_id": self.event.id, "pk": self.collaborator.pk})
+        layer = mock.Mock(group_send=mock.AsyncMock(side_effect=ConnectionError("redis is down")))
+
+        with mock.patch("apps.budgets.signals.get_channel_layer", return_value=layer):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(url)
+
+        self.assertEqual(response.status_code, 204)
+        layer.group_send.assert_awaited_once()
+        self.assertFalse(Collaborator.objects.filter(pk=self.collaborator.pk).exists())
+
+
+class CommentHistoryTests(TestCase):
+    """Comment history is paged by cursor with a bounded window of replies per thread."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.expense = Expense.objects.create(
+            budget=self.event.budget, name="Venue", assignee=self.collaborator,
+            estimated_cost=Decimal("10.00"), actual_cost=Decimal("8.00"),
+        )
+
+    def add_threads(self, count, replies):
+        content_type = ContentType.objects.get_for_model(Expense)
+        for n in range(count):
+            root = Comment.objects.create(
+                content_type=content_type, object_id=str(self.expense.id),
+                author=self.collaborator, content=f"Root {n}",
+            )
+            for r in range(replies):
+                Comment.objects.create(
+                    content_type=content_type, object_id=str(self.expense.id),
+                    author=self.collaborator, content=f"Reply {n}.{r}", parent=root,
+                )
+
+    def request(self, *messages):
+        """Send each message over one connection; returns (frames, query counts)."""
+        async def run():
+            communicator = WebsocketCommunicator(consumers.ExpenseCommentConsumer.as_asgi(), "/")
+            communicator.scope["user"] = self.owner
+            communicator.scope["url_route"] = {"kwargs": {"expense_id": str(self.expense.id)}}
+            await communicator.connect()
+            await communicator.receive_json_from()
+
+            count_queries = database_sync_to_async(lambda: len(connection.queries))
+            frames, counts = [], []
+            for message in messages:
+                start = await count_queries()
+                await communicator.send_json_to(message)
+                frames.append(await communicator.receive_json_from())
+                counts.append(await count_queries() - start)
+            await communicator.disconnect()
+            return frames, counts
+
+        with CaptureQueriesContext(connection):
+            return async_to_sync(run)()
+
+    def test_pages_walk_back_through_history(self):
+        self.add_threads(5, replies=0)
+
+        [latest], _ = self.request({"type": "get_comments", "limit": 2})
+        self.assertEqual([c["content"] for c in latest["comments"]], ["Root 3", "Root 4"])
+        self.assertTrue(latest["has_more"])
+
+        [older, newer], _ = self.request(
+            {"type": "get_comments", "limit": 2, "before": latest["before"]},
+            {"type": "get_comments", "limit": 2, "after": latest["before"]},
+        )
+        self.assertEqual([c["content"] for c in older["comments"]], ["Root 1", "Root 2"])
+        self.assertEqual([c["content"] for c in newer["comments"]], ["Root 4"])
+        self.assertFalse(newer["has_more"])
+
+    def test_replies_are_windowed_and_continued(self):
+        self.add_threads(1, replies=5)
+
+        [page], _ = self.request({"type": "get_comments", "reply_limit": 2})
+        [thread] = page["comments"]
+        self.assertEqual([r["content"] for r in thread["replies"]], ["Reply 0.0", "Reply 0.1"])
+        self.assertEqual(thread["reply_count"], 5)
+
+        [rest], _ = self.request({"type": "get_replies", "parent": thread["id"], "after": thread["replies_after"]})
+        self.assertEqual([r["content"] for r in rest["replies"]], ["Reply 0.2", "Reply 0.3", "Reply 0.4"])
+        self.assertFalse(rest["has_more"])
+
+    def test_page_cost_does_not_grow_with_threads(self):
+        self.add_threads(3, replies=2)
+        _, [few] = self.request({"type": "get_comments"})
+
+        self.add_threads(15, replies=8)
+        _, [many] = self.request({"type": "get_comments"})
+
+        self.assertEqual(few, many)
+        self.assertEqual(many, 2)
+
+    def test_bad_cursor_is_rejected(self):
+        [frame], _ = self.request({"type": "get_comments", "before": "not-a-cursor"})
+
+        self.assertEqual(frame["error_type"], "validation_failed")
+
+
+class ExchangeRateReportTests(APITestCase):
+    """Rates load from a file and the spend report converts every expense in SQL."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.client.force_authenticate(self.owner)
+        self.launch = self.add_event("Launch", "NGN", 100000)
+        self.tour = self.add_event("Tour", "USD", 500)
+
+    def add_event(self, name, currency, amount):
+        start = timezone.now() + timedelta(days=3)
+        event = Event.objects.create(
+            owner=self.owner, name=name, type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        Budget.objects.filter(pk=event.budget.pk).update(estimated_amount=amount, estimated_amount_currency=currency)
+        event.collaborator = Collaborator.objects.create(user=self.owner, event=event)
+        return event
+
+    def add_expense(self, event, actual, days_ago=0):
+        expense = Expense.objects.create(
+            budget=event.budget, name="Item", assignee=event.collaborator,
+            estimated_cost=Decimal(actual), actual_cost=Decimal(actual),
+        )
+        if days_ago:
+            Expense.objects.filter(pk=expense.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def load_rates(self, rows):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as rates_file:
+            rates_file.write("currency,effective_date,rate\n" + "".join(f"{row}\n" for row in rows))
+        self.addCleanup(os.remove, rates_file.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("load_exchange_rates", rates_file.name, stdout=StringIO(), stderr=StringIO())
+
+    def report(self, currency):
+        response = self.client.get(reverse("spend-report"), {"currency": currency})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_expenses_convert_at_the_rate_effective_when_recorded(self):
+        today = timezone.localdate()
+        self.load_rates([
+            f"USD,{today - timedelta(days=30)},1500",
+            f"USD,{today - timedelta(days=5)},1600",
+        ])
+        self.add_expense(self.launch, "1000.00")
+        self.add_expense(self.tour, "10.00", days_ago=10)
+        self.add_expense(self.tour, "10.00")
+
+        report = self.report("NGN")
+
+        self.assertEqual(report["totals"]["actual_cost"], Decimal("32000.00"))
+        tour = next(row for row in report["events"] if row["event_name"] == "Tour")
+        self.assertEqual(tour["actual_cost"], Decimal("31000.00"))
+        self.assertEqual(tour["budget_amount"], Decimal("800000.00"))
+
+        usd = self.report("USD")
+        launch = next(row for row in usd["events"] if row["event_name"] == "Launch")
+        self.assertEqual(launch["actual_cost"], Decimal("0.63"))
+
+    def test_missing_rates_are_counted_not_guessed(self):
+        self.add_expense(self.tour, "10.00")
+
+        report = self.report("GBP")
+
+        self.assertEqual(report["totals"]["unconverted_count"], 1)
+        self.assertEqual(report["totals"]["actual_cost"], Decimal("0"))
+        self.assertIsNone(report["events"][0]["budget_amount"])
+
+    def test_reloading_rates_replaces_cached_values(self):
+        today = timezone.localdate()
+        self.load_rates([f"USD,{today},1500"])
+        self.assertEqual(exchange.convert(Decimal("2"), "USD", "NGN"), Decimal("3000.00"))
+
+        self.load_rates([f"USD,{today},1550"])
+
+        self.assertEqual(ExchangeRate.objects.count(), 1)
+        self.assertEqual(exchange.convert(Decimal("2"), "USD", "NGN"), Decimal("3100.00"))
+
+    def test_invalid_file_loads_nothing(self):
+        with self.assertRaises(CommandError):
+            self.load_rates(["USD,2026-01-01,1500", "EUR,yesterday,1700", "GBP,2024-02-30,2000"])
+
+        self.assertFalse(ExchangeRate.objects.exists())
+
+    def test_impossible_report_date_is_rejected(self):
+        response = self.client.get(reverse("spend-report"), {"currency": "NGN", "start": "2024-02-30"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_cost_difference_uses_budget_currency_amounts(self):
+        expense = Expense(estimated_cost=Decimal("100.00"), actual_cost=Decimal("120.00"))
+
+        self.assertEqual(expense.cost_difference, Decimal("20.00"))
+
+
+class ExpenseImportTests(APITestCase):
+    """Bulk imports stream results, insert in chunks and notify each assignee once."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.member = User.objects.create_user("Bola", "Member", "bola@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.budget = self.event.budget
+        Budget.objects.filter(pk=self.budget.pk).update(is_enabled=True)
+        self.owner_collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.member_collaborator = Collaborator.objects.create(user=self.member, event=self.event)
+        self.client.force_authenticate(self.owner)
+        self.url = reverse("expense-import", kwargs={"budget_id": self.budget.id})
+
+    def upload(self, name, content, chunk_size=None):
+        upload = SimpleUploadedFile(name, content.encode())
+        with mock.patch.object(importing, "IMPORT_CHUNK_SIZE", chunk_size or importing.IMPORT_CHUNK_SIZE):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, {"file": upload}, format="multipart")
+                self.assertEqual(response.status_code, 200)
+                lines = b"".join(response.streaming_content).decode().splitlines()
+        return [json.loads(line) for line in lines]
+
+    def test_csv_rows_are_imported_with_per_row_errors(self):
+        rows = ["name,estimated_cost,actual_cost,assignee,status"]
+        rows += [f"Item {n},10.00,8.00,{'bola@example.com' if n % 2 else self.owner_collaborator.pk},paid" for n in range(7)]
+        rows += ["Stray,10.00,8.00,nobody@example.com,paid", "No cost,,,bola@example.com,"]
+
+        results = self.upload("expenses.csv", "\n".join(rows) + "\n", chunk_size=3)
+
+        errors = [result for result in results if result["type"] == "error"]
+        self.assertEqual([error["row"] for error in errors], [8, 9])
+        self.assertIn("assignee", errors[0]["errors"])
+        self.assertEqual(len([result for result in results if result["type"] == "progress"]), 3)
+        self.assertEqual(results[-1]["type"], "summary")
+        self.assertEqual((results[-1]["rows"], results[-1]["imported"], results[-1]["failed"]), (9, 7, 2))
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.paid_count, 7)
+        self.assertEqual(self.budget.paid_actual_total, Decimal("56.00"))
+
+    def test_each_assignee_gets_one_summary(self):
+        lines = [
+            json.dumps({"name": f"Item {n}", "estimated_cost": "5", "actual_cost": "5", "assignee": "bola@example.com"})
+            for n in range(25)
+        ]
+
+        results = self.upload("expenses.ndjson", "\n".join(lines))
+
+        self.assertEqual(results[-1]["imported"], 25)
+        notifications = Notification.objects.filter(recipient=self.member)
+        self.assertEqual(notifications.count(), 1)
+        self.assertIn("25 new expenses", notifications.get().description)
+        [email] = EmailOutbox.objects.all()
+        self.assertEqual(email.recipients, ["bola@example.com"])
+        self.assertIn("and 5 more", email.html_body)
+
+    def test_query_count_does_not_grow_per_row(self):
+        def import_rows(count):
+            content = "name,estimated_cost,actual_cost,assignee\n" + "".join(
+                f"Item {n},1,1,bola@example.com\n" for n in range(count)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                self.upload("expenses.csv", content, chunk_size=100)
+            return len(queries)
+
+        self.assertEqual(import_rows(5), import_rows(60))
+
+    def test_unknown_format_is_rejected(self):
+        upload = SimpleUploadedFile("expenses.xlsx", b"data")
+
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ExpenseImportAsgiTests(TransactionTestCase):
+    """
+    Under the ASGI handler the import response goes out line by line. The
+    handler runs the view on its own thread, so the data has to be committed.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.member = User.objects.create_user("Bola", "Member", "bola@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        Budget.objects.filter(pk=event.budget.pk).update(is_enabled=True)
+        Collaborator.objects.create(user=self.member, event=event)
+        self.url = reverse("expense-import", kwargs={"budget_id": event.budget.id})
+
+    async def test_asgi_response_is_sent_as_each_chunk_is_saved(self):
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.owner)))()
+        content = "name,estimated_cost,actual_cost,assignee\n" + "".join(
+            f"Item {n},1,1,bola@example.com\n" for n in range(3)
+        )
+        body = encode_multipart(BOUNDARY, {"file": SimpleUploadedFile("expenses.csv", content.encode())})
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": self.url, "raw_path": self.url.encode(),
+            "query_string": b"", "root_path": "", "client": ("127.0.0.1", 5000), "server": ("testserver", 80),
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", MULTIPART_CONTENT.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"authorization", f"Bearer {token}".encode()),
+            ],
+        }
+        with mock.patch.object(importing, "IMPORT_CHUNK_SIZE", 1):
+            communicator = ApplicationCommunicator(ASGIHandler(), scope)
+            await communicator.send_input({"type": "http.request", "body": body})
+            start = await communicator.receive_output()
+            first = await communicator.receive_output()
+
+            self.assertEqual(start["status"], 200)
+            self.assertEqual(json.loads(first["body"]), {"type": "progress", "rows": 1, "imported": 1, "failed": 0})
+            # The first line went out before the rest of the file was imported
+            self.assertEqual(await Expense.objects.acount(), 1)
+
+            message = first
+            while message.get("more_body"):
+                message = await communicator.receive_output()
+                if message.get("body"):
+                    last = json.loads(message["body"])
+        self.assertEqual((last["type"], last["imported"]), ("summary", 3))
+
+
+class BudgetSnapshotTests(APITestCase):
+    """Daily snapshots are written from the rollups and served as a time series."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.budget = self.event.budget
+        Budget.objects.filter(pk=self.budget.pk).update(is_enabled=True, estimated_amount=Decimal("500.00"))
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.client.force_authenticate(self.owner)
+        self.today = timezone.localdate()
+
+    def add_expense(self, actual, status="pending", days_ago=0):
+        expense = Expense.objects.create(
+            budget=self.budget, name="Item", assignee=self.collaborator,
+            estimated_cost=Decimal(actual), actual_cost=Decimal(actual), status=status,
+        )
+        if days_ago:
+            Expense.objects.filter(pk=expense.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_snapshot_copies_rollups_and_reruns_overwrite(self):
+        disabled = Event.objects.create(
+            owner=self.owner, name="Later", type="party",
+            start_date=timezone.now() + timedelta(days=9), end_date=timezone.now() + timedelta(days=9, hours=2),
+        )
+        self.add_expense("40.00", status="paid")
+        self.assertIn("1 budgets recorded", tasks.take_budget_snapshots.apply().get())
+
+        self.add_expense("10.00")
+        snapshots.take_snapshots()
+
+        snapshot = BudgetSnapshot.objects.get()
+        self.assertEqual(snapshot.budget_id, self.budget.id)
+        self.assertEqual((snapshot.expenses_count, snapshot.paid_count), (2, 1))
+        self.assertEqual(snapshot.expenses_actual_total, Decimal("50.00"))
+        self.assertFalse(BudgetSnapshot.objects.filter(budget=disabled.budget).exists())
+
+    def test_series_is_read_from_the_snapshot_table(self):
+        for days_ago in (5, 2, 0):
+            snapshots.take_snapshots(day=self.today - timedelta(days=days_ago))
+        url = reverse("budget-snapshots", kwargs={"budget_id": self.budget.id})
+
+        response = self.client.get(url, {"start": str(self.today - timedelta(days=3))})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["day"] for row in response.data], [str(self.today - timedelta(days=2)), str(self.today)])
+        self.assertEqual(response.data[0]["estimated_amount"], "500.00")
+
+    def test_impossible_dates_are_rejected(self):
+        url = reverse("budget-snapshots", kwargs={"budget_id": self.budget.id})
+
+        self.assertEqual(self.client.get(url, {"start": "2024-02-30"}).status_code, 400)
+        with self.assertRaises(CommandError):
+            call_command("backfill_budget_snapshots", "--start", "2024-02-30", stdout=StringIO())
+
+    def test_backfill_rebuilds_past_days_from_creation_dates(self):
+        self.add_expense("30.00", status="paid", days_ago=3)
+        self.add_expense("20.00", days_ago=1)
+        snapshots.take_snapshots(day=self.today - timedelta(days=1))
+
+        call_command(
+            "backfill_budget_snapshots", "--start", str(self.today - timedelta(days=4)), stdout=StringIO()
+        )
+
+        series = list(BudgetSnapshot.objects.values_list("day", "expenses_count", "paid_actual_total"))
+        self.assertEqual(series, [
+            (self.today - timedelta(days=4), 0, Decimal("0.00")),
+            (self.today - timedelta(days=3), 1, Decimal("30.00")),
+            (self.today - timedelta(days=2), 1, Decimal("30.00")),
+            (self.today - timedelta(days=1), 2, Decimal("30.00")),
+        ])
+
+
+class BudgetAlertTests(APITestCase):
+    """Spend alerts fire once per threshold crossing, straight from the rollups."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.budget = self.event.budget
+        Budget.objects.filter(pk=self.budget.pk).update(estimated_amount=Decimal("100.00"))
+        self.collaborator = Collaborator.objects.create(user=self.owner, event=self.event)
+        self.client.force_authenticate(self.owner)
+
+    def add_expense(self, actual, status="pending"):
+        return Expense.objects.create(
+            budget=self.budget, name="Item", assignee=self.collaborator,
+            estimated_cost=Decimal(actual), actual_cost=Decimal(actual), status=status,
+        )
+
+    def alerts(self):
+        return Notification.objects.filter(recipient=self.owner, verb="Budget Threshold Reached")
+
+    def test_new_budgets_get_default_rules(self):
+        self.assertEqual(list(self.budget.alert_rules.values_list("percent", flat=True)), [80, 100])
+
+    def test_crossing_fires_once_and_rearms_when_spend_drops(self):
+        self.add_expense("50.00")
+        self.assertFalse(self.alerts().exists())
+
+        expense = self.add_expense("35.00")
+        self.add_expense("5.00")
+        self.assertEqual(list(self.alerts().values_list("description", flat=True)), [
+            '"Launch" has spent 85.00 NGN of its 100.00 NGN budget (80% threshold reached)',
+        ])
+        self.assertTrue(EmailOutbox.objects.filter(idempotency_key__startswith="budget-alert:").exists())
+
+        expense.status = "cancelled"
+        expense.save()
+        self.assertFalse(BudgetAlertRule.objects.get(budget=self.budget, percent=80).is_triggered)
+
+        self.add_expense("50.00")
+        self.assertEqual(self.alerts().count(), 3)  # 80% again, and 100%
+
+    def test_changing_the_budget_amount_fires_and_rearms(self):
+        self.add_expense("50.00")
+        url = reverse("budget-detail", kwargs={"budget_id": self.budget.id})
+        amount = {"estimated_amount_currency": "NGN"}
+
+        lowered = self.client.patch(url, {**amount, "estimated_amount": "60.00"}, format="json")
+        self.assertEqual(lowered.status_code, 200)
+        self.assertEqual(self.alerts().count(), 1)
+
+        raised = self.client.patch(url, {**amount, "estimated_amount": "1000.00"}, format="json")
+        self.assertEqual(raised.status_code, 200)
+        self.assertFalse(BudgetAlertRule.objects.filter(budget=self.budget, is_triggered=True).exists())
+
+    def test_zeroed_budget_rearms_its_rules(self):
+        self.add_expense("90.00")
+        self.assertEqual(self.alerts().count(), 1)
+        url = reverse("budget-detail", kwargs={"budget_id": self.budget.id})
+        amount = {"estimated_amount_currency": "NGN"}
+
+        zeroed = self.client.patch(url, {**amount, "estimated_amount": "0.00"}, format="json")
+        self.assertEqual(zeroed.status_code, 200)
+        self.assertFalse(BudgetAlertRule.objects.filter(budget=self.budget, is_triggered=True).exists())
+
+        self.client.patch(url, {**amount, "estimated_amount": "100.00"}, format="json")
+        self.assertEqual(self.alerts().count(), 2)
+
+    def test_write_queries_do_not_grow_with_expenses(self):
+        def queries_for_one_write():
+            with CaptureQueriesContext(connection) as queries:
+                self.add_expense("1.00")
+            return len(queries)
+
+        baseline = queries_for_one_write()
+        Expense.objects.bulk_create([
+            Expense(budget=self.budget, name="Bulk", assignee=self.collaborator, estimated_cost=Decimal("1.00"), actual_cost=Decimal("1.00"))
+            for _ in range(50)
+        ])
+        self.assertEqual(queries_for_one_write(), baseline)
+
+    def test_rule_added_below_current_spend_fires_immediately(self):
+        self.add_expense("60.00")
+        url = reverse("budget-alert-rules", kwargs={"budget_id": self.budget.id})
+
+        response = self.client.post(url, {"percent": 50}, format="json")
+        duplicate = self.client.post(url, {"percent": 50}, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertTrue(BudgetAlertRule.objects.get(pk=response.data["id"]).is_triggered)
+        self.assertEqual(self.alerts().count(), 1)
+
+
+class CreateMissingBudgetsTests(TestCase):
+    """The startup command fills in missing budgets in bulk batches."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.events = [
+            Event.objects.create(
+                owner=self.owner, name=f"Event {n}", type="party",
+                start_date=start, end_date=start + timedelta(hours=4),
+            )
+            for n in range(5)
+        ]
+        Budget.objects.filter(event__in=self.events[1:]).delete()
+
+    def test_creates_budgets_in_chunks_with_default_alerts(self):
+        out = StringIO()
+        call_command("create_missing_budgets", "--chunk-size", "3", stdout=out)
+
+        self.assertEqual(Budget.objects.count(), 5)
+        self.assertEqual(BudgetAlertRule.objects.count(), 10)
+        self.assertIn("3 events without budgets processed, 3 budgets created", out.getvalue())
+        self.assertIn("Successfully created 4 budgets!", out.getvalue())
+
+    def test_nothing_missing_is_a_single_query(self):
+        call_command("create_missing_budgets", stdout=StringIO())
+        out = StringIO()
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command("create_missing_budgets", stdout=out)
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn("All events already have budgets!", out.getvalue())
+
+    def test_max_seconds_stops_between_chunks(self):
+        out = StringIO()
+        call_command("create_missing_budgets", "--chunk-size", "1", "--max-seconds", "0", stdout=out)
+
+        self.assertEqual(Budget.objects.count(), 2)
+        self.assertIn("Stopped after 0s", out.getvalue())
@@ -3,11 +3,16 @@ from . import views
 
 urlpatterns = [
     # Budget URLs
+    path('reports/spend/', views.SpendReportView.as_view(), name='spend-report'),
     path('<uuid:budget_id>/', views.BudgetDetailView.as_view(), name='budget-detail'),
     path('<uuid:budget_id>/toggle/', views.BudgetToggleView.as_view(), name='budget-toggle'),
+    path('<uuid:budget_id>/snapshots/', views.BudgetSnapshotListView.as_view(), name='budget-snapshots'),
+    path('<uuid:budget_id>/alerts/', views.BudgetAlertRuleListCreateView.as_view(), name='budget-alert-rules'),
+    path('<uuid:budget_id>/alerts/<int:rule_id>/', views.BudgetAlertRuleDetailView.as_view(), name='budget-alert-rule-detail'),
     
     # Expense URLs
     path('<uuid:budget_id>/expenses/', views.ExpenseListCreateView.as_view(), name='expense-list-create'),
+    path('<uuid:budget_id>/expenses/import/', views.ExpenseImportView.as_view(), name='expense-import'),
     path('expenses/<uuid:expense_id>/', views.ExpenseDetailView.as_view(), name='expense-detail'),
     
     # Comment URLs
@@ -1,18 +1,35 @@
+import json
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.contenttypes.models import ContentType
-from .models import Budget, Expense, Comment, TypingStatus
-from apps.events.models import Collaborator
+from decimal import ROUND_HALF_UP, Decimal
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from .exchange import MissingExchangeRate, base_currency, conversion_rate_expression, convert
+from .alerts import evaluate_budget_alerts
+from .models import BUDGET_CURRENCIES, Budget, BudgetAlertRule, BudgetSnapshot, Expense, Comment
+from .presence import get_presence
+from apps.events.models import Collaborator, EventMembership
 from .serializers import (
     BudgetDetailSerializer, ExpenseSerializer, CommentSerializer, CommentCreateSerializer,
-    ExpenseCreateSerializer, ExpenseUpdateSerializer, BudgetUpdateSerializer
+    ExpenseCreateSerializer, ExpenseUpdateSerializer, BudgetUpdateSerializer, BudgetSnapshotSerializer, BudgetAlertRuleSerializer
 )
+from rest_framework.parsers import MultiPartParser
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.validators import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from .importing import import_expenses, import_format, iterate_in_thread, read_rows
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, pagination
 from .permissions import IsEventCreator
+from eventnest.concurrency import VersionedUpdateMixin
+from eventnest.conditional import ConditionalObjectMixin
 
 
 class BudgetToggleView(generics.UpdateAPIView):
@@ -30,7 +47,7 @@ class BudgetToggleView(generics.UpdateAPIView):
     def patch(self, request, *args, **kwargs):
         budget = self.get_object()
         budget.is_enabled = not budget.is_enabled
-        budget.save()
+        budget.save(update_fields=['is_enabled', 'updated_at'])
         
         return Response({
             "message": f"Budget {'enabled' if budget.is_enabled else 'disabled'}",
@@ -38,9 +55,9 @@ class BudgetToggleView(generics.UpdateAPIView):
         }, status=status.HTTP_200_OK)
     
 
-class BudgetDetailView(generics.RetrieveUpdateAPIView):
+class BudgetDetailView(ConditionalObjectMixin, generics.RetrieveUpdateAPIView):
     """Retrieve or update a budget (only cost & currency editable)"""
-    queryset = Budget.objects.all()
+    queryset = Budget.objects.select_related('event')
     permission_classes = [permissions.IsAuthenticated, IsEventCreator]
     lookup_field = 'id'
     lookup_url_kwarg = 'budget_id'
@@ -51,6 +68,159 @@ class BudgetDetailView(generics.RetrieveUpdateAPIView):
             return BudgetUpdateSerializer
         return BudgetDetailSerializer
 
+    def get_etag_parts(self, budget):
+        expenses = budget.expenses.aggregate(last_updated=Max('updated_at'), total=Count('pk'))
+        return [
+            budget.pk, budget.updated_at, budget.event.updated_at,
+            expenses['last_updated'], expenses['total'],
+        ]
+
+    def perform_update(self, serializer):
+        budget = serializer.save()
+        # A new amount moves every threshold: fire or re-arm rules against it
+        evaluate_budget_alerts([budget.id])
+
+
+class BudgetAlertRuleListCreateView(generics.ListCreateAPIView):
+    """List and add spend alerts (percent of the budget amount) for a budget"""
+    serializer_class = BudgetAlertRuleSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEventCreator]
+    pagination_class = None
+
+    def get_queryset(self):
+        return BudgetAlertRule.objects.filter(budget_id=self.kwargs['budget_id'])
+
+    def perform_create(self, serializer):
+        serializer.save(budget_id=self.kwargs['budget_id'])
+        # A rule added below the current spend fires straight away
+        evaluate_budget_alerts([self.kwargs['budget_id']])
+
+
+class BudgetAlertRuleDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Change, pause or remove a budget's spend alert"""
+    serializer_class = BudgetAlertRuleSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEventCreator]
+    lookup_url_kwarg = 'rule_id'
+    http_method_names = ['get', 'patch', 'delete']
+
+    def get_queryset(self):
+        return BudgetAlertRule.objects.filter(budget_id=self.kwargs['budget_id'])
+
+    def perform_update(self, serializer):
+        rule = serializer.save()
+        if 'percent' in serializer.validated_data:
+            # The rule now guards a different threshold, so judge it afresh
+            BudgetAlertRule.objects.filter(pk=rule.pk).update(is_triggered=False)
+        evaluate_budget_alerts([self.kwargs['budget_id']])
+
+
+class BudgetSnapshotListView(generics.ListAPIView):
+    """
+    A budget's daily totals between `start` and `end` (default: the last 90 days),
+    read straight from the snapshot table for spend-over-time charts.
+    """
+    serializer_class = BudgetSnapshotSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEventCreator]
+    pagination_class = None
+    default_days = 90
+    max_days = 731
+
+    def get_queryset(self):
+        end = self.parse_day('end') or timezone.localdate()
+        start = self.parse_day('start') or end - timedelta(days=self.default_days - 1)
+        if start > end:
+            raise ValidationError({"start": "start must not be after end"})
+        if (end - start).days >= self.max_days:
+            raise ValidationError({"start": f"At most {self.max_days} days can be requested at once"})
+        return BudgetSnapshot.objects.filter(
+            budget_id=self.kwargs['budget_id'], day__range=(start, end)
+        ).order_by('day')
+
+    def parse_day(self, param):
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({param: "Must be a date (YYYY-MM-DD)"})
+        return day
+
+
+class SpendReportView(generics.GenericAPIView):
+    """
+    Spend across every event the user belongs to, in one currency.
+    Expenses are converted at the rate effective on the day they were
+    recorded, inside the grouped query, so the report is a single query.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        currency = request.query_params.get('currency', base_currency()).upper()
+        if currency not in BUDGET_CURRENCIES:
+            return Response(
+                {"error": f"currency must be one of {', '.join(BUDGET_CURRENCIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        expenses = Expense.objects.filter(budget__event__memberships__user=request.user)
+        for param, lookup in (('start', 'created_at__date__gte'), ('end', 'created_at__date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    day = parse_date(value)
+                except ValueError:
+                    day = None
+                if day is None:
+                    return Response({"error": f"{param} must be a date (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+                expenses = expenses.filter(**{lookup: day})
+
+        rows = (
+            expenses
+            .annotate(
+                budget_currency=F('budget__estimated_amount_currency'),
+                spend_date=TruncDate('created_at'),
+            )
+            .annotate(conversion_rate=conversion_rate_expression('budget_currency', currency, 'spend_date'))
+            .values('budget__event__id', 'budget__event__name', 'budget_currency', 'budget__estimated_amount')
+            .annotate(
+                expense_count=Count('pkid'),
+                estimated_cost=Sum(F('estimated_cost') * F('conversion_rate')),
+                actual_cost=Sum(F('actual_cost') * F('conversion_rate')),
+                unconverted_count=Count('pkid', filter=Q(conversion_rate__isnull=True)),
+            )
+            .order_by('budget__event__name')
+        )
+
+        cent = Decimal('0.01')
+        totals = {'expense_count': 0, 'estimated_cost': Decimal('0'), 'actual_cost': Decimal('0'), 'unconverted_count': 0}
+        events = []
+        for row in rows:
+            estimated_cost = (row['estimated_cost'] or Decimal('0')).quantize(cent, rounding=ROUND_HALF_UP)
+            actual_cost = (row['actual_cost'] or Decimal('0')).quantize(cent, rounding=ROUND_HALF_UP)
+            try:
+                budget_amount = convert(row['budget__estimated_amount'], row['budget_currency'], currency)
+            except MissingExchangeRate:
+                budget_amount = None
+            events.append({
+                'event_id': row['budget__event__id'],
+                'event_name': row['budget__event__name'],
+                'budget_currency': row['budget_currency'],
+                'budget_amount': budget_amount,
+                'expense_count': row['expense_count'],
+                'estimated_cost': estimated_cost,
+                'actual_cost': actual_cost,
+                'unconverted_count': row['unconverted_count'],
+            })
+            totals['expense_count'] += row['expense_count']
+            totals['estimated_cost'] += estimated_cost
+            totals['actual_cost'] += actual_cost
+            totals['unconverted_count'] += row['unconverted_count']
+
+        return Response({'currency': currency, 'totals': totals, 'events': events})
+
 
 class ExpensePagination(pagination.PageNumberPagination):
     page_size = 10  # default page size
@@ -80,7 +250,7 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         budget_id = self.kwargs.get('budget_id')
-        return Expense.objects.filter(budget_id=budget_id)
+        return Expense.objects.filter(budget_id=budget_id).select_related('budget__event', 'assignee__user')
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -101,9 +271,45 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
         serializer.save(budget=budget, assignee=assignee)
 
 
-class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
-    """Retrieve, update or delete expense"""
-    queryset = Expense.objects.all()
+class ExpenseImportView(generics.GenericAPIView):
+    """
+    Bulk-create expenses from a CSV or NDJSON upload in the `file` field.
+    The response is NDJSON written while the file is processed: a line per
+    rejected row, a progress line per saved chunk and a final summary, so
+    large files keep the connection active instead of timing out.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEventCreator]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, budget_id):
+        budget = get_object_or_404(Budget.objects.select_related('event'), id=budget_id)
+        if not budget.is_enabled:
+            raise ValidationError("Cannot add expenses to a disabled budget")
+
+        upload = request.FILES.get('file')
+        file_format = import_format(upload) if upload else None
+        if file_format is None:
+            return Response(
+                {"error": "Upload a .csv or .ndjson file in the 'file' field"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = import_expenses(budget, read_rows(upload, file_format), request.user)
+        if isinstance(request._request, ASGIRequest):
+            return StreamingHttpResponse(self.async_lines(results), content_type='application/x-ndjson')
+        return StreamingHttpResponse(
+            (json.dumps(result, cls=JSONEncoder) + '\n' for result in results),
+            content_type='application/x-ndjson'
+        )
+
+    async def async_lines(self, results):
+        async for result in iterate_in_thread(results):
+            yield json.dumps(result, cls=JSONEncoder) + '\n'
+
+
+class ExpenseDetailView(VersionedUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
+    """Retrieve, update or delete expense. Send back `version` to reject edits made since you loaded it."""
+    queryset = Expense.objects.select_related('budget__event', 'assignee__user')
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
     lookup_url_kwarg = 'expense_id'
@@ -116,7 +322,7 @@ class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         return ExpenseSerializer
     
     def perform_update(self, serializer):
-        expense = self.get_object()
+        expense = serializer.instance
         
         # Check if budget is enabled
         if not expense.can_be_edited:
@@ -126,7 +332,7 @@ class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         if not expense.budget.event.collaborators.filter(user=self.request.user).exists():
             raise PermissionError("Only event collaborators can edit expenses")
         
-        serializer.save()
+        super().perform_update(serializer)
 
 
 
@@ -175,30 +381,24 @@ class ExpenseCommentListCreateView(generics.ListCreateAPIView):
 @permission_classes([permissions.IsAuthenticated])
 def update_typing_status(request, expense_id):
     """Update typing status for expense comments"""
-    expense = get_object_or_404(Expense, id=expense_id)
-    
-    collaborator = Collaborator.objects.get(
-        event=expense.budget.event,
-        user=request.user
-    )
+    is_member = EventMembership.objects.filter(
+        user=request.user,
+        event__budget__expenses__id=expense_id
+    ).exists()
 
-    if not collaborator:
+    if not is_member:
+        get_object_or_404(Expense, id=expense_id)
         return Response(
             {"error": "Only event collaborators can participate in comments"}, 
             status=status.HTTP_403_FORBIDDEN
         )
     
-    is_typing = request.data.get('is_typing', False)
-    
-    typing_status, created = TypingStatus.objects.get_or_create(
-        expense=expense,
-        collaborator=collaborator,
-        defaults={'is_typing': is_typing}
-    )
-    
-    if not created:
-        typing_status.is_typing = is_typing
-        typing_status.save()
+    # Typing state is ephemeral and lives only in the presence store
+    presence = get_presence()
+    if request.data.get('is_typing', False):
+        presence.set_typing(expense_id, request.user.pk, request.user.firstname)
+    else:
+        presence.clear(expense_id, request.user.pk)
     
     return Response({"status": "updated"})
 
@@ -207,20 +407,9 @@ def update_typing_status(request, expense_id):
 @permission_classes([permissions.IsAuthenticated])
 def get_typing_users(request, expense_id):
     """Get list of users currently typing"""
-    expense = get_object_or_404(Expense, id=expense_id)
-    
-    # Clean up old typing statuses (older than 10 seconds)
-    from django.utils import timezone
-    from datetime import timedelta
-    cutoff = timezone.now() - timedelta(seconds=10)
-    TypingStatus.objects.filter(
-        expense=expense,
-        last_activity__lt=cutoff
-    ).delete()
+    get_object_or_404(Expense, id=expense_id)
     
-    typing_users = TypingStatus.objects.filter(
-        expense=expense,
-        is_typing=True
-    ).values_list('collaborator__user__firstname', flat=True)
+    # Entries expire on their own after TYPING_TTL seconds
+    typing_users = get_presence().typing_users(expense_id)
     
-    return Response({"typing_users": list(typing_users)})
\ No newline at end of file
+    return Response({"typing_users": typing_users})
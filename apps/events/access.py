@@ -0,0 +1,55 @@
+from django.db.models import OuterRef, Subquery
+from django.shortcuts import get_object_or_404
+
+from .models import Event, EventMembership
+
+
+class EventAccess:
+    """
+    An event together with the requesting user's role on it.
+    Resolved once per request by `get_event_access` and shared by
+    permissions, views and serializers.
+    """
+
+    def __init__(self, event, user):
+        self.event = event
+        self.user = user
+        self.role = getattr(event, 'caller_role', None)
+        self._members = {}
+
+    @property
+    def is_member(self):
+        return self.role is not None
+
+    @property
+    def is_owner(self):
+        return self.role == EventMembership.Role.OWNER
+
+    def has_member(self, user):
+        """One indexed EXISTS per user, memoized; the caller's own role is already known."""
+        if user.pk == self.user.pk:
+            return self.is_member
+        if user.pk not in self._members:
+            self._members[user.pk] = EventMembership.objects.is_member(user, self.event)
+        return self._members[user.pk]
+
+
+def get_event_access(request, event_id):
+    """
+    Load the event and the caller's membership role in a single query,
+    memoized on the request so repeated checks cost nothing.
+    Raises Http404 if the event does not exist.
+    """
+    cache = getattr(request, '_event_access_cache', None)
+    if cache is None:
+        cache = request._event_access_cache = {}
+
+    key = str(event_id)
+    if key not in cache:
+        user = request.user
+        queryset = Event.objects.all()
+        if user.is_authenticated:
+            role = EventMembership.objects.filter(event=OuterRef('pkid'), user=user).values('role')[:1]
+            queryset = queryset.annotate(caller_role=Subquery(role))
+        cache[key] = EventAccess(get_object_or_404(queryset, id=event_id), user)
+    return cache[key]
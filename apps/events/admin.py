@@ -1,9 +1,13 @@
 from django.contrib import admin
-from .models import Event, Collaborator, Invitation
+from .models import Event, Collaborator, Invitation, EventMembership
 
 # Register your models here.
 admin.site.register(Event)
 admin.site.register(Collaborator)
 class InvitationAdmin(admin.ModelAdmin):
     list_display=['event', 'sent_by','token', 'email', 'expires_at', 'status']
-admin.site.register(Invitation, InvitationAdmin)
\ No newline at end of file
+admin.site.register(Invitation, InvitationAdmin)
+
+class EventMembershipAdmin(admin.ModelAdmin):
+    list_display=['user', 'event', 'role', 'status']
+admin.site.register(EventMembership, EventMembershipAdmin)
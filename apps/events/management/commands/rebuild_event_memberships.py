@@ -0,0 +1,42 @@
+# apps/events/management/commands/rebuild_event_memberships.py
+from django.core.management.base import BaseCommand
+from apps.events.models import Event, EventMembership
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the EventMembership index from event owners and collaborators'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of events rebuilt per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size must be at least 1'))
+            return
+
+        event_ids = Event.objects.order_by('pkid').values_list('pkid', flat=True)
+        last_pkid = 0
+        events_done = 0
+        rows_written = 0
+
+        while True:
+            chunk = list(event_ids.filter(pkid__gt=last_pkid)[:chunk_size])
+            if not chunk:
+                break
+
+            rows_written += EventMembership.objects.rebuild_for_events(chunk)
+            events_done += len(chunk)
+            last_pkid = chunk[-1]
+            self.stdout.write(f'Rebuilt {events_done} events ({rows_written} memberships)')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Membership index rebuilt: {events_done} events, {rows_written} memberships'
+            )
+        )
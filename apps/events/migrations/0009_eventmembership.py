@@ -0,0 +1,116 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CHUNK_SIZE = 1000
+
+
+def populate_memberships(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    Collaborator = apps.get_model("events", "Collaborator")
+    EventMembership = apps.get_model("events", "EventMembership")
+
+    # One chunk of events (and their collaborators) in memory at a time
+    events = Event.objects.order_by("pkid").values_list("pkid", "owner_id", "status")
+    last_pkid = 0
+    while True:
+        chunk = list(events.filter(pkid__gt=last_pkid)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_pkid = chunk[-1][0]
+
+        rows = {}
+        statuses = {}
+        for pkid, owner_id, status in chunk:
+            statuses[pkid] = status
+            rows[(owner_id, pkid)] = EventMembership(
+                user_id=owner_id, event_id=pkid, role="OWNER", status=status
+            )
+        collaborators = Collaborator.objects.filter(event_id__in=statuses).values_list(
+            "event_id", "user_id", "role"
+        )
+        for event_id, user_id, role in collaborators.iterator(chunk_size=CHUNK_SIZE):
+            rows.setdefault(
+                (user_id, event_id),
+                EventMembership(
+                    user_id=user_id, event_id=event_id, role=role, status=statuses[event_id]
+                ),
+            )
+        EventMembership.objects.bulk_create(rows.values(), batch_size=CHUNK_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("events", "0008_event_banner_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventMembership",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[
+                            ("OWNER", "Owner"),
+                            ("ADMIN", "Admin"),
+                            ("COLLABORATOR", "Collaborator"),
+                        ],
+                        default="COLLABORATOR",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("ongoing", "Ongoing"),
+                            ("completed", "Completed"),
+                            ("archived", "Archived"),
+                        ],
+                        default="ongoing",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memberships",
+                        to="events.event",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="event_memberships",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="eventmembership",
+            constraint=models.UniqueConstraint(
+                fields=("user", "event"),
+                include=("role", "status"),
+                name="unique_event_membership",
+            ),
+        ),
+        migrations.RunPython(populate_memberships, migrations.RunPython.noop),
+    ]
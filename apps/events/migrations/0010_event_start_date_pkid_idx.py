@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0009_eventmembership"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["start_date", "pkid"], name="event_start_date_pkid_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0010_event_start_date_pkid_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collaborator",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0011_collaborator_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
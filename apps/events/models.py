@@ -4,7 +4,8 @@ from urllib.parse import urlencode, quote
 from datetime import timedelta
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Window
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.urls import reverse
@@ -12,6 +13,9 @@ from urllib.parse import urlencode
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 
+from eventnest.concurrency import VersionedModel
+from eventnest.tracking import FieldTrackerMixin
+
 User = get_user_model()
 
 class TimeStampedUUIDModel(models.Model):
@@ -24,7 +28,42 @@ class TimeStampedUUIDModel(models.Model):
         abstract =True
 
 
-class Event(TimeStampedUUIDModel):
+class EventQuerySet(models.QuerySet):
+    """
+    Dashboard read paths for events.
+    """
+    STATUS_COUNT_KEYS = ("total", "ongoing", "completed", "archived")
+
+    def visible_to(self, user):
+        """
+        Events the user owns or collaborates on.
+        Uses a correlated EXISTS against the membership index instead of an
+        OR join, so no DISTINCT is needed.
+        """
+        membership = EventMembership.objects.filter(event=OuterRef("pkid"), user=user)
+        return self.filter(Exists(membership))
+
+    def with_status_counts(self):
+        """
+        Annotate every row with the status counts of the whole result set.
+        The counts are window aggregates, so the list and the dashboard
+        counts come back in a single query.
+        """
+        return self.annotate(
+            total_count=Window(Count("pkid")),
+            ongoing_count=Window(Count("pkid", filter=Q(status="ongoing"))),
+            completed_count=Window(Count("pkid", filter=Q(status="completed"))),
+            archived_count=Window(Count("pkid", filter=Q(status="archived"))),
+        )
+
+    @classmethod
+    def status_counts(cls, events):
+        """Read the window counts off an evaluated `with_status_counts()` result."""
+        first = events[0] if events else None
+        return {key: getattr(first, f"{key}_count", 0) for key in cls.STATUS_COUNT_KEYS}
+
+
+class Event(FieldTrackerMixin, TimeStampedUUIDModel, VersionedModel):
     """
     Represents an event created by a user.
     """
@@ -71,11 +110,17 @@ class Event(TimeStampedUUIDModel):
         options={'quality': 90}
     )
 
-    
+    objects = EventQuerySet.as_manager()
+    tracked_fields = ('name', 'type', 'start_date', 'end_date', 'location', 'status', 'owner')
     
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'pkid'], name='event_start_date_pkid_idx'),
+        ]
+
 class Collaborator(models.Model):
     """
     Acts as an intermediary model to manage collaborators for an event.
@@ -88,6 +133,7 @@ class Collaborator(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     role = models.CharField(max_length=20, choices=Role.choices, default=Role.COLLABORATOR)
     joined_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('user', 'event') # Ensures a user can only join an event once
@@ -95,6 +141,111 @@ class Collaborator(models.Model):
     def __str__(self):
         return f"{self.user} - {self.event.name}"
 
+class EventMembershipManager(models.Manager):
+    """
+    Keeps the membership read model in step with `Event.owner` and `Collaborator`.
+    """
+
+    def is_member(self, user, event):
+        return self.filter(user=user, event=event).exists()
+
+    def status_counts(self, user):
+        """Dashboard counts for a user, answered from the covering index."""
+        return self.filter(user=user).aggregate(
+            total=Count("pk"),
+            ongoing=Count("pk", filter=Q(status="ongoing")),
+            completed=Count("pk", filter=Q(status="completed")),
+            archived=Count("pk", filter=Q(status="archived")),
+        )
+
+    def rebuild_for_events(self, event_ids):
+        """
+        Recompute the membership rows of the given events (by pkid) from
+        `Event.owner` and the collaborator table.
+        """
+        event_ids = list(event_ids)
+        statuses = {}
+        rows = {}
+        for pkid, owner_id, status in Event.objects.filter(pkid__in=event_ids).values_list("pkid", "owner_id", "status"):
+            statuses[pkid] = status
+            rows[(owner_id, pkid)] = self.model(
+                user_id=owner_id, event_id=pkid, role=self.model.Role.OWNER, status=status
+            )
+
+        collaborators = Collaborator.objects.filter(event_id__in=event_ids).values_list("event_id", "user_id", "role")
+        for event_id, user_id, role in collaborators:
+            # The owner row always wins over the owner's own collaborator row
+            rows.setdefault((user_id, event_id), self.model(
+                user_id=user_id, event_id=event_id, role=role, status=statuses[event_id]
+            ))
+
+        with transaction.atomic():
+            self.filter(event_id__in=event_ids).delete()
+            self.bulk_create(rows.values())
+        return len(rows)
+
+    def sync_event(self, event, changed_fields=None):
+        """
+        Bring an event's rows in line after it was saved. Only an owner change
+        (or an unknown set of changes) needs the full rebuild; a status change
+        is copied onto the existing rows.
+        """
+        if changed_fields is None or 'owner' in changed_fields:
+            return self.rebuild_for_events([event.pkid])
+        if 'status' in changed_fields:
+            return self.filter(event_id=event.pkid).update(status=event.status)
+        return 0
+
+    def sync_collaborator(self, collaborator, deleted=False):
+        """Update the single (user, event) row affected by a collaborator change."""
+        event = Event.objects.filter(pkid=collaborator.event_id).values("owner_id", "status").first()
+        if event is None:
+            return
+
+        if event["owner_id"] == collaborator.user_id:
+            # Owners keep their row regardless of their collaborator record
+            return
+
+        if deleted:
+            self.filter(user_id=collaborator.user_id, event_id=collaborator.event_id).delete()
+        else:
+            self.update_or_create(
+                user_id=collaborator.user_id,
+                event_id=collaborator.event_id,
+                defaults={"role": collaborator.role, "status": event["status"]},
+            )
+
+
+class EventMembership(models.Model):
+    """
+    Denormalized (user, event) membership index.
+    Answers "which events can this user see" without joining `Event.owner`
+    and the collaborator table. Maintained by signals in `apps.events.signals`.
+    """
+    class Role(models.TextChoices):
+        OWNER = 'OWNER', 'Owner'
+        ADMIN = 'ADMIN', 'Admin'
+        COLLABORATOR = 'COLLABORATOR', 'Collaborator'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_memberships')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='memberships')
+    role = models.CharField(max_length=20, choices=Role.choices, default=Role.COLLABORATOR)
+    status = models.CharField(max_length=20, choices=Event.STATUS_CHOICES, default="ongoing")
+
+    objects = EventMembershipManager()
+
+    class Meta:
+        constraints = [
+            # Covering: membership checks and dashboard counts never touch the heap
+            models.UniqueConstraint(
+                fields=['user', 'event'], include=['role', 'status'], name='unique_event_membership'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.event_id} ({self.role})"
+
+
 class Invitation(models.Model):
     """
     Stores invitation records sent by event owners.
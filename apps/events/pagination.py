@@ -0,0 +1,76 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class EventCursorPagination(BasePagination):
+    """
+    Keyset pagination for events ordered by (start_date, pkid).
+    The cursor encodes the last row of the previous page, so every page is
+    a `WHERE (start_date, pkid) > cursor LIMIT n` probe instead of an OFFSET scan.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('start_date', 'pkid')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        """Pagination is opt-in: only used when the client asks for a page."""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            start_date, pkid = position
+            queryset = queryset.filter(
+                Q(start_date__gt=start_date) | Q(start_date=start_date, pkid__gt=pkid)
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last))
+
+    def encode_cursor(self, event):
+        payload = json.dumps([event.start_date.isoformat(), event.pkid])
+        return urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_start_date, pkid = json.loads(urlsafe_b64decode(encoded.encode()))
+            start_date = parse_datetime(raw_start_date)
+            pkid = int(pkid)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if start_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return start_date, pkid
@@ -1,7 +1,7 @@
 # events/permissions.py
 
 from rest_framework import permissions
-
+from .access import get_event_access
 
 
 class IsEventOwnerOrCollaboratorReadOnly(permissions.BasePermission):
@@ -33,3 +33,17 @@ class IsEventOwner(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return obj.event.owner == request.user
+
+
+class IsEventMember(permissions.BasePermission):
+    """
+    Permission that allows only the owner and collaborators of the event
+    in the URL (`event_id`). The lookup is memoized on the request.
+    """
+    message = "You are not a collaborator on this event."
+
+    def has_permission(self, request, view):
+        event_id = view.kwargs.get("event_id")
+        if event_id is None:
+            return False
+        return get_event_access(request, event_id).is_member
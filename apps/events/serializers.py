@@ -48,12 +48,14 @@ class EventDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Event
-        fields = fields = ['id', 'name', 'location', 'type', 'notes', 'owner', 'start_date', 'end_date', 'updated_by', 'collaborators', 'budget_id', 'budget_amount']
+        fields = fields = ['id', 'name', 'location', 'type', 'notes', 'owner', 'start_date', 'end_date', 'updated_by', 'collaborators', 'budget_id', 'budget_amount', 'version']
         read_only_fields = ['id', 'owner', 'updated_by', 'collaborators', 'budget_id']
     
     def create(self, validated_data):
         # Extract budget_amount (won't be saved to Event model)
         budget_amount = validated_data.pop('budget_amount', 0)
+        # version is only ever the expected version of an update
+        validated_data.pop('version', None)
         print("Budget Amount:", budget_amount)
         
         # Create the Event instance WITHOUT saving yet
@@ -1,7 +1,7 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Invitation, Event
+from .models import Invitation, Event, Collaborator, EventMembership
 from .utils.email import send_invite_mail
 from notifications.signals import notify
 from apps.budgets.models import Budget
@@ -21,7 +21,8 @@ def invitation_created_handler(sender, instance: Invitation, created, **kwargs):
             send_invite_mail(
                 invite_link=invite_link,
                 email_addr=instance.email,
-                event=instance.event
+                event=instance.event,
+                idempotency_key=f"invitation:{instance.token}"
             )
             
         except Exception as e:
@@ -75,4 +76,22 @@ def create_event_budget(sender, instance, created, **kwargs):
         
         # Clean up the temporary attribute
         if hasattr(instance, '_budget_amount'):
-            delattr(instance, '_budget_amount')
\ No newline at end of file
+            delattr(instance, '_budget_amount')
+
+
+@receiver(post_save, sender=Event)
+def sync_event_memberships(sender, instance, created, **kwargs):
+    """Keep the membership index in step with the event's owner and status"""
+    # The snapshot is refreshed after post_save, so it still holds the old values here
+    known = not created and hasattr(instance, '_loaded_values')
+    EventMembership.objects.sync_event(instance, instance.changed_fields() if known else None)
+
+
+@receiver(post_save, sender=Collaborator)
+def sync_collaborator_membership(sender, instance, **kwargs):
+    EventMembership.objects.sync_collaborator(instance)
+
+
+@receiver(post_delete, sender=Collaborator)
+def remove_collaborator_membership(sender, instance, **kwargs):
+    EventMembership.objects.sync_collaborator(instance, deleted=True)
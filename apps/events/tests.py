@@ -1,3 +1,213 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .models import Event, Collaborator, EventMembership
+
+User = get_user_model()
+
+
+class EventDashboardTests(APITestCase):
+    """Regression tests for the event list / dashboard endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.other = User.objects.create_user("Bola", "Other", "bola@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=1)
+
+        def make_event(owner, name, status="ongoing"):
+            event = Event.objects.create(
+                owner=owner, name=name, type="party", status=status,
+                start_date=start, end_date=start + timedelta(hours=4),
+            )
+            Collaborator.objects.create(user=owner, event=event, role=Collaborator.Role.ADMIN)
+            return event
+
+        make_event(self.user, "Owned ongoing")
+        make_event(self.user, "Owned archived", status="archived")
+        shared = make_event(self.other, "Shared completed", status="completed")
+        Collaborator.objects.create(user=self.user, event=shared)
+        make_event(self.other, "Not visible")
+
+        self.client.force_authenticate(self.user)
+        self.url = reverse("event-list-create")
+
+    def test_lists_owned_and_collaborating_events_with_counts(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        names = sorted(event["name"] for event in response.data["events"])
+        self.assertEqual(names, ["Owned archived", "Owned ongoing", "Shared completed"])
+        self.assertEqual(
+            response.data["counts"],
+            {"total": 3, "ongoing": 1, "completed": 1, "archived": 1},
+        )
+
+    def test_empty_dashboard_counts_are_zero(self):
+        lonely = User.objects.create_user("Chi", "Lonely", "chi@example.com", "pass1234")
+        self.client.force_authenticate(lonely)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data["events"], [])
+        self.assertEqual(
+            response.data["counts"],
+            {"total": 0, "ongoing": 0, "completed": 0, "archived": 0},
+        )
+
+    def test_dashboard_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), 2,
+            "Event dashboard issued too many queries:\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+
+    def test_cursor_pagination_walks_every_event_once(self):
+        seen = []
+        url = f"{self.url}?page_size=2"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(queries), 2)
+            self.assertEqual(response.data["counts"]["total"], 3)
+            seen.extend(event["name"] for event in response.data["events"])
+            url = response.data["next"]
+
+        self.assertEqual(seen, ["Owned ongoing", "Owned archived", "Shared completed"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class EventMembershipTests(APITestCase):
+    """The membership index follows owners, collaborators and event status."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.guest = User.objects.create_user("Bola", "Guest", "bola@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=1)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        Collaborator.objects.create(user=self.owner, event=self.event, role=Collaborator.Role.ADMIN)
+
+    def memberships(self):
+        return dict(
+            EventMembership.objects.filter(event=self.event).values_list("user__email", "role")
+        )
+
+    def test_signals_keep_index_in_sync(self):
+        self.assertEqual(self.memberships(), {"ada@example.com": "OWNER"})
+
+        collaborator = Collaborator.objects.create(user=self.guest, event=self.event)
+        self.assertEqual(self.memberships()["bola@example.com"], "COLLABORATOR")
+
+        collaborator.delete()
+        self.assertEqual(self.memberships(), {"ada@example.com": "OWNER"})
+
+    def test_rebuild_command_restores_index(self):
+        Collaborator.objects.create(user=self.guest, event=self.event)
+        EventMembership.objects.all().delete()
+
+        call_command("rebuild_event_memberships", chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            self.memberships(),
+            {"ada@example.com": "OWNER", "bola@example.com": "COLLABORATOR"},
+        )
+
+    def test_edits_keep_rows_unless_the_owner_changes(self):
+        Collaborator.objects.create(user=self.guest, event=self.event)
+        event = Event.objects.get(pk=self.event.pk)
+        rows = set(EventMembership.objects.filter(event=event).values_list("pk", flat=True))
+
+        event.name = "Relaunch"
+        event.status = "completed"
+        event.save()
+
+        self.assertEqual(set(EventMembership.objects.filter(event=event).values_list("pk", flat=True)), rows)
+        self.assertEqual(set(EventMembership.objects.filter(event=event).values_list("status", flat=True)), {"completed"})
+
+        event.owner = self.guest
+        event.save()
+
+        self.assertEqual(
+            self.memberships(),
+            {"ada@example.com": "ADMIN", "bola@example.com": "OWNER"},
+        )
+
+
+class EventConditionalRequestTests(APITestCase):
+    """ETag / If-None-Match / If-Match handling on the event detail endpoint."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.guest = User.objects.create_user("Bola", "Guest", "bola@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=1)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        Collaborator.objects.create(user=self.owner, event=self.event, role=Collaborator.Role.ADMIN)
+        self.client.force_authenticate(self.owner)
+        self.url = reverse("event-detail", kwargs={"id": self.event.id})
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_etag_changes_with_nested_collaborators(self):
+        etag = self.client.get(self.url)["ETag"]
+        Collaborator.objects.create(user=self.guest, event=self.event)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_stale_if_match_rejects_write(self):
+        response = self.client.patch(
+            self.url, {"name": "Renamed"}, format="json", HTTP_IF_MATCH='"stale"'
+        )
+
+        self.assertEqual(response.status_code, 412)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.name, "Launch")
+
+    def test_stale_version_rejects_write(self):
+        saved = self.client.patch(self.url, {"name": "Renamed", "version": 1}, format="json")
+        stale = self.client.patch(self.url, {"name": "Clobbered", "version": 1}, format="json")
+
+        self.assertEqual((saved.status_code, saved.data["version"]), (200, 2))
+        self.assertEqual(stale.status_code, 409)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.name, "Renamed")
+
+    def test_create_ignores_a_client_version(self):
+        start = timezone.now() + timedelta(days=2)
+        response = self.client.post(reverse("event-list-create"), {
+            "name": "Tour", "type": "party", "version": 999,
+            "start_date": start, "end_date": start + timedelta(hours=2),
+        }, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Event.objects.get(name="Tour").version, 1)
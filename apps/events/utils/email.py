@@ -1,12 +1,12 @@
-from django.core.mail import send_mail
+from apps.user_notifications.outbox import queue_email
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 
 
-def send_invite_mail(invite_link, email_addr, event):
+def send_invite_mail(invite_link, email_addr, event, idempotency_key=None):
     """
-    Send invitation email using HTML template
+    Queue invitation email (HTML template) in the email outbox
     """
    
     site_name = getattr(settings, 'SITE_NAME', 'EventNest')
@@ -29,11 +29,11 @@ def send_invite_mail(invite_link, email_addr, event):
     # Create plain text version by stripping HTML
     plain_message = strip_tags(html_message)
     
-    return send_mail(
+    return queue_email(
         subject=subject,
         message=html_message,
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=[email_addr],
         html_message=html_message,
-        fail_silently=False
-    )
\ No newline at end of file
+        idempotency_key=idempotency_key,
+    )
@@ -1,12 +1,14 @@
 # events/views.py
 
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .models import Event, Invitation, Collaborator
+from .models import Event, EventQuerySet, EventMembership, Invitation, Collaborator
+from .pagination import EventCursorPagination
 from .serializers import (
     EventListSerializer,
     EventDetailSerializer,
@@ -15,6 +17,8 @@ from .serializers import (
     CollaboratorSerializer
 )
 from .permissions import IsEventOwnerOrCollaboratorReadOnly, IsEventOwner
+from eventnest.concurrency import conflict_on_stale_version
+from eventnest.conditional import ConditionalObjectMixin
 
 # --- Event Management Views ---
 
@@ -26,19 +30,41 @@ class EventListCreateAPIView(APIView):
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Opt in to cursor pagination with this many events per page (max 100)",
+                type=openapi.TYPE_INTEGER,
+            ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Opaque cursor taken from the previous page's `next` link",
+                type=openapi.TYPE_STRING,
+            ),
+        ]
+    )
     def get(self, request, *args, **kwargs):
         # List events where the user is either the owner or a collaborator
-        events = Event.objects.filter(owner=request.user) | Event.objects.filter(collaborators=request.user)
-        serializer = EventListSerializer(events.distinct(), many=True)
-
-        # dashboard counts
-        queryset = events.distinct()
-        counts = {
-            "total": queryset.count(),
-            "ongoing": queryset.filter(status="ongoing").count(),
-            "completed": queryset.filter(status="completed").count(),
-            "archived": queryset.filter(status="archived").count(),
-        }
+        events = Event.objects.visible_to(request.user).select_related('owner')
+
+        paginator = EventCursorPagination()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(events, request, view=self)
+            serializer = EventListSerializer(page, many=True)
+            counts = EventMembership.objects.status_counts(request.user)
+            return Response({
+                'events': serializer.data,
+                'counts': counts,
+                'next': paginator.get_next_link(),
+            }, status=status.HTTP_200_OK)
+
+        # Unpaginated: the dashboard counts are computed in the same query
+        events = list(events.with_status_counts())
+        serializer = EventListSerializer(events, many=True)
+        counts = EventQuerySet.status_counts(events)
 
         return Response({'events':serializer.data, 'counts':counts},
                          status=status.HTTP_200_OK)
@@ -56,10 +82,12 @@ class EventListCreateAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class EventDetailAPIView(APIView):
+class EventDetailAPIView(ConditionalObjectMixin, APIView):
     """
     API view to retrieve, update, or delete a specific event instance.
     Corresponds to User Story 2c.
+    Supports ETag / If-None-Match on reads and If-Match on writes; a stale
+    `version` in the body answers 409.
     """
     permission_classes = [permissions.IsAuthenticated, IsEventOwnerOrCollaboratorReadOnly]
     
@@ -67,20 +95,32 @@ class EventDetailAPIView(APIView):
     def get_object(self, id):
         event = get_object_or_404(Event, id=id)
         self.check_object_permissions(self.request, event)
+        self.check_write_preconditions(self.request, event)
         return event
 
+    def get_etag_parts(self, event):
+        collaborators = event.collaborator_set.aggregate(
+            last_updated=Max('updated_at'), total=Count('pk')
+        )
+        return [event.pk, event.updated_at, collaborators['last_updated'], collaborators['total']]
+
     def get(self, request, id, *args, **kwargs):
         event = self.get_object(id)
+        etag, not_modified = self.get_not_modified_response(request, event)
+        if not_modified is not None:
+            return not_modified
+
         serializer = EventDetailSerializer(event)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag})
 
     @swagger_auto_schema(request_body=EventDetailSerializer)
     def put(self, request, id, *args, **kwargs):
         event = self.get_object(id)
         serializer = EventDetailSerializer(event, data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            with conflict_on_stale_version():
+                serializer.save()
+            return Response(serializer.data, headers={'ETag': self.get_etag(event)})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @swagger_auto_schema(request_body=EventDetailSerializer)
@@ -89,8 +129,9 @@ class EventDetailAPIView(APIView):
         event = self.get_object(id)
         serializer = EventDetailSerializer(event, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            with conflict_on_stale_version():
+                serializer.save()
+            return Response(serializer.data, headers={'ETag': self.get_etag(event)})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, id, *args, **kwargs):
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["status", "due_date"], name="task_status_due_idx"
+            ),
+        ),
+    ]
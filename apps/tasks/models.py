@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from ..events.models import  Event
+from eventnest.concurrency import VersionedModel
+from eventnest.tracking import FieldTrackerMixin
 
 # Create your models here.
 
@@ -9,7 +13,25 @@ User = get_user_model()
   
 
 
-class Task(models.Model):
+class TaskQuerySet(models.QuerySet):
+    """
+    Read paths for the task board.
+    """
+
+    def board_columns(self, per_column):
+        """
+        The first `per_column` tasks of every status column, oldest first,
+        each annotated with its position in the column and the column's total.
+        Both are window functions partitioned by status, so the whole board
+        comes back in a single query however many tasks each column holds.
+        """
+        return self.annotate(
+            column_position=Window(RowNumber(), partition_by=[F("status")], order_by=F("id").asc()),
+            column_count=Window(Count("id"), partition_by=[F("status")]),
+        ).filter(column_position__lte=per_column).order_by("status", "id")
+
+
+class Task(FieldTrackerMixin, VersionedModel):
     STATUS_TODO = "TODO"
     STATUS_IN_PROGRESS = "IN_PROGRESS"
     STATUS_DONE = "DONE"
@@ -30,10 +52,14 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+    tracked_fields = ("title", "description", "due_date", "status", "assignee")
+
     class Meta:
         ordering = ['due_date',"-created_at"]
         indexes = [
             models.Index(fields=["event", "assignee", "status"]),
+            models.Index(fields=["status", "due_date"], name="task_status_due_idx"),
         ]
 
     def __str__(self):
@@ -0,0 +1,100 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Task
+
+
+class TaskBoardPagination:
+    """
+    Keyset pagination for the task board. The board shows the first page of
+    every status column; each column's next link asks for that column alone,
+    continuing after the last task shown with a `WHERE id > cursor LIMIT n` probe.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    column_query_param = 'status'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    # Task ids are bigints; anything outside that range is a forged cursor
+    max_cursor_id = 2 ** 63
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_column(self, request):
+        """The status column a follow-up page was asked for, or None for the whole board."""
+        status = request.query_params.get(self.column_query_param)
+        if status is None:
+            return None
+        if status not in dict(Task.STATUS_CHOICES):
+            raise ValidationError({self.column_query_param: f'"{status}" is not a task status.'})
+        return status
+
+    def paginate_board(self, queryset, request):
+        """
+        Split one `board_columns()` result into columns. One extra row per
+        column is fetched to tell whether the column has a next page.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        tasks = {status: [] for status, _ in Task.STATUS_CHOICES}
+        counts = dict.fromkeys(tasks, 0)
+        for task in queryset.board_columns(self.page_size + 1):
+            tasks[task.status].append(task)
+            counts[task.status] = task.column_count
+
+        return [self.column_page(status, label, tasks[status], counts[status]) for status, label in Task.STATUS_CHOICES]
+
+    def paginate_column(self, queryset, request, status):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.filter(status=status).order_by('id')
+        position = self.decode_cursor(request)
+        # Same shape as a board column; the count is the whole column, not what is left of it
+        count = queryset.count()
+        if position is not None:
+            queryset = queryset.filter(id__gt=position)
+        return self.column_page(status, dict(Task.STATUS_CHOICES)[status], list(queryset[:self.page_size + 1]), count)
+
+    def column_page(self, status, label, tasks, count=None):
+        page = tasks[:self.page_size]
+        column = {
+            'status': status,
+            'label': label,
+            'tasks': page,
+            'next': self.get_next_link(status, page[-1]) if len(tasks) > self.page_size else None,
+        }
+        if count is not None:
+            column['count'] = count
+        return column
+
+    def get_next_link(self, status, last):
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.column_query_param, status)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last))
+
+    def encode_cursor(self, task):
+        return urlsafe_b64encode(json.dumps([task.id]).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            (task_id,) = json.loads(urlsafe_b64decode(encoded.encode()))
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not 0 <= task_id < self.max_cursor_id:
+            raise NotFound(self.invalid_cursor_message)
+        return task_id
@@ -15,11 +15,11 @@ class IsTaskOwnerOrAssigneeOrReadOnly(permissions.BasePermission):
         # Case 1: Task object
         if isinstance(obj, Task):
             # Event owner = full control
-            if obj.event.owner == user:
+            if obj.event.owner_id == user.pk:
                 return True
 
             # Assignee = limited rights
-            if obj.assignee == user:
+            if obj.assignee_id == user.pk:
                 if request.method in permissions.SAFE_METHODS:
                     return True
                 if request.method in ["PATCH", "PUT"]:
@@ -3,7 +3,7 @@ from django.db import transaction
 from django.contrib.auth import get_user_model
 
 from .models import Task, TaskComment
-from ..events.models import Event   
+from ..events.access import get_event_access
 
 User = get_user_model()
 
@@ -27,7 +27,7 @@ class TaskSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = ["id","event_name","title","description", "assignee",  "created_by", "due_date", "status", "created_at", "updated_at" ]
+        fields = ["id","event_name","title","description", "assignee",  "created_by", "due_date", "status", "version", "created_at", "updated_at" ]
         read_only_fields = ("created_at", "updated_at", "created_by")
     
 
@@ -36,24 +36,17 @@ class TaskSerializer(serializers.ModelSerializer):
         """
         Ensure the assignee is a collaborator (or the owner).
         """
-        event_id =  self.context["view"].kwargs.get("event_id")
+        view = self.context.get("view")
+        event_id = view.kwargs.get("event_id") if view else None
 
         if not event_id:
             return value
 
-        try:
-            event = Event.objects.get(id=event_id)
-        except Event.DoesNotExist:
-            raise serializers.ValidationError("Event does not exist.")
-
-        if hasattr(event, "collaborators"):
-            if (
-                not event.collaborators.filter(pk=value.pk).exists()
-                and event.owner != value
-            ):
-                raise serializers.ValidationError(
-                    "Assignee must be a collaborator of the event."
-                )
+        access = get_event_access(self.context["request"], event_id)
+        if not access.has_member(value):
+            raise serializers.ValidationError(
+                "Assignee must be a collaborator of the event."
+            )
         return value
 
     def create(self, validated_data):
@@ -63,6 +56,8 @@ class TaskSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         user = getattr(request, "user", None)
         validated_data["created_by"] = user
+        # version is only ever the expected version of an update
+        validated_data.pop("version", None)
 
         with transaction.atomic():
             task = super().create(validated_data)
@@ -88,7 +83,7 @@ class TaskStatusUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = ["status"]
+        fields = ["status", "version"]
 
     def validate_status(self, value):
         """
@@ -100,6 +95,7 @@ class TaskStatusUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         previous_status = instance.status
         instance.status = validated_data["status"]
+        instance.version = validated_data.get("version", instance.version)
         instance.save(update_fields=["status", "updated_at"])
         # 🔔 TODO: plug notification (status change)
         return instance
@@ -1,3 +1,223 @@
-from django.test import TestCase
+import json
+from base64 import urlsafe_b64encode
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.events.models import Event, Collaborator
+from eventnest.concurrency import StaleVersion
+from .models import Task, TaskComment
+
+User = get_user_model()
+
+
+class TaskEndpointQueryTests(APITestCase):
+    """Task endpoints resolve event access once and cost a fixed number of queries."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.member = User.objects.create_user("Bola", "Member", "bola@example.com", "pass1234")
+        self.outsider = User.objects.create_user("Chi", "Outsider", "chi@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        Collaborator.objects.create(user=self.owner, event=self.event, role=Collaborator.Role.ADMIN)
+        Collaborator.objects.create(user=self.member, event=self.event)
+
+        self.tasks = [
+            Task.objects.create(event=self.event, title=f"Task {n}", assignee=self.member, created_by=self.owner)
+            for n in range(5)
+        ]
+        TaskComment.objects.create(task=self.tasks[0], author=self.member, content="On it")
+        self.client.force_authenticate(self.member)
+
+    def assertMaxQueries(self, limit, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), limit,
+            "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+        return response
+
+    def test_list_tasks(self):
+        response = self.assertMaxQueries(2, reverse("task-list-create", kwargs={"event_id": self.event.id}))
+        self.assertEqual(len(response.data), 5)
+
+    def test_assigned_tasks(self):
+        self.assertMaxQueries(2, reverse("assigned-tasks", kwargs={"event_id": self.event.id}))
+
+    def test_retrieve_task(self):
+        self.assertMaxQueries(
+            2, reverse("task-detail", kwargs={"event_id": self.event.id, "task_id": self.tasks[0].id})
+        )
+
+    def test_list_comments(self):
+        self.assertMaxQueries(
+            3, reverse("task-comments", kwargs={"event_id": self.event.id, "task_id": self.tasks[0].id})
+        )
+
+    def test_non_member_is_forbidden(self):
+        self.client.force_authenticate(self.outsider)
+
+        response = self.client.get(reverse("task-list-create", kwargs={"event_id": self.event.id}))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_create_validates_assignee_against_event_members(self):
+        self.client.force_authenticate(self.owner)
+        url = reverse("task-list-create", kwargs={"event_id": self.event.id})
+
+        rejected = self.client.post(url, {"title": "Venue", "assignee": self.outsider.pk}, format="json")
+        created = self.client.post(url, {"title": "Venue", "assignee": self.member.pk}, format="json")
+
+        self.assertEqual(rejected.status_code, 400)
+        self.assertEqual(created.status_code, 201)
+
+    def test_assignee_check_probes_one_membership(self):
+        self.client.force_authenticate(self.owner)
+        url = reverse("task-list-create", kwargs={"event_id": self.event.id})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {"title": "Venue", "assignee": self.member.pk}, format="json")
+
+        membership_reads = [
+            q["sql"] for q in queries.captured_queries
+            if q["sql"].startswith('SELECT') and q["sql"].split(" WHERE ")[0].endswith('FROM "events_eventmembership"')
+        ]
+        self.assertEqual(len(membership_reads), 1)
+        self.assertIn("LIMIT 1", membership_reads[0])
+
+
+class TaskVersionTests(APITestCase):
+    """Task edits are conditional on the version the client loaded."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.task = Task.objects.create(event=self.event, title="Venue", assignee=self.owner, created_by=self.owner)
+        self.client.force_authenticate(self.owner)
+
+    def test_stale_model_save_raises_instead_of_overwriting(self):
+        first = Task.objects.get(pk=self.task.pk)
+        second = Task.objects.get(pk=self.task.pk)
+        first.title = "Hall"
+        first.save()
+
+        second.title = "Garden"
+        with self.assertRaises(StaleVersion):
+            second.save()
+
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.version), ("Hall", 2))
+        self.assertEqual(second.version, 1)
+
+    def test_stale_version_answers_409(self):
+        url = reverse("task-detail", kwargs={"event_id": self.event.id, "task_id": self.task.id})
+
+        saved = self.client.patch(url, {"title": "Hall", "version": 1}, format="json")
+        stale = self.client.patch(url, {"title": "Garden", "version": 1}, format="json")
+
+        self.assertEqual((saved.status_code, saved.data["version"]), (200, 2))
+        self.assertEqual(stale.status_code, 409)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, "Hall")
+
+    def test_update_response_carries_the_new_etag(self):
+        url = reverse("task-detail", kwargs={"event_id": self.event.id, "task_id": self.task.id})
+        old = self.client.get(url)["ETag"]
+
+        response = self.client.patch(url, {"title": "Hall"}, format="json", HTTP_IF_MATCH=old)
+        chained = self.client.patch(url, {"title": "Garden"}, format="json", HTTP_IF_MATCH=response["ETag"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], old)
+        self.assertEqual(chained.status_code, 200)
+
+    def test_create_ignores_a_client_version(self):
+        url = reverse("task-list-create", kwargs={"event_id": self.event.id})
+
+        response = self.client.post(url, {"title": "Hall", "assignee": self.owner.pk, "version": 999}, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.get(pk=response.data["id"]).version, 1)
+
+    def test_status_update_checks_version(self):
+        url = reverse("task-status-update", kwargs={"event_id": self.event.id, "task_id": self.task.id})
+        Task.objects.get(pk=self.task.pk).save()
+
+        stale = self.client.patch(url, {"status": Task.STATUS_DONE, "version": 1}, format="json")
+        current = self.client.patch(url, {"status": Task.STATUS_DONE, "version": 2}, format="json")
+
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual((current.status_code, current.data["version"]), (200, 3))
+
+
+class TaskBoardTests(APITestCase):
+    """The board returns every status column with its count from one windowed query."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        statuses = [Task.STATUS_TODO] * 5 + [Task.STATUS_DONE] * 2
+        self.tasks = [
+            Task.objects.create(
+                event=self.event, title=f"Task {n}", assignee=self.owner, created_by=self.owner, status=status
+            )
+            for n, status in enumerate(statuses)
+        ]
+        self.client.force_authenticate(self.owner)
+        self.url = reverse("task-board", kwargs={"event_id": self.event.id})
+
+    def test_board_columns_have_counts_and_first_pages(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"page_size": 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 2, "\n".join(q["sql"] for q in queries.captured_queries))
+        columns = {column["status"]: column for column in response.data["columns"]}
+        self.assertEqual([column["status"] for column in response.data["columns"]], ["TODO", "IN_PROGRESS", "DONE"])
+        self.assertEqual({status: column["count"] for status, column in columns.items()},
+                         {"TODO": 5, "IN_PROGRESS": 0, "DONE": 2})
+        self.assertEqual([task["id"] for task in columns["TODO"]["tasks"]], [task.id for task in self.tasks[:2]])
+        self.assertIsNotNone(columns["TODO"]["next"])
+        self.assertIsNone(columns["DONE"]["next"])
+        self.assertEqual(columns["IN_PROGRESS"]["tasks"], [])
+
+    def test_next_link_walks_one_column(self):
+        next_url = self.client.get(self.url, {"page_size": 2}).data["columns"][0]["next"]
+        seen = []
+        while next_url:
+            page = self.client.get(next_url).data
+            self.assertEqual(page["status"], "TODO")
+            self.assertEqual(page["count"], 5)
+            seen += [task["id"] for task in page["tasks"]]
+            next_url = page["next"]
+
+        self.assertEqual(seen, [task.id for task in self.tasks[2:5]])
+
+    def test_invalid_column_and_cursor_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {"status": "LATER"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"status": "TODO", "cursor": "nope"}).status_code, 404)
+
+    def test_out_of_range_cursor_is_rejected(self):
+        for task_id in (2 ** 63, -1):
+            cursor = urlsafe_b64encode(json.dumps([task_id]).encode()).decode()
+            response = self.client.get(self.url, {"status": "TODO", "cursor": cursor})
+            self.assertEqual(response.status_code, 404)
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (TaskListCreateAPIView, TaskRetrieveUpdateDestroyAPIView,
-                    AssignedTasksListAPIView, TaskStatusUpdateAPIView, TaskCommentListCreateAPIView)
+                    AssignedTasksListAPIView, TaskBoardAPIView, TaskStatusUpdateAPIView, TaskCommentListCreateAPIView)
 
 urlpatterns = [
     # List all tasks for an event OR create a task (owner only)
@@ -12,6 +12,9 @@ urlpatterns = [
     # List tasks assigned to the current user
     path( "<uuid:event_id>/tasks/assigned/", AssignedTasksListAPIView.as_view(), name="assigned-tasks"),
 
+    # Tasks grouped into per-status board columns
+    path("<uuid:event_id>/tasks/board/", TaskBoardAPIView.as_view(), name="task-board"),
+
     # Update the status of a specific task
     path("<uuid:event_id>/tasks/<int:task_id>/status/",TaskStatusUpdateAPIView.as_view(),name="task-status-update" ),
 
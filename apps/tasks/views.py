@@ -1,18 +1,23 @@
 from django.shortcuts import render
 from rest_framework import generics, permissions
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .models import Task, TaskComment
+from .pagination import TaskBoardPagination
 from .serializers import (
     TaskSerializer,
     TaskStatusUpdateSerializer,
     TaskCommentSerializer,
 )
 from .permissions import IsTaskOwnerOrAssigneeOrReadOnly
-from ..events.models import Event
+from eventnest.concurrency import VersionedUpdateMixin
+from eventnest.conditional import ConditionalObjectMixin
+from ..events.access import get_event_access
+from ..events.permissions import IsEventMember
 
 # Create your views here.
 
@@ -23,7 +28,7 @@ class TaskListCreateAPIView(generics.ListCreateAPIView):
     List all tasks for an event or create a new task (owner only).
     """
     serializer_class = TaskSerializer
-    permission_classes = [permissions.IsAuthenticated, IsTaskOwnerOrAssigneeOrReadOnly]
+    permission_classes = [permissions.IsAuthenticated, IsEventMember, IsTaskOwnerOrAssigneeOrReadOnly]
 
     @swagger_auto_schema(
         operation_summary="List Tasks",
@@ -44,27 +49,24 @@ class TaskListCreateAPIView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
     def get_queryset(self):
-        event_id = self.kwargs.get("event_id")
-     
-        event = get_object_or_404(Event, id=event_id)
-        if not (event.owner == self.request.user or event.collaborators.filter(pk=self.request.user.pk).exists()):
-            raise PermissionDenied("You are not a collaborator on this event.")
-        return Task.objects.filter(event=event).select_related("assignee", "created_by")
+        access = get_event_access(self.request, self.kwargs.get("event_id"))
+        return Task.objects.filter(event=access.event).select_related("event", "assignee", "created_by")
 
     def perform_create(self, serializer):
-        event_id = self.kwargs.get("event_id")
-        event = get_object_or_404(Event, id=event_id)
-        if event.owner != self.request.user:
+        access = get_event_access(self.request, self.kwargs.get("event_id"))
+        if not access.is_owner:
             raise PermissionDenied("Only the event owner may create tasks.")
-        serializer.save(event=event, created_by=self.request.user)
+        serializer.save(event=access.event, created_by=self.request.user)
 
 
-class TaskRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class TaskRetrieveUpdateDestroyAPIView(ConditionalObjectMixin, VersionedUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a task.
+    Supports ETag / If-None-Match on reads and If-Match on writes; a stale
+    `version` in the body answers 409.
     """
     serializer_class = TaskSerializer
-    permission_classes = [permissions.IsAuthenticated, IsTaskOwnerOrAssigneeOrReadOnly]
+    permission_classes = [permissions.IsAuthenticated, IsEventMember, IsTaskOwnerOrAssigneeOrReadOnly]
     lookup_url_kwarg = "task_id"
 
     @swagger_auto_schema(
@@ -104,11 +106,11 @@ class TaskRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
     def get_queryset(self):
-        event_id = self.kwargs.get("event_id")
-        event = get_object_or_404(Event, id=event_id)
-        if not (event.owner == self.request.user or event.collaborators.filter(pk=self.request.user.pk).exists()):
-            raise PermissionDenied("You are not a collaborator on this event.")
-        return Task.objects.filter(event=event).select_related("assignee", "created_by")
+        access = get_event_access(self.request, self.kwargs.get("event_id"))
+        return Task.objects.filter(event=access.event).select_related("event", "assignee", "created_by")
+
+    def get_etag_parts(self, task):
+        return [task.pk, task.updated_at, task.event.updated_at]
 
 
 class AssignedTasksListAPIView(generics.ListAPIView):
@@ -116,7 +118,7 @@ class AssignedTasksListAPIView(generics.ListAPIView):
     List tasks assigned to the current user within an event.
     """
     serializer_class = TaskSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, IsEventMember]
 
     @swagger_auto_schema(
         operation_summary="List Assigned Tasks",
@@ -127,19 +129,55 @@ class AssignedTasksListAPIView(generics.ListAPIView):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        event_id = self.kwargs.get("event_id")
-        event = get_object_or_404(Event, id=event_id)
-        if not (event.owner == self.request.user or event.collaborators.filter(pk=self.request.user.pk).exists()):
-            raise PermissionDenied("You are not a collaborator on this event.")
-        return Task.objects.filter(event=event, assignee=self.request.user)
+        access = get_event_access(self.request, self.kwargs.get("event_id"))
+        return Task.objects.filter(event=access.event, assignee=self.request.user).select_related("event")
 
 
-class TaskStatusUpdateAPIView(generics.UpdateAPIView):
+class TaskBoardAPIView(generics.GenericAPIView):
+    """
+    The event's tasks as board columns, one per status, each with its total
+    and first page. `?status=<STATUS>&cursor=...` pages through one column.
+    """
+    serializer_class = TaskSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEventMember]
+    pagination_class = TaskBoardPagination
+
+    @swagger_auto_schema(
+        operation_summary="Task Board",
+        operation_description="Retrieve the task board for an event: per-status columns with counts "
+                              "and a cursor-paginated first page. Pass `status` and `cursor` "
+                              "(from a column's `next` link) to load more of one column.",
+        manual_parameters=[
+            openapi.Parameter("status", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=[status for status, _ in Task.STATUS_CHOICES]),
+            openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter("page_size", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+    )
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        status = self.paginator.get_column(request)
+        if status is None:
+            columns = self.paginator.paginate_board(queryset, request)
+            for column in columns:
+                column["tasks"] = self.get_serializer(column["tasks"], many=True).data
+            return Response({"columns": columns})
+
+        column = self.paginator.paginate_column(queryset, request, status)
+        column["tasks"] = self.get_serializer(column["tasks"], many=True).data
+        return Response(column)
+
+    def get_queryset(self):
+        access = get_event_access(self.request, self.kwargs.get("event_id"))
+        return Task.objects.filter(event=access.event).select_related("event")
+
+
+class TaskStatusUpdateAPIView(VersionedUpdateMixin, generics.UpdateAPIView):
     """
     Update only the status of a task (assignee or owner).
     """
     serializer_class = TaskStatusUpdateSerializer
-    permission_classes = [permissions.IsAuthenticated, IsTaskOwnerOrAssigneeOrReadOnly]
+    permission_classes = [permissions.IsAuthenticated, IsEventMember, IsTaskOwnerOrAssigneeOrReadOnly]
     lookup_url_kwarg = "task_id"
 
     @swagger_auto_schema(
@@ -153,11 +191,8 @@ class TaskStatusUpdateAPIView(generics.UpdateAPIView):
         return super().patch(request, *args, **kwargs)
 
     def get_queryset(self):
-        event_id = self.kwargs.get("event_id")
-        event = get_object_or_404(Event, id=event_id)
-        if not (event.owner == self.request.user or event.collaborators.filter(pk=self.request.user.pk).exists()):
-            raise PermissionDenied("You are not a collaborator on this event.")
-        return Task.objects.filter(event=event)
+        access = get_event_access(self.request, self.kwargs.get("event_id"))
+        return Task.objects.filter(event=access.event).select_related("event")
 
 
 class TaskCommentListCreateAPIView(generics.ListCreateAPIView):
@@ -165,7 +200,7 @@ class TaskCommentListCreateAPIView(generics.ListCreateAPIView):
     List or create comments on a task.
     """
     serializer_class = TaskCommentSerializer
-    permission_classes = [permissions.IsAuthenticated, IsTaskOwnerOrAssigneeOrReadOnly]
+    permission_classes = [permissions.IsAuthenticated, IsEventMember, IsTaskOwnerOrAssigneeOrReadOnly]
     lookup_url_kwarg = "task_id"
 
     @swagger_auto_schema(
@@ -185,24 +220,15 @@ class TaskCommentListCreateAPIView(generics.ListCreateAPIView):
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
-    def get_queryset(self):
-        event_id = self.kwargs.get("event_id")
-        task_id = self.kwargs.get("task_id")
-
-        event = get_object_or_404(Event, id=event_id)
-        task = get_object_or_404(Task, id=task_id, event=event)
+    def get_task(self):
+        """The task being commented on, loaded once per request."""
+        if not hasattr(self, "_task"):
+            access = get_event_access(self.request, self.kwargs.get("event_id"))
+            self._task = get_object_or_404(Task, id=self.kwargs.get("task_id"), event=access.event)
+        return self._task
 
-        if not (event.owner == self.request.user or event.collaborators.filter(pk=self.request.user.pk).exists()):
-            raise PermissionDenied("You are not a collaborator on this event.")
-        return TaskComment.objects.filter(task=task)
+    def get_queryset(self):
+        return TaskComment.objects.filter(task=self.get_task())
 
     def perform_create(self, serializer):
-        event_id = self.kwargs.get("event_id")
-        task_id = self.kwargs.get("task_id")
-
-        event = get_object_or_404(Event, id=event_id)
-        task = get_object_or_404(Task, id=task_id, event=event)
-
-        if not (event.owner == self.request.user or event.collaborators.filter(pk=self.request.user.pk).exists()):
-            raise PermissionDenied("You are not a collaborator on this event.")
-        serializer.save(task=task, author=self.request.user)
+        serializer.save(task=self.get_task(), author=self.request.user)
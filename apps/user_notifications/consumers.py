@@ -1,13 +1,35 @@
 import json
+from datetime import timedelta
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.db.models import Max, Q
+from django.utils import timezone
 from notifications.models import Notification
+from apps.user_notifications.counters import mark_notifications
 from apps.user_notifications.serializers import NotificationSerializer
 
 
+# Gaps larger than this are answered with a fresh unread list instead of a replay
+RESUME_LIMIT = 100
+# Replays also cover notifications created this long before the last one seen,
+# to catch rows whose transaction committed after a higher id was pushed
+RESUME_OVERLAP = timedelta(minutes=5)
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
-    
+    """
+    Push protocol: every notification is pushed as a `new_notification` frame
+    carrying its sequence number (`seq`, the notification id). Clients keep the
+    highest seq they have seen and reconnect with `?last_seq=<n>` (or send
+    `{"type": "resume", "last_seq": n}`) to receive what they missed.
+
+    Ids are allocated at insert time, not commit time, so a lower id can be
+    committed after a higher one was pushed. A replay therefore also includes
+    everything created within RESUME_OVERLAP of the last seen notification;
+    clients de-duplicate by notification id rather than dropping low seqs.
+    """
+
     async def connect(self):
         from django.contrib.auth.models import AnonymousUser
         print("Connecting User...")
@@ -43,8 +65,13 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 'message': f'Authenticated as {self.user.email}'
             }))
             
-            # Send existing notifications
-            await self.send_existing_notifications()
+            query = parse_qs(self.scope.get("query_string", b"").decode())
+            last_seq = self.get_last_seq(query.get("last_seq", [None])[0])
+            if last_seq is None:
+                # First connection: send existing notifications
+                await self.send_existing_notifications()
+            else:
+                await self.send_missed_notifications(last_seq)
 
     async def disconnect(self, close_code):
         print("Close Code: ", close_code)
@@ -74,6 +101,13 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         elif message_type == 'get_user_notifications':
             await self.send_existing_notifications()
 
+        elif message_type == 'resume':
+            last_seq = self.get_last_seq(data.get('last_seq'))
+            if last_seq is None:
+                await self.send_existing_notifications()
+            else:
+                await self.send_missed_notifications(last_seq)
+
         elif message_type == 'new_notification_message':
             await self.new_notification_message(data)
 
@@ -87,16 +121,49 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'notification': serialized_notification
         }))
 
+    async def notification_delta(self, event):
+        """Forward an already serialized notification pushed to the group"""
+        await self.send(text_data=json.dumps({
+            'type': 'new_notification',
+            'seq': event['seq'],
+            'notification': event['notification']
+        }))
+
     async def fetch_notification_messages(self, event):
         """Send new notification to WebSocket"""
         # Serialize the notification
         
         await self.send_existing_notifications()
 
+    @staticmethod
+    def get_last_seq(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
     @database_sync_to_async
     def get_user_notifications(self):
-        """Get user's unread notifications as serialized data"""
-        notifications = self.user.notifications.unread()
+        """Get user's unread notifications as serialized data, with the seq they are current up to"""
+        seq = self.user.notifications.aggregate(seq=Max('id'))['seq'] or 0
+        notifications = self.user.notifications.unread().filter(id__lte=seq)
+        serializer = NotificationSerializer(notifications, many=True)
+        return seq, serializer.data
+
+    @database_sync_to_async
+    def get_missed_notifications(self, last_seq):
+        """
+        Notifications after `last_seq` plus the overlap window before it, in id
+        order, or None if the gap is too large
+        """
+        last_seen = self.user.notifications.filter(id=last_seq).values_list('timestamp', flat=True).first()
+        since = (last_seen or timezone.now()) - RESUME_OVERLAP
+        notifications = list(
+            self.user.notifications.filter(Q(id__gt=last_seq) | Q(timestamp__gte=since))
+            .order_by('id')[:RESUME_LIMIT + 1]
+        )
+        if len(notifications) > RESUME_LIMIT:
+            return None
         serializer = NotificationSerializer(notifications, many=True)
         return serializer.data
 
@@ -114,20 +181,35 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     def mark_notification_as_read(self, notification_id):
         """Mark notification as read"""
         try:
-            notification = self.user.notifications.get(id=notification_id)
-            notification.mark_as_read()
+            notifications = self.user.notifications.filter(id=notification_id)
+            if not notifications.exists():
+                return False
+            mark_notifications(self.user, notifications, unread=False)
             return True
-        except Notification.DoesNotExist:
-            return False
         except Exception:
             return False
 
     async def send_existing_notifications(self):
         """Send existing unread notifications"""
-        notifications = await self.get_user_notifications()
+        seq, notifications = await self.get_user_notifications()
         
         await self.send(text_data=json.dumps({
             'type': 'existing_notifications',
+            'seq': seq,
+            'notifications': notifications,
+            'count': len(notifications)
+        }))
+
+    async def send_missed_notifications(self, last_seq):
+        """Send only the notifications created since the client's last seq"""
+        notifications = await self.get_missed_notifications(last_seq)
+        if notifications is None:
+            await self.send_existing_notifications()
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'missed_notifications',
+            'seq': max([last_seq] + [notification['id'] for notification in notifications]),
             'notifications': notifications,
             'count': len(notifications)
         }))
\ No newline at end of file
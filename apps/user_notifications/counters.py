@@ -0,0 +1,150 @@
+import logging
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from notifications.models import Notification
+
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('info', 'success', 'warning', 'error')
+FIELDS = ('total', 'unread', *LEVELS)
+# Idle users' counters expire and are rebuilt from the database on next read
+COUNTER_TIMEOUT = 60 * 60 * 24
+
+
+def counter_key(user_id, field):
+    return f"notification_counts:{user_id}:{field}"
+
+
+def count_aggregates(prefix=''):
+    """Count() expressions for every counter field, optionally through a relation prefix."""
+    return {
+        'total': Count(f'{prefix}id'),
+        'unread': Count(f'{prefix}id', filter=Q(**{f'{prefix}unread': True})),
+        **{level: Count(f'{prefix}id', filter=Q(**{f'{prefix}level': level})) for level in LEVELS},
+    }
+
+
+def count_from_db(user_id):
+    return Notification.objects.filter(recipient_id=user_id).aggregate(**count_aggregates())
+
+
+def get_counts(user_id):
+    """
+    Return the user's notification counters with one cache round trip,
+    rebuilding them from a single aggregate query if any are missing.
+    """
+    keys = {field: counter_key(user_id, field) for field in FIELDS}
+    cached = cache.get_many(keys.values())
+    if len(cached) == len(FIELDS):
+        return {field: cached[key] for field, key in keys.items()}
+
+    counts = count_from_db(user_id)
+    cache.set_many({keys[field]: counts[field] for field in FIELDS}, timeout=COUNTER_TIMEOUT)
+    return counts
+
+
+def format_counts(counts):
+    """Shape counters the way the count endpoint has always returned them"""
+    return {
+        'total': counts['total'],
+        'unread': counts['unread'],
+        'read': counts['total'] - counts['unread'],
+        'by_level': {level: counts[level] for level in LEVELS},
+    }
+
+
+def adjust_counts(user_id, **deltas):
+    """
+    Atomically add `deltas` to the user's counters. Counters that are not
+    cached are left alone; they are rebuilt from the database when next read.
+    """
+    for field, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(counter_key(user_id, field), delta)
+        except ValueError:
+            pass
+        except Exception as e:
+            # Drop the counters so the next read recomputes them
+            logger.error(f"Could not update notification counter {field} for user {user_id}: {str(e)}")
+            cache.delete_many([counter_key(user_id, name) for name in FIELDS])
+            return
+
+
+def record_created(notifications):
+    """Count freshly inserted notifications once their transaction commits."""
+    deltas = {}
+    for notification in notifications:
+        tally = deltas.setdefault(notification.recipient_id, Counter())
+        tally['total'] += 1
+        tally['unread'] += int(notification.unread)
+        tally[notification.level] += 1
+
+    def apply():
+        for user_id, tally in deltas.items():
+            adjust_counts(user_id, **tally)
+
+    transaction.on_commit(apply)
+
+
+def mark_notifications(user, queryset, unread):
+    """Flip the unread flag on `queryset` in one UPDATE and move the counter by the rows changed."""
+    changed = queryset.filter(unread=not unread).update(unread=unread)
+    if changed:
+        transaction.on_commit(
+            lambda: adjust_counts(user.pk, unread=changed if unread else -changed)
+        )
+    return changed
+
+
+def delete_notifications(user, queryset):
+    """Delete `queryset`, subtracting exactly what was removed from the counters."""
+    breakdown = list(queryset.values('unread', 'level').annotate(n=Count('id')).order_by())
+    queryset.delete()
+
+    deltas = Counter()
+    for row in breakdown:
+        deltas['total'] -= row['n']
+        deltas['unread'] -= row['n'] if row['unread'] else 0
+        deltas[row['level']] -= row['n']
+    if deltas:
+        transaction.on_commit(lambda: adjust_counts(user.pk, **deltas))
+    return -deltas['total']
+
+
+def reconcile_counts(chunk_size=1000):
+    """
+    Compare cached counters with the database, a chunk of users at a time,
+    and overwrite any that drifted. Returns the number of users corrected.
+    """
+    User = get_user_model()
+    corrected = 0
+    last_pk = 0
+    while True:
+        users = list(
+            User.objects.filter(pk__gt=last_pk).order_by('pk')
+            .annotate(**count_aggregates('notifications__'))
+            .values('pk', *FIELDS)[:chunk_size]
+        )
+        if not users:
+            break
+        last_pk = users[-1]['pk']
+
+        cached = cache.get_many([counter_key(user['pk'], field) for user in users for field in FIELDS])
+        fixes = {}
+        for user in users:
+            keys = {field: counter_key(user['pk'], field) for field in FIELDS}
+            if not any(key in cached for key in keys.values()):
+                continue
+            if any(cached.get(key) != user[field] for field, key in keys.items()):
+                fixes.update({key: user[field] for field, key in keys.items()})
+                corrected += 1
+        if fixes:
+            cache.set_many(fixes, timeout=COUNTER_TIMEOUT)
+    return corrected
@@ -0,0 +1,88 @@
+# apps/user_notifications/management/commands/benchmark_due_reminders.py
+import datetime
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.events.models import Event
+from apps.tasks.models import Task
+from apps.user_notifications.reminders import send_due_reminders
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Seed tasks and time the due-reminder scan (all seeded rows are rolled back unless --keep is given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000, help='Number of tasks to seed (default: 1000000)')
+        parser.add_argument('--assignees', type=int, default=1000, help='Number of users tasks are spread across (default: 1000)')
+        parser.add_argument('--days', type=int, default=90, help='Due dates are spread over this many days (default: 90)')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert (default: 10000)')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded rows instead of rolling them back')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            now = self.seed(options)
+            self.run_scan('First run', now)
+            self.run_scan('Second run (nothing left to send)', now)
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write('Rolled back seeded data')
+
+    def seed(self, options):
+        started = time.perf_counter()
+        tag = timezone.now().strftime('%Y%m%d%H%M%S')
+        User.objects.bulk_create([
+            User(
+                email=f'reminder-bench-{tag}-{n}@example.com',
+                firstname='Bench',
+                lastname=str(n),
+                password='!',
+            )
+            for n in range(options['assignees'])
+        ], batch_size=options['batch_size'])
+        assignee_ids = list(
+            User.objects.filter(email__startswith=f'reminder-bench-{tag}-').values_list('pk', flat=True)
+        )
+
+        # Scan at local midnight so the 1 and 7 day windows each catch one day of due dates
+        now = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        today = now.date()
+        owner = User.objects.get(pk=assignee_ids[0])
+        event = Event.objects.create(
+            owner=owner, name=f'Reminder benchmark {tag}', type='benchmark',
+            start_date=now + timedelta(days=options['days']),
+            end_date=now + timedelta(days=options['days'], hours=4),
+        )
+
+        statuses = [Task.STATUS_TODO, Task.STATUS_IN_PROGRESS, Task.STATUS_TODO, Task.STATUS_DONE]
+        total = options['tasks']
+        batch_size = options['batch_size']
+        for offset in range(0, total, batch_size):
+            Task.objects.bulk_create([
+                Task(
+                    event=event,
+                    title=f'Benchmark task {n}',
+                    assignee_id=assignee_ids[n % len(assignee_ids)],
+                    due_date=today + datetime.timedelta(days=n % options['days']),
+                    status=statuses[n % len(statuses)],
+                )
+                for n in range(offset, min(offset + batch_size, total))
+            ])
+        self.stdout.write(f'Seeded {total} tasks in {time.perf_counter() - started:.1f}s')
+        return now
+
+    def run_scan(self, label, now):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            sent = send_due_reminders(now=now)
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'{label}: {sent} reminders in {elapsed:.2f}s using {len(queries)} queries')
+        )
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -28,4 +29,37 @@ class ReminderNotification(models.Model):
         ]
     
     def __str__(self):
-        return f"Reminder for {self.target} ({self.interval}) sent to {self.recipient} at {self.sent_at}"
\ No newline at end of file
+        return f"Reminder for {self.target} ({self.interval}) sent to {self.recipient} at {self.sent_at}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing email, written in the same transaction as the change that caused it
+    and delivered after commit by the `send_outbox_emails` Celery task.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        SENT = 'SENT', 'Sent'
+        FAILED = 'FAILED', 'Failed'
+
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
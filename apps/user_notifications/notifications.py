@@ -1,10 +1,15 @@
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
+from django.utils import translation
+from notifications.models import Notification
 from notifications.signals import notify
+from collections import defaultdict
 from datetime import datetime
 
+from apps.user_notifications.outbox import outbox_email, queue_email, queue_emails
+from apps.user_notifications.utils import bulk_notify, create_notifications
+
 
 User = get_user_model()
 
@@ -55,13 +60,12 @@ def send_task_assignment_notification(task):
     subject = f"New Task Assignment: {task.title}"
     html_message = render_to_string('notifications/task_assignment.html', context)
     
-    send_mail(
+    queue_email(
         subject,
         html_message,
-        settings.DEFAULT_FROM_EMAIL,
         [recipient.email],
         html_message=html_message,
-        fail_silently=True
+        idempotency_key=f"task-assigned:{task.pk}:{recipient.pk}",
     )
 
 def send_expense_assignment_notification(expense):
@@ -97,15 +101,56 @@ def send_expense_assignment_notification(expense):
     subject = f"New Expense Assignment: {expense.name}"
     html_message = render_to_string('notifications/expense_assignment.html', context)
     
-    send_mail(
+    queue_email(
         subject,
         html_message,
-        settings.DEFAULT_FROM_EMAIL,
         [recipient.email],
         html_message=html_message,
-        fail_silently=True
+        idempotency_key=f"expense-assigned:{expense.pk}:{recipient.pk}",
     )
 
+def send_expense_import_notifications(event, actor, assignments, import_id):
+    """
+    One notification and one email per assignee for a bulk expense import,
+    instead of one per expense. `assignments` maps each user to the number of
+    expenses they were given and the first few of them, which the email lists.
+    """
+    site_context = {
+        'site_name': settings.SITE_NAME,
+        'protocol': 'https' if getattr(settings, 'USE_HTTPS', False) else 'http',
+        'domain': getattr(settings, 'DOMAIN', 'localhost:8000'),
+    }
+    notifications, emails = [], []
+    for recipient, assigned in assignments.items():
+        count = assigned['count']
+        notifications.append(Notification(
+            recipient=recipient,
+            actor=actor,
+            verb='Expenses Assigned',
+            target=event,
+            description=f"You have been assigned {count} new expense{'s' if count != 1 else ''} for event {event.name}",
+        ))
+        context = {
+            **site_context,
+            'user': recipient,
+            'event_id': event.id,
+            'event_name': event.name,
+            'expense_count': count,
+            'expenses': assigned['expenses'],
+            'more_count': count - len(assigned['expenses']),
+        }
+        html_message = render_to_string('notifications/expense_import_summary.html', context)
+        emails.append(outbox_email(
+            f"{count} New Expense Assignment{'s' if count != 1 else ''}: {event.name}",
+            html_message,
+            [recipient.email],
+            html_message=html_message,
+            idempotency_key=f"expense-import:{import_id}:{recipient.pk}",
+        ))
+
+    create_notifications(notifications)
+    queue_emails(emails)
+
 def send_task_update_notification(task, updated_fields, actor):
     """Send notification when a task is updated"""
     recipient = task.assignee
@@ -141,13 +186,12 @@ def send_task_update_notification(task, updated_fields, actor):
         subject = f"Task Update: {task.title}"
         html_message = render_to_string('notifications/task_update.html', context)
         
-        send_mail(
+        queue_email(
             subject,
             html_message,
-            settings.DEFAULT_FROM_EMAIL,
             [recipient.email],
             html_message=html_message,
-            fail_silently=True
+            idempotency_key=f"task-updated:{task.pk}:{task.updated_at.isoformat()}:{recipient.pk}",
         )
 
 def send_expense_update_notification(expense, updated_fields, actor):
@@ -180,55 +224,67 @@ def send_expense_update_notification(expense, updated_fields, actor):
         subject = f"Expense Update: {expense.name}"
         html_message = render_to_string('notifications/expense_update.html', context)
         
-        send_mail(
+        queue_email(
             subject,
             html_message,
-            settings.DEFAULT_FROM_EMAIL,
             [recipient.email],
             html_message=html_message,
-            fail_silently=True
+            idempotency_key=f"expense-updated:{expense.pk}:{expense.updated_at.isoformat()}:{recipient.pk}",
         )
 
+def recipient_language(user):
+    """Language an email to `user` is rendered in (users have no preference yet, so the site default)"""
+    return settings.LANGUAGE_CODE
+
+
 def send_event_update_notification(event, updated_fields, actor):
-    """Send notification when an event is updated"""
-    recipients = User.objects.filter(
-        id__in=event.collaborators.values_list('id', flat=True)
-    )
+    """Send notification to every collaborator when an event is updated"""
+    recipients = list(event.collaborators.all())
+    if not recipients:
+        return
     field_changes = ", ".join([f"{field}: {getattr(event, field)}" for field in updated_fields])
     message = f"Event '{event.name}' updated: {field_changes}"
-    
+
+    # Store notifications in one insert and push them in one batch
+    bulk_notify(
+        sender=actor,
+        recipients=recipients,
+        verb='Event Updated',
+        description=message,
+        target=event
+    )
+
+    # Send email for significant updates
+    if not any(field in updated_fields for field in ['status', 'start_date', 'end_date', 'location']):
+        return
+
+    recipients_by_language = defaultdict(list)
     for recipient in recipients:
-        # Store notification
-        notify.send(
-            sender=actor,
-            recipient=recipient,
-            verb='Event Updated',
-            target=event,
-            description=message
-        )
-        
-        # Send email for significant updates
-        if any(field in updated_fields for field in ['status', 'start_date', 'end_date', 'location']):
-            context = {
-                'site_name': settings.SITE_NAME,
-                'protocol': 'https' if getattr(settings, 'USE_HTTPS', False) else 'http',
-                'domain': getattr(settings, 'DOMAIN', 'localhost:8000'),
-                'user': recipient,
-                'event_name': event.name,
-                'event_id': event.id,
-                'changes': field_changes
-            }
-            subject = f"Event Update: {event.name}"
+        recipients_by_language[recipient_language(recipient)].append(recipient)
+
+    subject = f"Event Update: {event.name}"
+    emails = []
+    for language, group in recipients_by_language.items():
+        # The body is the same for every recipient, so render it once per language
+        context = {
+            'site_name': settings.SITE_NAME,
+            'protocol': 'https' if getattr(settings, 'USE_HTTPS', False) else 'http',
+            'domain': getattr(settings, 'DOMAIN', 'localhost:8000'),
+            'event_name': event.name,
+            'event_id': event.id,
+            'changes': field_changes
+        }
+        with translation.override(language):
             html_message = render_to_string('notifications/event_update.html', context)
-            
-            send_mail(
+
+        emails.extend(
+            outbox_email(
                 subject,
                 html_message,
-                settings.DEFAULT_FROM_EMAIL,
                 [recipient.email],
                 html_message=html_message,
-                fail_silently=True
+                idempotency_key=f"event-updated:{event.pk}:{event.updated_at.isoformat()}:{recipient.pk}",
             )
-
-
-
+            for recipient in group
+        )
+    queue_emails(emails)
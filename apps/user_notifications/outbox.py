@@ -0,0 +1,138 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.user_notifications.models import EmailOutbox
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# A claimed row is retried after this long if its worker dies mid-batch
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def outbox_backoff(attempts):
+    """Exponential backoff between delivery attempts: 1, 2, 4 ... minutes, capped at an hour."""
+    return timedelta(minutes=min(2 ** max(attempts - 1, 0), 60))
+
+
+def outbox_email(subject, message, recipient_list, html_message=None, from_email=None, idempotency_key=None):
+    """Build an unsaved outbox row; pass a list of them to `queue_emails`."""
+    return EmailOutbox(
+        idempotency_key=idempotency_key or uuid.uuid4().hex,
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def queue_email(subject, message, recipient_list, html_message=None, from_email=None, idempotency_key=None):
+    """
+    Write an email to the outbox instead of sending it inline.
+    Delivery is scheduled once the surrounding transaction commits;
+    queuing the same idempotency key twice is a no-op.
+    """
+    queue_emails([
+        outbox_email(subject, message, recipient_list, html_message, from_email, idempotency_key)
+    ])
+
+
+def queue_emails(rows):
+    """Insert many outbox rows in one statement and schedule a single delivery."""
+    if not rows:
+        return
+    EmailOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+    transaction.on_commit(schedule_outbox_delivery)
+
+
+def schedule_outbox_delivery():
+    from apps.user_notifications.tasks import send_outbox_emails
+
+    try:
+        send_outbox_emails.delay()
+    except Exception as e:
+        # The periodic drain picks the rows up if the broker is unavailable
+        logger.error(f"Could not schedule outbox delivery: {str(e)}")
+
+
+def claim_outbox_batch(batch_size):
+    """Lease up to `batch_size` due rows so concurrent workers never send the same email."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.Status.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        EmailOutbox.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + CLAIM_LEASE,
+        )
+    return list(EmailOutbox.objects.filter(pk__in=ids).order_by('pk'))
+
+
+def build_message(row, connection):
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email,
+        to=row.recipients,
+        connection=connection,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+def deliver_outbox_batch(batch_size=100):
+    """
+    Send one batch of due outbox rows over a single mail connection.
+    Returns the number of rows claimed, sent and failed.
+    """
+    rows = claim_outbox_batch(batch_size)
+    if not rows:
+        return {'claimed': 0, 'sent': 0, 'failed': 0}
+
+    sent_ids = []
+    failures = []
+    connection = get_connection(backend=settings.OUTBOX_EMAIL_BACKEND, fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # The claim already counted an attempt, so an unreachable server
+        # backs every row off like a failed send instead of waiting out the lease
+        failures = [(row, e) for row in rows]
+    else:
+        try:
+            for row in rows:
+                try:
+                    connection.send_messages([build_message(row, connection)])
+                    sent_ids.append(row.pk)
+                except Exception as e:
+                    failures.append((row, e))
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    EmailOutbox.objects.filter(pk__in=sent_ids).update(
+        status=EmailOutbox.Status.SENT, sent_at=now, last_error=''
+    )
+    for row, error in failures:
+        logger.error(f"Failed to send outbox email {row.pk}: {str(error)}")
+        row.last_error = str(error)
+        row.next_attempt_at = now + outbox_backoff(row.attempts)
+        if row.attempts >= MAX_ATTEMPTS:
+            row.status = EmailOutbox.Status.FAILED
+        row.save(update_fields=['last_error', 'next_attempt_at', 'status'])
+
+    return {'claimed': len(rows), 'sent': len(sent_ids), 'failed': len(failures)}
@@ -0,0 +1,199 @@
+import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
+from notifications.models import Notification
+
+from apps.budgets.models import Expense
+from apps.tasks.models import Task
+from apps.user_notifications.models import ReminderNotification
+from apps.user_notifications.outbox import outbox_email, queue_emails
+from apps.user_notifications.utils import create_notifications
+
+
+# Intervals ordered from furthest to closest
+REMINDER_INTERVALS = [
+    ('7_days', timedelta(days=7)),
+    ('1_day', timedelta(days=1)),
+    ('12_hours', timedelta(hours=12)),
+]
+# A reminder is due when the deadline is within this much of an interval
+REMINDER_TOLERANCE = timedelta(hours=1)
+REMINDER_BATCH_SIZE = 500
+
+REMINDER_CONFIGS = [
+    {
+        'model': Task,
+        'status_values': ['TODO', 'IN_PROGRESS'],
+        'recipient_path': 'assignee',
+        'event_path': 'event',
+        'title_field': 'title',
+        'verb': 'Task Due Reminder',
+        'template': 'notifications/task_reminder.html',
+        'subject_template': 'Task Reminder: {title}',
+    },
+    {
+        'model': Expense,
+        'status_values': ['pending'],
+        'recipient_path': 'assignee__user',
+        'event_path': 'budget__event',
+        'title_field': 'name',
+        'verb': 'Expense Due Reminder',
+        'template': 'notifications/expense_reminder.html',
+        'subject_template': 'Expense Reminder: {title}',
+    },
+]
+
+
+def resolve(obj, path):
+    for field in path.split('__'):
+        obj = getattr(obj, field)
+    return obj
+
+
+def due_window(model, now, interval_duration):
+    """
+    Filter for rows whose deadline is within the tolerance of `now + interval_duration`.
+    Date-only deadlines count as due at local midnight, so they become a `due_date IN (...)`
+    over the (at most one) day whose midnight falls inside the window.
+    """
+    start = now + interval_duration - REMINDER_TOLERANCE
+    end = now + interval_duration + REMINDER_TOLERANCE
+    if isinstance(model._meta.get_field('due_date'), models.DateTimeField):
+        return {'due_date__range': (start, end)}
+
+    tz = timezone.get_current_timezone()
+    days = []
+    day = timezone.localtime(start, tz).date()
+    while day <= timezone.localtime(end, tz).date():
+        if start <= datetime.datetime.combine(day, datetime.time(0, 0), tzinfo=tz) <= end:
+            days.append(day)
+        day += timedelta(days=1)
+    return {'due_date__in': days}
+
+
+def due_reminder_queryset(config, content_type, interval_name, interval_duration, now):
+    """Open rows in the interval's due window that have not had this reminder yet, with recipient and event joined."""
+    model = config['model']
+    already_sent = ReminderNotification.objects.filter(
+        content_type=content_type,
+        object_id=OuterRef('pk'),
+        interval=interval_name,
+        recipient=OuterRef(config['recipient_path']),
+    )
+    return (
+        model.objects
+        .filter(status__in=config['status_values'], **due_window(model, now, interval_duration))
+        .filter(~Exists(already_sent))
+        .select_related(config['recipient_path'], config['event_path'])
+        .order_by('pk')
+    )
+
+
+def format_time_remaining(interval_duration):
+    if interval_duration.days > 0:
+        return f"{interval_duration.days} day(s)"
+    return f"{interval_duration.seconds // 3600} hour(s)"
+
+
+def claim_due_objects(config, content_type, interval_name, interval_duration, objects, now):
+    """
+    Lock the batch's rows that still lack this reminder and return their pks.
+    An overlapping run either holds the lock (the row is skipped) or has
+    committed its reminder (the anti-join drops the row), so each reminder
+    is sent by exactly one run.
+    """
+    return set(
+        due_reminder_queryset(config, content_type, interval_name, interval_duration, now)
+        .filter(pk__in=[obj.pk for obj in objects])
+        .select_for_update(skip_locked=True, of=('self',))
+        .values_list('pk', flat=True)
+    )
+
+
+def send_reminder_batch(config, content_type, interval_name, interval_duration, objects, now):
+    """Record, notify and queue email for one batch of due objects using a bulk insert per table."""
+    time_str = format_time_remaining(interval_duration)
+    model_name = config['model'].__name__
+    site_context = {
+        'site_name': getattr(settings, 'SITE_NAME', 'Event Management'),
+        'protocol': 'https' if getattr(settings, 'USE_HTTPS', False) else 'http',
+        'domain': getattr(settings, 'DOMAIN', 'localhost:8000'),
+    }
+
+    prepared = []
+    for obj in objects:
+        recipient = resolve(obj, config['recipient_path'])
+        title = getattr(obj, config['title_field'])
+        reminder = ReminderNotification(
+            content_type=content_type,
+            object_id=obj.pk,
+            recipient=recipient,
+            interval=interval_name,
+        )
+        notification = Notification(
+            recipient=recipient,
+            actor=recipient,
+            verb=config['verb'],
+            target=obj,
+            description=f"Reminder: {model_name} '{title}' is due in {time_str}",
+            timestamp=now,
+        )
+        context = {
+            **site_context,
+            'user': recipient,
+            f"{model_name.lower()}_title": title,
+            'event_name': resolve(obj, config['event_path']).name,
+            'due_date': obj.due_date,
+            'time_remaining': time_str,
+        }
+        html_message = render_to_string(config['template'], context)
+        email = outbox_email(
+            config['subject_template'].format(title=title),
+            html_message,
+            [recipient.email],
+            html_message=html_message,
+            idempotency_key=f"reminder:{content_type.pk}:{obj.pk}:{interval_name}:{recipient.pk}",
+        )
+        prepared.append((obj.pk, reminder, notification, email))
+
+    with transaction.atomic():
+        claimed = claim_due_objects(config, content_type, interval_name, interval_duration, objects, now)
+        reminders, notifications, emails = [], [], []
+        for pk, reminder, notification, email in prepared:
+            if pk in claimed:
+                reminders.append(reminder)
+                notifications.append(notification)
+                emails.append(email)
+        ReminderNotification.objects.bulk_create(reminders, ignore_conflicts=True)
+        create_notifications(notifications)
+        queue_emails(emails)
+    return len(reminders)
+
+
+def send_due_reminders(now=None, batch_size=REMINDER_BATCH_SIZE):
+    """
+    Send every reminder that is due at `now`. Window matching and the
+    already-sent check run in SQL; each batch costs a fixed number of queries.
+    Returns the number of reminders sent.
+    """
+    now = now or timezone.now()
+    sent = 0
+    for config in REMINDER_CONFIGS:
+        content_type = ContentType.objects.get_for_model(config['model'])
+        for interval_name, interval_duration in REMINDER_INTERVALS:
+            queryset = due_reminder_queryset(config, content_type, interval_name, interval_duration, now)
+            batch = []
+            for obj in queryset.iterator(chunk_size=batch_size):
+                batch.append(obj)
+                if len(batch) == batch_size:
+                    sent += send_reminder_batch(config, content_type, interval_name, interval_duration, batch, now)
+                    batch = []
+            if batch:
+                sent += send_reminder_batch(config, content_type, interval_name, interval_duration, batch, now)
+    return sent
@@ -1,18 +1,19 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from notifications.models import Notification
 import logging
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
+from django.db import transaction
 from .notifications import (
-    send_event_update_notification,
     send_expense_update_notification,
     send_task_assignment_notification,
     send_task_update_notification,
     send_expense_assignment_notification
 )
+from .counters import record_created
+from .tasks import fan_out_event_update
+from .utils import broadcast_notifications
 from ..events.models import Event
 from ..tasks.models import Task
 from ..budgets.models import Expense
@@ -28,46 +29,16 @@ def broadcast_notification_to_websocket(sender, instance, created, **kwargs):
     This handles ALL notifications regardless of the source model
     """
     if created:
-        try:
-            # Get the channel layer
-            channel_layer = get_channel_layer()
-            
-            recipient = instance.recipient 
-            group_name = f"notifications_{recipient.id}"
-            
-            logger.info(f"Broadcasting notification {instance.id} to user {recipient.id}")
-            
-            # Send notification to the user's WebSocket group
-            async_to_sync(channel_layer.group_send)(
-                group_name,
-                {
-                    "type": "new_notification_message",
-                    "notification_id": instance.id,
-                }
-            )
-
-            async_to_sync(channel_layer.group_send)(
-                group_name,
-                {
-                    "type": "fetch_notification_messages",
-                }
-            )
-
-            
-        except Exception as e:
-            logger.error(f"Error broadcasting notification {instance.id}: {str(e)}")
-
+        logger.info(f"Broadcasting notification {instance.id} to user {instance.recipient_id}")
+        record_created([instance])
+        # Push the serialized notification once it is committed and visible
+        transaction.on_commit(lambda: broadcast_notifications([instance]))
 
 
 @receiver(pre_save, sender=Task)
 def track_task_changes(sender, instance, **kwargs):
     if instance.pk:
-        old_task = Task.objects.get(pk=instance.pk)
-        updated_fields = []
-        for field in ['title', 'description', 'due_date', 'status', 'assignee']:
-            if getattr(old_task, field) != getattr(instance, field):
-                updated_fields.append(field)
-        instance._updated_fields = updated_fields
+        instance._updated_fields = instance.changed_fields()
 
 
 @receiver(post_save, sender=Task)
@@ -81,13 +52,7 @@ def handle_task_save(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=Expense)
 def track_expense_changes(sender, instance, **kwargs):
     if instance.pk:
-        old_expense = Expense.objects.get(pk=instance.pk)
-        updated_fields = []
-        for field in ['name', 'description', 'estimated_cost', 'actual_cost', 'status', 'due_date']:
-            if getattr(old_expense, field) != getattr(instance, field):
-                updated_fields.append(field)
-        instance._updated_fields = updated_fields
-        
+        instance._updated_fields = instance.changed_fields()
 
 
 @receiver(post_save, sender=Expense)
@@ -101,17 +66,30 @@ def handle_expense_save(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=Event)
 def track_event_changes(sender, instance, **kwargs):
     if instance.pk:
-        old_event = Event.objects.get(pk=instance.pk)
-        updated_fields = []
-        for field in ['name', 'type', 'date', 'location', 'status']:
-            if getattr(old_event, field) != getattr(instance, field):
-                updated_fields.append(field)
-        instance._updated_fields = updated_fields
+        instance._updated_fields = instance.changed_fields()
+
+
+def schedule_event_fan_out(event_pk, updated_fields, actor_pk):
+    """Queue the update fan-out; runs after commit, so it must not raise into the request."""
+    try:
+        fan_out_event_update.delay(event_pk, updated_fields, actor_pk)
+    except Exception as e:
+        # Broker unavailable: the event is already saved, so notify in-process instead
+        logger.error(f"Could not queue event {event_pk} update fan-out, sending inline: {str(e)}")
+        try:
+            fan_out_event_update(event_pk, updated_fields, actor_pk)
+        except Exception as e:
+            logger.error(f"Event {event_pk} update fan-out failed: {str(e)}")
 
 
 @receiver(post_save, sender=Event)
 def handle_event_save(sender, instance, created, **kwargs):
     if hasattr(instance, '_updated_fields') and instance._updated_fields:
-        send_event_update_notification(instance, instance._updated_fields, instance.updated_by)
+        # Fan out to every collaborator in a worker once the update is committed
+        event_pk, updated_fields = instance.pk, list(instance._updated_fields)
+        actor_pk = instance.updated_by_id or instance.owner_id
+        transaction.on_commit(
+            lambda: schedule_event_fan_out(event_pk, updated_fields, actor_pk)
+        )
 
 
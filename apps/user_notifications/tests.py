@@ -1,3 +1,480 @@
-from django.test import TestCase
+import socketserver
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from notifications.models import Notification
+from notifications.signals import notify
+from rest_framework.test import APITestCase
+
+from apps.budgets.models import Expense
+from apps.events.models import Collaborator, Event
+from apps.tasks.models import Task
+from .consumers import NotificationConsumer
+from .counters import get_counts, reconcile_counts
+from .models import EmailOutbox, ReminderNotification
+from .notifications import send_event_update_notification
+from .reminders import (
+    REMINDER_CONFIGS, REMINDER_INTERVALS, due_reminder_queryset, send_due_reminders, send_reminder_batch,
+)
+from .outbox import MAX_ATTEMPTS, deliver_outbox_batch, queue_email
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: records each message and the connection it arrived on."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        recipients = []
+        self.reply("220 localhost stand-in")
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address in server.rejected:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                server.messages.append((server.connections, recipients))
+                self.reply("250 OK")
+            elif verb == "RSET":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPStandInHandler)
+        self.connections = 0
+        self.messages = []
+        self.rejected = set()
+
+
+class EmailOutboxTests(TestCase):
+    """Outbox rows are deduplicated on insert and drained in batches over one SMTP connection."""
+
+    def setUp(self):
+        self.smtp = SMTPStandIn()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+
+        settings_override = override_settings(
+            OUTBOX_EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_batch_is_sent_over_one_connection(self):
+        for n in range(5):
+            queue_email(f"Subject {n}", "<p>Hi</p>", [f"user{n}@example.com"], html_message="<p>Hi</p>")
+
+        result = deliver_outbox_batch()
+
+        self.assertEqual(result, {"claimed": 5, "sent": 5, "failed": 0})
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.Status.SENT).exists())
+
+    def test_duplicate_idempotency_key_is_queued_once(self):
+        queue_email("Invite", "Join us", ["guest@example.com"], idempotency_key="invitation:abc")
+        queue_email("Invite", "Join us", ["guest@example.com"], idempotency_key="invitation:abc")
+
+        deliver_outbox_batch()
+        deliver_outbox_batch()
+
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_failed_message_is_rescheduled_without_blocking_the_batch(self):
+        self.smtp.rejected.add("gone@example.com")
+        queue_email("Reminder", "Due soon", ["gone@example.com"], idempotency_key="bad")
+        queue_email("Reminder", "Due soon", ["here@example.com"], idempotency_key="good")
+
+        result = deliver_outbox_batch()
+
+        self.assertEqual(result, {"claimed": 2, "sent": 1, "failed": 1})
+        failed = EmailOutbox.objects.get(idempotency_key="bad")
+        self.assertEqual(failed.status, EmailOutbox.Status.PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertIn("gone@example.com", failed.last_error)
+
+        # Not due yet, so the next drain leaves it alone
+        self.assertEqual(deliver_outbox_batch()["claimed"], 0)
+
+    def test_gives_up_after_max_attempts(self):
+        self.smtp.rejected.add("gone@example.com")
+        queue_email("Reminder", "Due soon", ["gone@example.com"], idempotency_key="bad")
+        EmailOutbox.objects.update(attempts=MAX_ATTEMPTS - 1)
+
+        deliver_outbox_batch()
+
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.Status.FAILED)
+
+    def test_unreachable_server_backs_off_the_claimed_rows(self):
+        queue_email("Reminder", "Due soon", ["here@example.com"], idempotency_key="good")
+        EmailOutbox.objects.update(attempts=MAX_ATTEMPTS - 1)
+
+        with override_settings(EMAIL_PORT=self.closed_port()):
+            result = deliver_outbox_batch()
+
+        self.assertEqual(result, {"claimed": 1, "sent": 0, "failed": 1})
+        row = EmailOutbox.objects.get()
+        self.assertEqual(row.status, EmailOutbox.Status.FAILED)
+        self.assertEqual(row.attempts, MAX_ATTEMPTS)
+        self.assertNotEqual(row.last_error, "")
+
+    def closed_port(self):
+        with socketserver.TCPServer(("127.0.0.1", 0), socketserver.BaseRequestHandler) as server:
+            return server.server_address[1]
+
+
+class EventUpdateFanOutTests(TestCase):
+    """Event update notifications are created, emailed and pushed in bulk."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.collaborators = [
+            User.objects.create_user(f"User{n}", "Guest", f"user{n}@example.com", "pass1234")
+            for n in range(20)
+        ]
+        for user in self.collaborators:
+            Collaborator.objects.create(user=user, event=self.event)
+
+    def test_fan_out_cost_does_not_grow_with_collaborators(self):
+        with mock.patch(
+            "apps.user_notifications.notifications.render_to_string", return_value="<p>Updated</p>"
+        ) as render, CaptureQueriesContext(connection) as queries:
+            send_event_update_notification(self.event, ["location"], self.owner)
+
+        self.assertEqual(render.call_count, 1)
+        self.assertLessEqual(len(queries), 4, "\n".join(q["sql"] for q in queries.captured_queries))
+        self.assertEqual(Notification.objects.filter(verb="Event Updated").count(), 20)
+        self.assertEqual(EmailOutbox.objects.count(), 20)
+
+    def test_notifications_are_pushed_to_each_recipient(self):
+        channel_layer = get_channel_layer()
+        recipient = self.collaborators[0]
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"notifications_{recipient.id}", channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_event_update_notification(self.event, ["name"], self.owner)
+
+        pushed = async_to_sync(channel_layer.receive)(channel)
+        notification = Notification.objects.get(recipient=recipient)
+        self.assertEqual(pushed["type"], "notification_delta")
+        self.assertEqual(pushed["seq"], notification.id)
+        self.assertEqual(pushed["notification"]["id"], notification.id)
+        self.assertEqual(pushed["notification"]["verb"], "Event Updated")
+
+
+class ChangeTrackingTests(APITestCase):
+    """Update notifications learn what changed from the loaded row, not a second read."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        Collaborator.objects.create(user=self.owner, event=self.event, role=Collaborator.Role.ADMIN)
+
+    def selects_from(self, queries, table):
+        return [q["sql"] for q in queries.captured_queries if q["sql"].startswith("SELECT") and f'FROM "{table}"' in q["sql"]]
+
+    def test_event_update_fans_out_changed_fields(self):
+        self.client.force_authenticate(self.owner)
+        url = reverse("event-detail", kwargs={"id": self.event.id})
+
+        with mock.patch("apps.user_notifications.signals.fan_out_event_update.delay") as fan_out, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                url, {"location": "Lagos", "end_date": self.event.end_date + timedelta(hours=1)}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        fan_out.assert_called_once_with(self.event.pk, ["end_date", "location"], self.owner.pk)
+
+    def test_broker_outage_does_not_fail_a_committed_update(self):
+        collaborator = get_user_model().objects.create_user("Bola", "Guest", "bola@example.com", "pass1234")
+        Collaborator.objects.create(user=collaborator, event=self.event)
+        self.client.force_authenticate(self.owner)
+        url = reverse("event-detail", kwargs={"id": self.event.id})
+
+        with mock.patch(
+            "apps.user_notifications.signals.fan_out_event_update.delay", side_effect=ConnectionError("broker down")
+        ), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(url, {"location": "Lagos"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Notification.objects.filter(recipient=collaborator, verb="Event Updated").exists())
+
+    def test_task_save_tracks_changes_without_rereading(self):
+        task = Task.objects.create(event=self.event, title="Venue", assignee=self.owner, created_by=self.owner)
+        task = Task.objects.get(pk=task.pk)
+        task.title, task.status = "Hall", Task.STATUS_DONE
+
+        with mock.patch("apps.user_notifications.signals.send_task_update_notification") as notify_update, \
+                CaptureQueriesContext(connection) as queries:
+            task.save()
+
+        self.assertEqual(self.selects_from(queries, "tasks_task"), [])
+        notify_update.assert_called_once_with(task, ["title", "status"], self.owner)
+        self.assertEqual(task.changed_fields(), [])
+
+    def test_expense_fk_and_deferred_fields(self):
+        budget = self.event.budget
+        collaborator = Collaborator.objects.get(user=self.owner, event=self.event)
+        expense = Expense.objects.create(budget=budget, name="Chairs", assignee=collaborator)
+
+        loaded = Expense.objects.only("pkid", "name").get(pk=expense.pk)
+        loaded.name = "Tables"
+        self.assertEqual(loaded.changed_fields(), ["name"])
+
+        loaded = Expense.objects.get(pk=expense.pk)
+        loaded.actual_cost = 0
+        self.assertEqual(loaded.changed_fields(), ["actual_cost"])
+
+
+class NotificationConsumerTests(TestCase):
+    """The consumer forwards pushed deltas and replays only what a reconnecting client missed."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user("Ada", "Reader", "ada@example.com", "pass1234")
+        self.actor = User.objects.create_user("Bola", "Actor", "bola@example.com", "pass1234")
+        self.notifications = [
+            notify.send(self.actor, recipient=self.user, verb=f"Ping {n}")[0][1][0]
+            for n in range(3)
+        ]
+
+    def exchange(self, path, group_message=None):
+        """Connect, optionally push a group message, and return every frame after auth_status."""
+        async def run():
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), path)
+            communicator.scope["user"] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            auth = await communicator.receive_json_from()
+            self.assertTrue(auth["authenticated"])
+            frames = [await communicator.receive_json_from()]
+            if group_message is not None:
+                await get_channel_layer().group_send(f"notifications_{self.user.id}", group_message)
+                frames.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return frames
+
+        return async_to_sync(run)()
+
+    def test_first_connection_gets_unread_list_and_current_seq(self):
+        [frame] = self.exchange("/")
+
+        self.assertEqual(frame["type"], "existing_notifications")
+        self.assertEqual(frame["count"], 3)
+        self.assertEqual(frame["seq"], self.notifications[-1].id)
+
+    def test_reconnect_replays_missed_notifications_and_the_overlap(self):
+        Notification.objects.filter(pk=self.notifications[0].pk).update(timestamp=timezone.now() - timedelta(hours=1))
+
+        [frame] = self.exchange(f"/?last_seq={self.notifications[1].id}")
+
+        self.assertEqual(frame["type"], "missed_notifications")
+        self.assertEqual([n["id"] for n in frame["notifications"]], [n.id for n in self.notifications[1:]])
+        self.assertEqual(frame["seq"], self.notifications[-1].id)
+
+    def test_lower_id_committed_after_a_pushed_one_is_replayed(self):
+        # The client saw the newest notification before the middle one committed
+        [frame] = self.exchange(f"/?last_seq={self.notifications[-1].id}")
+
+        self.assertIn(self.notifications[1].id, [n["id"] for n in frame["notifications"]])
+        self.assertEqual(frame["seq"], self.notifications[-1].id)
+
+    def test_delta_is_forwarded_without_refetching(self):
+        delta = {"type": "notification_delta", "seq": 99, "notification": {"id": 99, "verb": "Ping"}}
+
+        _, frame = self.exchange(f"/?last_seq={self.notifications[-1].id}", group_message=delta)
+
+        self.assertEqual(frame, {"type": "new_notification", "seq": 99, "notification": {"id": 99, "verb": "Ping"}})
+
+
+class NotificationCounterTests(APITestCase):
+    """Notification counters live in the cache and follow every create, mark and delete."""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user("Ada", "Reader", "ada@example.com", "pass1234")
+        self.actor = User.objects.create_user("Bola", "Actor", "bola@example.com", "pass1234")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notifications = [
+                notify.send(self.actor, recipient=self.user, verb="Ping", level=level)[0][1][0]
+                for level in ("info", "info", "warning")
+            ]
+        self.client.force_authenticate(self.user)
+
+    def expected(self):
+        notifications = self.user.notifications
+        return {
+            "total": notifications.count(),
+            "unread": notifications.unread().count(),
+            "read": notifications.read().count(),
+            "by_level": {
+                level: notifications.filter(level=level).count()
+                for level in ("info", "success", "warning", "error")
+            },
+        }
+
+    def test_count_endpoint_is_served_from_the_cache(self):
+        get_counts(self.user.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("count"))
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.data, self.expected())
+
+    def test_counters_follow_bulk_actions(self):
+        get_counts(self.user.pk)
+        url = reverse("notifications")
+        ids = [n.id for n in self.notifications[:2]]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {"action": "mark_read", "notification_ids": ids}, format="json")
+        self.assertEqual(self.client.get(reverse("count")).data, self.expected())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {"action": "delete_read"}, format="json")
+        self.assertEqual(self.client.get(reverse("count")).data, self.expected())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notify.send(self.actor, recipient=self.user, verb="Ping", level="error")
+        counts = self.client.get(reverse("count")).data
+        self.assertEqual(counts, self.expected())
+        self.assertEqual(counts["by_level"]["error"], 1)
+
+    def test_reconcile_repairs_drift(self):
+        get_counts(self.user.pk)
+        # A delete that bypasses the counters
+        self.notifications[0].delete()
+
+        self.assertEqual(reconcile_counts(), 1)
+        self.assertEqual(self.client.get(reverse("count")).data, self.expected())
+
+
+class DueReminderTests(TestCase):
+    """The reminder scan matches due windows in SQL and never sends the same reminder twice."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user("Ada", "Owner", "ada@example.com", "pass1234")
+        self.now = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.event = Event.objects.create(
+            owner=self.owner, name="Launch", type="party",
+            start_date=self.now + timedelta(days=30), end_date=self.now + timedelta(days=30, hours=4),
+        )
+        self.assignees = [
+            User.objects.create_user(f"User{n}", "Guest", f"user{n}@example.com", "pass1234")
+            for n in range(3)
+        ]
+        today = self.now.date()
+        for user in self.assignees:
+            for days in (1, 3, 7):
+                Task.objects.create(
+                    event=self.event, title=f"Due in {days}", assignee=user, created_by=self.owner,
+                    due_date=today + timedelta(days=days),
+                )
+        Task.objects.create(
+            event=self.event, title="Done already", assignee=self.assignees[0], created_by=self.owner,
+            due_date=today + timedelta(days=1), status=Task.STATUS_DONE,
+        )
+        collaborator = Collaborator.objects.create(user=self.assignees[0], event=self.event)
+        Expense.objects.create(
+            budget=self.event.budget, name="Venue deposit", assignee=collaborator,
+            due_date=self.now + timedelta(hours=12, minutes=30),
+        )
+        EmailOutbox.objects.all().delete()
+
+    def test_sends_each_due_reminder_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            sent = send_due_reminders(now=self.now)
+
+        self.assertEqual(sent, 7)
+        self.assertLessEqual(len(queries), 30, "\n".join(q["sql"] for q in queries.captured_queries))
+        self.assertEqual(
+            sorted(ReminderNotification.objects.values_list("interval", flat=True)),
+            ["12_hours"] + ["1_day"] * 3 + ["7_days"] * 3,
+        )
+        self.assertEqual(EmailOutbox.objects.count(), 7)
+        self.assertEqual(Notification.objects.filter(verb="Task Due Reminder").count(), 6)
+        self.assertEqual(Notification.objects.filter(verb="Expense Due Reminder").count(), 1)
+
+        self.assertEqual(send_due_reminders(now=self.now), 0)
+        self.assertEqual(ReminderNotification.objects.count(), 7)
+
+    def test_overlapping_runs_notify_once(self):
+        content_type = ContentType.objects.get_for_model(Task)
+        config = REMINDER_CONFIGS[0]
+        interval_name, interval_duration = REMINDER_INTERVALS[1]
+        # Both runs read the batch before either recorded its reminders
+        batch = list(due_reminder_queryset(config, content_type, interval_name, interval_duration, self.now))
+
+        first = send_reminder_batch(config, content_type, interval_name, interval_duration, batch, self.now)
+        second = send_reminder_batch(config, content_type, interval_name, interval_duration, batch, self.now)
+
+        self.assertEqual((first, second), (3, 0))
+        self.assertEqual(Notification.objects.filter(verb="Task Due Reminder").count(), 3)
+        self.assertEqual(EmailOutbox.objects.count(), 3)
+
+    def test_outside_the_window_nothing_is_sent(self):
+        self.assertEqual(send_due_reminders(now=self.now + timedelta(hours=4)), 0)
@@ -1,4 +1,20 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+from notifications.models import Notification
 from notifications.signals import notify
+from rest_framework.utils.encoders import JSONEncoder
+
+from .counters import record_created
+
+
+logger = logging.getLogger(__name__)
+
 
 def notify_multiple_users(sender, recipients, verb, description, target=None):
     for recipient in recipients:
@@ -8,4 +24,71 @@ def notify_multiple_users(sender, recipients, verb, description, target=None):
             verb=verb,
             description=description,
             target=target,
-        )
\ No newline at end of file
+        )
+
+
+def bulk_notify(sender, recipients, verb, description, target=None):
+    """
+    Create one notification per recipient with a single INSERT and push them
+    to the recipients' WebSocket groups in one batch after commit.
+    Unlike `notify.send`, no post_save signal fires for the created rows.
+    """
+    timestamp = timezone.now()
+    return create_notifications([
+        Notification(
+            recipient=recipient,
+            actor=sender,
+            verb=str(verb),
+            description=description,
+            timestamp=timestamp,
+            target=target,
+        )
+        for recipient in recipients
+    ])
+
+
+def create_notifications(notifications):
+    """Insert prepared notifications in one statement, then count and push them after commit."""
+    notifications = Notification.objects.bulk_create(notifications)
+    record_created(notifications)
+    transaction.on_commit(lambda: broadcast_notifications(notifications))
+    return notifications
+
+
+def serialize_for_push(notifications):
+    """Serialize notifications into plain JSON types that can travel through the channel layer."""
+    from .serializers import NotificationSerializer
+
+    data = NotificationSerializer(notifications, many=True).data
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+def broadcast_notifications(notifications):
+    """
+    Push a batch of notifications to their recipients' WebSocket groups.
+    Each group message carries the serialized notification and its sequence
+    number (the notification id; see NotificationConsumer for how clients
+    resume from it), so consumers forward
+    it as-is without touching the database. Every group_send is issued
+    concurrently inside one event loop hop.
+    """
+    if not notifications:
+        return
+
+    messages = [
+        (f"notifications_{notification.recipient.id}", {
+            "type": "notification_delta",
+            "seq": notification.id,
+            "notification": payload,
+        })
+        for notification, payload in zip(notifications, serialize_for_push(notifications))
+    ]
+
+    try:
+        async_to_sync(_group_send_many)(get_channel_layer(), messages)
+    except Exception as e:
+        logger.error(f"Error broadcasting {len(notifications)} notifications: {str(e)}")
+
+
+async def _group_send_many(channel_layer, messages):
+    await asyncio.gather(*(channel_layer.group_send(group, message) for group, message in messages))
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
+from .counters import delete_notifications, format_counts, get_counts, mark_notifications
 from .serializers import NotificationSerializer
 from .pagination import NotificationPagination
 from drf_yasg.utils import swagger_auto_schema
@@ -126,18 +127,15 @@ class NotificationAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        notifications = request.user.notifications.unread().filter(id__in=notification_ids)
-        marked_count = notifications.count()
-        
-        for notification in notifications:
-            notification.mark_as_read()
+        notifications = request.user.notifications.filter(id__in=notification_ids)
+        marked_count = mark_notifications(request.user, notifications, unread=False)
         
         return Response({
             'status': 'success',
             'action': 'mark_read',
             'message': f'{marked_count} notifications marked as read',
             'marked_count': marked_count,
-            'unread_count': request.user.notifications.unread().count()
+            'unread_count': get_counts(request.user.pk)['unread']
         })
     
     def _bulk_mark_unread(self, request):
@@ -150,18 +148,15 @@ class NotificationAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        notifications = request.user.notifications.read().filter(id__in=notification_ids)
-        marked_count = notifications.count()
-        
-        for notification in notifications:
-            notification.mark_as_unread()
+        notifications = request.user.notifications.filter(id__in=notification_ids)
+        marked_count = mark_notifications(request.user, notifications, unread=True)
         
         return Response({
             'status': 'success',
             'action': 'mark_unread',
             'message': f'{marked_count} notifications marked as unread',
             'marked_count': marked_count,
-            'unread_count': request.user.notifications.unread().count()
+            'unread_count': get_counts(request.user.pk)['unread']
         })
     
     def _bulk_delete(self, request):
@@ -175,21 +170,19 @@ class NotificationAPIView(APIView):
             )
         
         notifications = request.user.notifications.filter(id__in=notification_ids)
-        deleted_count = notifications.count()
-        notifications.delete()
+        deleted_count = delete_notifications(request.user, notifications)
         
         return Response({
             'status': 'success',
             'action': 'delete',
             'message': f'{deleted_count} notifications deleted',
             'deleted_count': deleted_count,
-            'total_count': request.user.notifications.count()
+            'total_count': get_counts(request.user.pk)['total']
         })
     
     def _mark_all_read(self, request):
         """Mark all notifications as read"""
-        unread_count = request.user.notifications.unread().count()
-        request.user.notifications.mark_all_as_read()
+        unread_count = mark_notifications(request.user, request.user.notifications.all(), unread=False)
         
         return Response({
             'status': 'success',
@@ -201,23 +194,19 @@ class NotificationAPIView(APIView):
     
     def _mark_all_unread(self, request):
         """Mark all notifications as unread"""
-        read_count = request.user.notifications.read().count()
-        
-        for notification in request.user.notifications.read():
-            notification.mark_as_unread()
+        read_count = mark_notifications(request.user, request.user.notifications.all(), unread=True)
         
         return Response({
             'status': 'success',
             'action': 'mark_all_unread',
             'message': f'All {read_count} notifications marked as unread',
             'marked_count': read_count,
-            'unread_count': request.user.notifications.unread().count()
+            'unread_count': get_counts(request.user.pk)['unread']
         })
     
     def _delete_all(self, request):
         """Delete all notifications"""
-        total_count = request.user.notifications.count()
-        request.user.notifications.all().delete()
+        total_count = delete_notifications(request.user, request.user.notifications.all())
         
         return Response({
             'status': 'success',
@@ -229,16 +218,14 @@ class NotificationAPIView(APIView):
     
     def _delete_read(self, request):
         """Delete only read notifications"""
-        read_notifications = request.user.notifications.read()
-        deleted_count = read_notifications.count()
-        read_notifications.delete()
+        deleted_count = delete_notifications(request.user, request.user.notifications.read())
         
         return Response({
             'status': 'success',
             'action': 'delete_read',
             'message': f'{deleted_count} read notifications deleted',
             'deleted_count': deleted_count,
-            'total_count': request.user.notifications.count()
+            'total_count': get_counts(request.user.pk)['total']
         })
 
 class NotificationDetailAPIView(APIView):
@@ -277,15 +264,14 @@ class NotificationDetailAPIView(APIView):
         notification = self.get_object(request, pk)
         action = request.data.get('action', 'mark_read')
         
+        single = request.user.notifications.filter(pk=notification.pk)
         if action == 'mark_read':
-            if notification.unread:
-                notification.mark_as_read()
+            if mark_notifications(request.user, single, unread=False):
                 message = 'Notification marked as read'
             else:
                 message = 'Notification was already read'
         elif action == 'mark_unread':
-            if not notification.unread:
-                notification.mark_as_unread()
+            if mark_notifications(request.user, single, unread=True):
                 message = 'Notification marked as unread'
             else:
                 message = 'Notification was already unread'
@@ -300,19 +286,19 @@ class NotificationDetailAPIView(APIView):
             'action': action,
             'message': message,
             'notification_id': pk,
-            'unread_count': request.user.notifications.unread().count()
+            'unread_count': get_counts(request.user.pk)['unread']
         })
     
     def delete(self, request, pk):
         """Delete individual notification"""
         notification = self.get_object(request, pk)
-        notification.delete()
+        delete_notifications(request.user, request.user.notifications.filter(pk=notification.pk))
         
         return Response({
             'status': 'success',
             'message': 'Notification deleted',
             'notification_id': pk,
-            'total_count': request.user.notifications.count()
+            'total_count': get_counts(request.user.pk)['total']
         })
 
 class NotificationCountAPIView(APIView):
@@ -323,15 +309,4 @@ class NotificationCountAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        return Response({
-            'total': user.notifications.count(),
-            'unread': user.notifications.unread().count(),
-            'read': user.notifications.read().count(),
-            'by_level': {
-                'info': user.notifications.filter(level='info').count(),
-                'success': user.notifications.filter(level='success').count(),
-                'warning': user.notifications.filter(level='warning').count(),
-                'error': user.notifications.filter(level='error').count(),
-            }
-        })
\ No newline at end of file
+        return Response(format_counts(get_counts(request.user.pk)))
\ No newline at end of file
@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+
+from django.db import models, transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class StaleVersion(Exception):
+    """The row was saved by someone else after this instance was loaded."""
+
+
+class EditConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Someone else changed this since you loaded it. Reload and try again.'
+    default_code = 'edit_conflict'
+
+
+class VersionedModel(models.Model):
+    """
+    Optimistic concurrency control.
+
+    Every save of an existing row is an `UPDATE ... WHERE version = n` that
+    also bumps the version, where n is the instance's `version` attribute:
+    the loaded value, or the one a client echoed back through a serializer.
+    If another write got there first no row matches and StaleVersion is
+    raised instead of overwriting it.
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get('force_insert'):
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'version' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'version']
+
+        if 'version' in self.get_deferred_fields():
+            # Nothing to compare against; bump the column and leave it deferred
+            self.version = F('version') + 1
+            try:
+                return super().save(*args, **kwargs)
+            finally:
+                del self.__dict__['version']
+
+        expected = self.version
+        self._expected_version = expected
+        self.version = expected + 1
+        try:
+            # Own savepoint, so a conflict leaves an enclosing transaction usable
+            with transaction.atomic(using=kwargs.get('using')):
+                return super().save(*args, **kwargs)
+        except BaseException:
+            self.version = expected
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        updated = super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update
+        )
+        # A missing row falls through to Django's usual insert or error; only a
+        # row that moved on to another version is a conflict
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise StaleVersion(f'{self._meta.label} {pk_val} is no longer at version {expected}')
+        return updated
+
+
+@contextmanager
+def conflict_on_stale_version():
+    """Report a lost optimistic-concurrency race to the API client as 409."""
+    try:
+        yield
+    except StaleVersion:
+        raise EditConflict()
+
+
+class VersionedUpdateMixin:
+    """Generic update views: stale saves answer 409 instead of overwriting."""
+
+    def perform_update(self, serializer):
+        with conflict_on_stale_version():
+            super().perform_update(serializer)
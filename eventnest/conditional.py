@@ -0,0 +1,74 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has changed since you last fetched it.'
+    default_code = 'precondition_failed'
+
+
+class ConditionalObjectMixin:
+    """
+    Strong ETag support for detail views.
+
+    `get_etag_parts(obj)` returns the cheap values the serialized
+    representation depends on: the object's pk and `updated_at` by default,
+    overridden to add the stamps of nested children. Reads answer a matching
+    If-None-Match with 304 before the serializer runs; writes reject a stale
+    If-Match with 412, and successful updates carry the new ETag.
+    """
+
+    def get_etag_parts(self, obj):
+        return [obj.pk, obj.updated_at]
+
+    def get_etag(self, obj):
+        raw = '|'.join(str(part) for part in self.get_etag_parts(obj))
+        return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+    def get_not_modified_response(self, request, obj):
+        """Return the ETag for `obj` and a 304 response if the client's copy is current."""
+        etag = self.get_etag(obj)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+        return etag, response
+
+    def check_write_preconditions(self, request, obj):
+        if request.method in SAFE_METHODS:
+            return
+        if 'HTTP_IF_MATCH' not in request.META and 'HTTP_IF_NONE_MATCH' not in request.META:
+            return
+        if get_conditional_response(request, etag=self.get_etag(obj)) is not None:
+            raise PreconditionFailed()
+
+    # Hooks for generic views
+
+    def get_object(self):
+        obj = super().get_object()
+        self.check_write_preconditions(self.request, obj)
+        self._conditional_object = obj
+        return obj
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        if status.is_success(response.status_code):
+            # The instance was saved in place, so this is the ETag of the new state
+            response['ETag'] = self.get_etag(self._conditional_object)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, not_modified = self.get_not_modified_response(request, instance)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        return response
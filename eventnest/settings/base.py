@@ -299,6 +299,10 @@ CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND')
 CELERY_TIMEZONE = "UTC"
 
 EMAIL_BACKEND = config('EMAIL_BACKEND')
+# Backend used by the outbox worker to actually deliver queued emails
+OUTBOX_EMAIL_BACKEND = config('OUTBOX_EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+# Currency the exchange-rate table is quoted against (1 unit of currency = rate units of this)
+EXCHANGE_BASE_CURRENCY = config('EXCHANGE_BASE_CURRENCY', default='NGN')
 
 
 SWAGGER_SETTINGS = {
@@ -319,4 +323,17 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.user_notifications.tasks.send_due_reminders',
         'schedule': crontab(minute=0, hour='*'),
     },
+    'drain-email-outbox': {
+        'task': 'apps.user_notifications.tasks.send_outbox_emails',
+        'schedule': crontab(),
+    },
+    'reconcile-notification-counts': {
+        'task': 'apps.user_notifications.tasks.reconcile_notification_counts',
+        'schedule': crontab(minute=30, hour='*'),
+    },
+    # Hourly so the last run of each day leaves an end-of-day snapshot
+    'take-budget-snapshots': {
+        'task': 'apps.budgets.tasks.take_budget_snapshots',
+        'schedule': crontab(minute=50, hour='*'),
+    },
 }
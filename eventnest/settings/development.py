@@ -50,3 +50,11 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Cache (notification counters)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f"redis://{REDIS_HOST}:{REDIS_PORT}/3",
+    },
+}
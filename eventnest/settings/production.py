@@ -84,3 +84,14 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Cache (notification counters)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': redis_url.rsplit('/', 1)[0] + '/3',
+        'OPTIONS': {
+            'ssl_cert_reqs': ssl.CERT_OPTIONAL,
+        },
+    },
+}
@@ -0,0 +1,32 @@
+class FieldTrackerMixin:
+    """
+    Remembers the values of `tracked_fields` as loaded from the database so
+    `changed_fields()` can tell what an edit touched without reading the row
+    again. Foreign keys are compared by id. Fields that were deferred when the
+    row was loaded are never reported; new instances report nothing.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance.tracked_values()
+        return instance
+
+    def tracked_values(self):
+        values = {}
+        for name in self.tracked_fields:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:
+                values[name] = self.__dict__[attname]
+        return values
+
+    def changed_fields(self):
+        loaded = getattr(self, '_loaded_values', {})
+        current = self.tracked_values()
+        return [name for name, value in loaded.items() if current.get(name, value) != value]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Later saves of this instance compare against what was just written
+        self._loaded_values = self.tracked_values()